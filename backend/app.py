@@ -5,17 +5,27 @@ Flask后端API - 微信支付截图OCR识别和去重
 """
 
 import os
+import math
 import uuid
 import shutil
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+from urllib.parse import quote
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import threading
-import json
+import hashlib
 
-from ocr_service import OCRService
+from ocr_service import OCRService, OCR_WORKERS
+from scheduler import get_scheduler, PRIORITY_WEIGHTS, DEFAULT_PRIORITY
+from task_store import TaskStore
+from order_index import OrderIndex
+from result_store import ResultStore, LiveResults, ORDER_SORTS, MAX_LIVE_ROWS
+from exporter import EXPORT_FORMATS, ExportError, check_format, export
+from reaper import start_reaper, touch_access
+import serializer
+import metrics
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域
@@ -28,18 +38,77 @@ ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'JPG', 'JPEG', 'PNG'}
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 RESULT_FOLDER.mkdir(exist_ok=True)
 
-# 任务状态存储
-tasks = {}
+# 长轮询最长等待时间（秒），需小于gunicorn的timeout
+LONG_POLL_MAX_WAIT = 20
+# 已完成结果的缓存：任务可以重新处理或被清理，/api/result/<id> 每次都要用ETag验证；
+# 带版本号的 /api/result/<id>?v=<result_etag> 内容不会改变，可以长期缓存
+RESULT_CACHE_CONTROL = 'no-cache'
+VERSIONED_RESULT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# 任务状态存储（写入results/<task_id>/task.json，多个worker共享）
+tasks = TaskStore(RESULT_FOLDER)
+# 跨任务的订单号索引（不属于任何任务文件夹，不会被自动清理）
+order_index = OrderIndex(RESULT_FOLDER / 'order_index.sqlite3')
+
+@app.before_request
+def ensure_reaper():
+    """每个worker首次处理请求时启动后台清理线程（fork之后启动，避免preload时线程丢失）"""
+    start_reaper(UPLOAD_FOLDER, RESULT_FOLDER)
 
 def allowed_file(filename):
     """检查文件是否允许上传"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def json_bytes_response(body, status=200, cache_dir=None, cache_name='response'):
+    """返回已序列化的JSON；超过阈值且客户端支持时压缩，压缩结果可缓存到cache_dir"""
+    response = Response(status=status, mimetype='application/json')
+    encoding = None
+    if len(body) >= serializer.COMPRESS_THRESHOLD:
+        encoding = serializer.choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        if cache_dir is not None:
+            suffix = 'br' if encoding == 'br' else 'gz'
+            body = serializer.compressed_cached(body, encoding, Path(cache_dir) / f'{cache_name}.json.{suffix}')
+        else:
+            body = serializer.compress(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_data(body)
+    return response
+
+def etag_matches(etag):
+    """检查If-None-Match是否命中（忽略压缩编码后缀）"""
+    if_none_match = request.headers.get('If-None-Match', '')
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == '*' or tag.split('-', 1)[0] == etag:
+            return True
+    return False
+
+def freeze_result(task_id, result_folder):
+    """将已完成任务的完整响应冻结为不可变文件，返回内容ETag"""
+    result_file = result_folder / 'result.json'
+    frozen_file = result_folder / 'result.frozen.json'
+    body = b'{"task_id":' + serializer.dumps(task_id) + b',"result":' + result_file.read_bytes() + b'}'
+    serializer.atomic_write(frozen_file, body)
+    return hashlib.sha256(body).hexdigest()[:32]
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查"""
     return jsonify({'status': 'ok', 'message': 'OCR服务运行中'})
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus指标（多worker部署时汇总所有worker）"""
+    content, content_type = metrics.render()
+    if content is None:
+        return jsonify({'error': '未安装prometheus_client'}), 501
+    return Response(content, content_type=content_type)
+
 @app.route('/api/upload', methods=['POST'])
 def upload_files():
     """上传图片文件"""
@@ -94,12 +163,13 @@ def upload_files():
             return jsonify({'error': '没有有效的图片文件'}), 400
         
         # 初始化任务状态
-        tasks[task_id] = {
-            'status': 'uploaded',
-            'uploaded_count': len(uploaded_files),
-            'created_at': datetime.now().isoformat(),
-            'message': f'成功上传 {len(uploaded_files)} 个文件'
-        }
+        tasks.create(
+            task_id,
+            status='uploaded',
+            uploaded_count=len(uploaded_files),
+            created_at=datetime.now().isoformat(),
+            message=f'成功上传 {len(uploaded_files)} 个文件'
+        )
         
         return jsonify({
             'task_id': task_id,
@@ -114,35 +184,65 @@ def upload_files():
 def process_task(task_id):
     """开始OCR处理"""
     try:
-        if task_id not in tasks:
+        task = tasks.get(task_id)
+        if task is None:
             return jsonify({'error': '任务不存在'}), 404
         
-        if tasks[task_id]['status'] == 'processing':
+        if task['status'] == 'processing':
             return jsonify({'error': '任务正在处理中'}), 400
         
+        # 可选的性能分析：?profile=cprofile 或 ?profile=pyinstrument
+        profile = request.args.get('profile', '')
+        if profile not in ('', 'cprofile', 'pyinstrument'):
+            return jsonify({'error': f'不支持的性能分析模式: {profile}'}), 400
+        
+        # 任务优先级：?priority=low / normal / high
+        priority = request.args.get('priority', DEFAULT_PRIORITY)
+        if priority not in PRIORITY_WEIGHTS:
+            return jsonify({'error': f'不支持的优先级: {priority}'}), 400
+        
         # 更新任务状态
-        tasks[task_id]['status'] = 'processing'
-        tasks[task_id]['message'] = '正在处理中...'
+        tasks.update(task_id, status='processing', message='正在处理中...', priority=priority)
         
         # 异步处理OCR
         task_folder = UPLOAD_FOLDER / task_id
         result_folder = RESULT_FOLDER / task_id
         result_folder.mkdir(exist_ok=True)
         
+        def report_progress(processed, total, cached):
+            # 排队情况只有处理该任务的worker进程知道，随进度一起写入任务状态
+            queue = get_scheduler(OCR_WORKERS).snapshot(task_id)
+            queue['pending'] = total - processed
+            tasks.update(task_id, progress={'processed': processed, 'total': total, 'cached': cached}, queue=queue)
+        
         def process_ocr():
             try:
-                ocr_service = OCRService(task_folder, result_folder)
+                ocr_service = OCRService(
+                    task_folder, result_folder,
+                    progress_callback=report_progress,
+                    order_index=order_index,
+                    task_id=task_id,
+                    priority=priority,
+                    **({'profile': profile} if profile else {})
+                )
                 result = ocr_service.process()
                 
-                tasks[task_id]['status'] = 'completed'
-                tasks[task_id]['result'] = result
-                tasks[task_id]['message'] = '处理完成'
-                tasks[task_id]['completed_at'] = datetime.now().isoformat()
+                # 结果不再变化，冻结为不可变文件并计算ETag
+                result_etag = None
+                if ocr_service.result_file.exists():
+                    result_etag = freeze_result(task_id, result_folder)
+                
+                tasks.update(
+                    task_id,
+                    status='completed',
+                    result=result,
+                    result_etag=result_etag,
+                    message='处理完成',
+                    completed_at=datetime.now().isoformat()
+                )
                 
             except Exception as e:
-                tasks[task_id]['status'] = 'failed'
-                tasks[task_id]['error'] = str(e)
-                tasks[task_id]['message'] = f'处理失败: {str(e)}'
+                tasks.update(task_id, status='failed', error=str(e), message=f'处理失败: {str(e)}')
         
         thread = threading.Thread(target=process_ocr)
         thread.daemon = True
@@ -159,59 +259,106 @@ def process_task(task_id):
 
 @app.route('/api/status/<task_id>', methods=['GET'])
 def get_status(task_id):
-    """查询任务状态"""
-    if task_id not in tasks:
+    """查询任务状态
+    
+    支持长轮询：?since=<版本号>&wait=<秒> 在版本号变化前最多等待wait秒，
+    无变化返回304；也支持 If-None-Match 条件请求。
+    """
+    task = tasks.get(task_id)
+    if task is None:
         return jsonify({'error': '任务不存在'}), 404
     
-    task = tasks[task_id]
+    since = request.args.get('since', type=int)
+    if since is not None:
+        wait = min(request.args.get('wait', LONG_POLL_MAX_WAIT, type=float), LONG_POLL_MAX_WAIT)
+        task = tasks.wait_for_change(task_id, since, max(wait, 0))
+        if task is None:
+            return jsonify({'error': '任务不存在'}), 404
+    
+    version = task.get('version', 0)
+    etag = f'v{version}'
+    if (since is not None and version <= since) or etag_matches(etag):
+        response = Response(status=304)
+        response.headers['ETag'] = f'"{etag}"'
+        return response
+    
     response = {
         'task_id': task_id,
         'status': task['status'],
         'message': task.get('message', ''),
+        'version': version,
     }
     
-    # 如果处理中，返回进度
+    # 如果处理中，返回进度和排队情况
     if task['status'] == 'processing' and 'progress' in task:
         response['progress'] = task['progress']
+    if task['status'] == 'processing' and 'queue' in task:
+        response['queue'] = task['queue']
     
     # 如果完成，返回结果摘要
     if task['status'] == 'completed' and 'result' in task:
         result = task['result']
+        # 结果版本号，可用于 /api/result/<id>?v=<result_etag> 长期缓存
+        response['result_etag'] = task.get('result_etag')
         response['summary'] = {
             'total_files': result.get('total_files', 0),
             'success_count': result.get('success_count', 0),
             'failed_count': result.get('failed_count', 0),
             'unique_orders': result.get('unique_orders', 0),
             'duplicate_orders': result.get('duplicate_orders', 0),
+            'duplicate_images': result.get('duplicate_images', 0),
+            'total_duplicate_files': result.get('total_duplicate_files', 0),
+            'previously_seen_orders': result.get('previously_seen_orders', 0),
+            'previously_seen_amount': result.get('previously_seen_amount', 0),
             'total_amount': result.get('total_amount', 0),
         }
     
-    return jsonify(response)
+    response = jsonify(response)
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/result/<task_id>', methods=['GET'])
 def get_result(task_id):
-    """获取处理结果详情"""
-    if task_id not in tasks:
+    """获取处理结果详情（支持ETag条件请求；?v=<result_etag> 与当前结果一致时允许长期缓存）"""
+    task = tasks.get(task_id)
+    if task is None:
         return jsonify({'error': '任务不存在'}), 404
     
-    task = tasks[task_id]
-    
     if task['status'] != 'completed':
         return jsonify({'error': '任务未完成'}), 400
     
-    return jsonify({
-        'task_id': task_id,
-        'result': task.get('result', {})
-    })
+    etag = task.get('result_etag')
+    cache_control = VERSIONED_RESULT_CACHE_CONTROL if etag and request.args.get('v') == etag else RESULT_CACHE_CONTROL
+    if etag and etag_matches(etag):
+        response = Response(status=304)
+        response.headers['ETag'] = f'"{etag}"'
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
+    # 直接返回冻结的响应文件，无需重新序列化
+    result_folder = RESULT_FOLDER / task_id
+    touch_access(result_folder)
+    frozen_file = result_folder / 'result.frozen.json'
+    if etag and frozen_file.exists():
+        body = frozen_file.read_bytes()
+    else:
+        body = serializer.dumps({'task_id': task_id, 'result': task.get('result', {})})
+        return json_bytes_response(body)
+    
+    response = json_bytes_response(body, cache_dir=result_folder, cache_name=f'result-{etag}')
+    encoding = response.headers.get('Content-Encoding')
+    response.headers['ETag'] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 @app.route('/api/download/<task_id>', methods=['GET'])
 def download_result(task_id):
     """下载去重后的文件（zip格式）"""
-    if task_id not in tasks:
+    task = tasks.get(task_id)
+    if task is None:
         return jsonify({'error': '任务不存在'}), 404
     
-    task = tasks[task_id]
-    
     if task['status'] != 'completed':
         return jsonify({'error': '任务未完成'}), 400
     
@@ -221,13 +368,16 @@ def download_result(task_id):
         if not result_folder.exists():
             return jsonify({'error': '去重文件夹不存在'}), 404
         
-        # 创建zip文件
-        zip_path = RESULT_FOLDER / task_id / f'deduped_{task_id}.zip'
-        shutil.make_archive(
-            str(zip_path.with_suffix('')),
-            'zip',
-            str(result_folder)
-        )
+        touch_access(RESULT_FOLDER / task_id)
+        
+        # 处理完成时已打包，旧任务没有zip时再临时创建
+        zip_path = RESULT_FOLDER / task_id / 'deduped.zip'
+        if not zip_path.exists():
+            shutil.make_archive(
+                str(zip_path.with_suffix('')),
+                'zip',
+                str(result_folder)
+            )
         
         return send_file(
             str(zip_path),
@@ -238,6 +388,217 @@ def download_result(task_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def open_result_store(task_id):
+    """已完成任务的结果库，返回 (ResultStore, None) 或 (None, 错误响应)"""
+    task = tasks.get(task_id)
+    if task is None:
+        return None, (jsonify({'error': '任务不存在'}), 404)
+    
+    if task['status'] != 'completed':
+        return None, (jsonify({'error': '任务未完成'}), 400)
+    
+    result_folder = RESULT_FOLDER / task_id
+    touch_access(result_folder)
+    store = ResultStore(result_folder)
+    store.ensure(result_folder / 'result.json')
+    if not store.exists():
+        return None, (jsonify({'error': '结果文件不存在'}), 404)
+    return store, None
+
+def store_query(task_id, query):
+    """结果库查询的响应：ETag取自任务的result_etag（重新处理后改变），Cache-Control为no-cache，
+    浏览器和nginx每次都要验证，结果未变时返回304，不再查询结果库"""
+    task = tasks.get(task_id)
+    etag = task.get('result_etag') if task and task['status'] == 'completed' else None
+    if etag and etag_matches(etag):
+        response = Response(status=304)
+    else:
+        store, error = open_result_store(task_id)
+        if error:
+            return error
+        response = jsonify(query(store))
+    if etag:
+        response.headers['ETag'] = f'"{etag}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/export/<task_id>', methods=['GET'])
+def export_result(task_id):
+    """导出去重后的订单（?format=csv|xlsx|parquet），按文件夹分组并带小计，边查询边输出"""
+    fmt = request.args.get('format', 'csv').lower()
+    try:
+        check_format(fmt)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    store, error = open_result_store(task_id)
+    if error:
+        return error
+    
+    mimetype, suffix = EXPORT_FORMATS[fmt]
+    download_name = f'去重订单_{datetime.now().strftime("%Y%m%d_%H%M%S")}{suffix}'
+    return Response(
+        stream_with_context(export(store.iter_by_folder(), fmt)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f"attachment; filename=orders{suffix}; filename*=UTF-8''{quote(download_name)}",
+        }
+    )
+
+def query_arg(name, convert, default=None):
+    """读取查询参数并转换类型，格式错误时抛出ValueError"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f'参数{name}格式错误: {value}')
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+def parse_amount(value):
+    amount = float(value)
+    if not math.isfinite(amount):
+        raise ValueError(value)
+    return amount
+
+def parse_bool(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+def amount_filters():
+    return {
+        'min_amount': query_arg('min_amount', parse_amount),
+        'max_amount': query_arg('max_amount', parse_amount),
+        'seen': query_arg('seen', parse_bool),
+    }
+
+def page_args():
+    return {
+        'page': query_arg('page', positive_int, 1),
+        'page_size': query_arg('page_size', positive_int, 50),
+    }
+
+@app.route('/api/result/<task_id>/orders', methods=['GET'])
+def query_orders(task_id):
+    """筛选、排序、分页查询去重订单
+    
+    参数: folder, min_amount, max_amount（元）, q（订单号前缀）, seen（是否之前出现过）,
+          sort（index/amount/-amount/folder/order_number）, page, page_size（最大MAX_PAGE_SIZE）
+    返回: {total, amount（筛选结果的金额合计）, page, page_size, items}
+    """
+    try:
+        sort = request.args.get('sort', '-amount')
+        if sort not in ORDER_SORTS:
+            raise ValueError(f'不支持的排序: {sort}（可选 {"/".join(ORDER_SORTS)}）')
+        filters = amount_filters()
+        filters['folder'] = request.args.get('folder') or None
+        filters['search'] = request.args.get('q', '').strip() or None
+        pages = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return store_query(task_id, lambda store: store.query_orders(sort=sort, **pages, **filters))
+
+@app.route('/api/result/<task_id>/folders', methods=['GET'])
+def query_folders(task_id):
+    """按文件夹汇总订单数和金额（支持min_amount、max_amount、seen筛选）"""
+    try:
+        filters = amount_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def folder_summary(store):
+        folders = store.folder_totals(**filters)
+        return {
+            'folders': folders,
+            'total_count': sum(item['count'] for item in folders),
+            'total_amount': round(sum(item['amount'] for item in folders), 2),
+        }
+    return store_query(task_id, folder_summary)
+
+def paged_query(task_id, method):
+    try:
+        pages = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return store_query(task_id, lambda store: getattr(store, method)(**pages))
+
+@app.route('/api/result/<task_id>/duplicates', methods=['GET'])
+def query_duplicates(task_id):
+    """分页查询重复订单"""
+    return paged_query(task_id, 'query_duplicates')
+
+@app.route('/api/result/<task_id>/duplicate-images', methods=['GET'])
+def query_duplicate_images(task_id):
+    """分页查询内容相同的重复图片"""
+    return paged_query(task_id, 'query_duplicate_images')
+
+@app.route('/api/result/<task_id>/failed', methods=['GET'])
+def query_failed(task_id):
+    """分页查询识别失败的文件"""
+    return paged_query(task_id, 'query_failed')
+
+@app.route('/api/result/<task_id>/live', methods=['GET'])
+def live_results(task_id):
+    """处理中已识别的图片（未去重），?offset=上次返回的offset&generation=上次返回的generation 增量读取
+    
+    返回: {status, items, offset, generation, more（是否还有未读取的行）,
+          reset（任务已重新处理或偏移量失效，items从头开始，之前读到的记录应丢弃）}；
+    任务完成后改用 /orders 等分页接口
+    """
+    task = tasks.get(task_id)
+    if task is None:
+        return jsonify({'error': '任务不存在'}), 404
+    try:
+        offset = query_arg('offset', int, 0)
+        if offset < 0:
+            raise ValueError(f'参数offset格式错误: {offset}')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items, next_offset, generation, reset = LiveResults(RESULT_FOLDER / task_id).read(
+        offset, generation=request.args.get('generation') or None
+    )
+    response = jsonify({
+        'status': task['status'],
+        'items': items,
+        'offset': next_offset,
+        'generation': generation,
+        'more': len(items) >= MAX_LIVE_ROWS,
+        'reset': reset,
+    })
+    # 内容随处理进度变化，浏览器和nginx都不能缓存
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/trace/<task_id>', methods=['GET'])
+def download_trace(task_id):
+    """下载任务耗时追踪（Chrome trace格式，可在chrome://tracing或Perfetto中打开）"""
+    task = tasks.get(task_id)
+    if task is None:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    trace_file = RESULT_FOLDER / task_id / 'trace.json'
+    if not trace_file.exists():
+        return jsonify({'error': '追踪文件不存在'}), 404
+    
+    return send_file(
+        str(trace_file),
+        as_attachment=True,
+        download_name=f'trace_{task_id}.json',
+        mimetype='application/json'
+    )
+
 @app.route('/api/cache/<task_id>', methods=['GET'])
 def download_cache(task_id):
     """下载OCR缓存文件"""
@@ -273,7 +634,7 @@ def cleanup_task(task_id):
                 shutil.rmtree(result_folder)
             
             # 删除任务记录
-            del tasks[task_id]
+            tasks.delete(task_id)
             
             return jsonify({'message': '清理成功'})
         else:
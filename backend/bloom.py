@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+布隆过滤器 - 基于mmap的位数组文件，多个worker进程共享同一份页缓存
+
+文件格式：头部（魔数、位数、哈希函数个数、已添加元素数、生成时间、已同步的日志序号）+ 位数组。
+判断“不存在”无需访问磁盘；判断“可能存在”时由调用方再查询持久化索引。
+已同步的日志序号由调用方维护：过滤器包含持久化索引中序号不超过它的全部元素。
+"""
+
+import os
+import mmap
+import math
+import time
+import struct
+import hashlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境
+    fcntl = None
+
+MAGIC = b'HHGBLM02'
+HEADER = struct.Struct('<8sQIQdQ')  # 魔数, 位数, 哈希函数个数, 元素数, 生成时间, 已同步的日志序号
+COUNT_OFFSET = 20
+SYNCED_OFFSET = 36
+
+
+def optimal_size(capacity, fp_rate):
+    """按容量和目标误判率计算位数和哈希函数个数"""
+    bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = open(self.path, 'r+b')
+        try:
+            self.stat = os.fstat(self.file.fileno())
+            self.mm = mmap.mmap(self.file.fileno(), 0)
+            magic, self.bits, self.hashes, _, self.built_at, _ = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC or len(self.mm) < HEADER.size + (self.bits + 7) // 8:
+                raise ValueError(f'布隆过滤器文件损坏: {self.path}')
+        except Exception:
+            self.file.close()
+            raise
+
+    @classmethod
+    def create(cls, path, capacity, fp_rate=0.01):
+        """创建空的过滤器文件"""
+        bits, hashes = optimal_size(max(capacity, 1), fp_rate)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, bits, hashes, 0, time.time(), 0))
+            f.truncate(HEADER.size + (bits + 7) // 8)
+        return cls(path)
+
+    @property
+    def count(self):
+        return struct.unpack_from('<Q', self.mm, COUNT_OFFSET)[0]
+
+    @property
+    def synced_seq(self):
+        return struct.unpack_from('<Q', self.mm, SYNCED_OFFSET)[0]
+
+    def _positions(self, key):
+        # 双重哈希：一次blake2b得到两个64位值，组合出k个位置
+        h1, h2 = struct.unpack('<QQ', hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest())
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        mm = self.mm
+        for position in self._positions(key):
+            if not mm[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add_many(self, keys, synced_seq=None):
+        """批量添加（加文件锁，避免多个进程同时修改同一字节丢失位）
+
+        synced_seq：添加后过滤器已包含的日志序号，只会增大（多个进程同时补录时以最大的为准）。
+        """
+        mm = self.mm
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        try:
+            added = 0
+            for key in keys:
+                new = False
+                for position in self._positions(key):
+                    index = HEADER.size + (position >> 3)
+                    bit = 1 << (position & 7)
+                    if not mm[index] & bit:
+                        mm[index] |= bit
+                        new = True
+                added += new
+            if added:
+                struct.pack_into('<Q', mm, COUNT_OFFSET, self.count + added)
+            if synced_seq is not None and synced_seq > self.synced_seq:
+                struct.pack_into('<Q', mm, SYNCED_OFFSET, synced_seq)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def estimated_fp_rate(self):
+        """按当前元素数估算的误判率"""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def is_current(self):
+        """文件是否仍是磁盘上的同一个（重建后会被替换）"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_dev) == (self.stat.st_ino, self.stat.st_dev)
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        try:
+            self.mm.close()
+        finally:
+            self.file.close()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR分片队列 - 把一个任务的图片切成分片，由独立的OCR worker进程（ocr_worker.py）领取处理
+
+本地实现使用SQLite（测试和单机多进程使用）；多台机器部署时换成Redis等实现相同接口即可。
+
+- 领取分片时加租约，worker定期续约；worker退出或卡死导致租约过期后，分片自动重新分发
+- 超过 MAX_ATTEMPTS 次仍未完成的分片标记为失败，其中的图片记为处理异常
+- 图片默认通过共享目录读取；transfer=True 时图片内容写入队列，worker无需访问上传目录
+- 领取顺序与本机调度器一致：小任务优先，其余任务按“已租出分片数/权重”最少的优先，同一任务内按提交顺序
+- 没有worker处理时，任务端可以收回尚未领取的分片（withdraw）改为本机识别
+
+环境变量 OCR_BROKER 设置队列数据库路径后，OCRService 改为分发模式。
+"""
+
+import os
+import time
+import json
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+
+from scheduler import PRIORITY_WEIGHTS, DEFAULT_PRIORITY, FAST_LANE_LIMIT
+
+OCR_BROKER = os.environ.get('OCR_BROKER', '')
+# 是否把图片内容写入队列（worker无法访问上传目录时使用）
+OCR_BROKER_TRANSFER = os.environ.get('OCR_BROKER_TRANSFER', '0') == '1'
+# 每个分片的图片数
+SHARD_SIZE = int(os.environ.get('OCR_SHARD_SIZE', 50))
+# 租约时长（秒），worker每 LEASE_SECONDS/3 续约一次
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS shards (
+    id           INTEGER PRIMARY KEY,
+    task_id      TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    files        TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    worker       TEXT,
+    lease_until  REAL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    result       TEXT,
+    error        TEXT,
+    collected    INTEGER NOT NULL DEFAULT 0,
+    transfer     INTEGER NOT NULL DEFAULT 0,
+    weight       INTEGER NOT NULL DEFAULT 2,
+    fast         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, id);
+CREATE INDEX IF NOT EXISTS shards_task ON shards (task_id, collected);
+CREATE TABLE IF NOT EXISTS shard_files (
+    shard_id      INTEGER NOT NULL,
+    relative_path TEXT NOT NULL,
+    data          BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shard_files_shard ON shard_files (shard_id);
+'''
+
+
+def worker_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class ShardBroker:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.local = threading.local()
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(shards)')}
+            for column, default in (('weight', 2), ('fast', 0)):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE shards ADD COLUMN {column} INTEGER NOT NULL DEFAULT {default}')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self):
+        """每个线程复用一个连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self.connect()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    # ---------- 任务端 ----------
+
+    def submit(self, task_id, source_folder, relative_paths, shard_size=SHARD_SIZE, transfer=OCR_BROKER_TRANSFER,
+               priority=DEFAULT_PRIORITY):
+        """切分并提交图片，返回分片数
+        
+        每个分片单独提交：transfer模式下先读取该分片的图片再开始写事务，写锁只在插入期间持有，
+        不会让worker的领取和提交等待整个上传。已提交的分片可以立即被领取；中途出错时由调用方delete_task清理。
+        """
+        source_folder = Path(source_folder)
+        weight = PRIORITY_WEIGHTS[priority]
+        fast = int(len(relative_paths) <= FAST_LANE_LIMIT)
+        count = 0
+        for start in range(0, len(relative_paths), shard_size):
+            files = relative_paths[start:start + shard_size]
+            contents = [(path, (source_folder / path).read_bytes()) for path in files] if transfer else []
+            conn = self._transaction()
+            try:
+                cursor = conn.execute(
+                    'INSERT INTO shards (task_id, source, files, transfer, weight, fast) VALUES (?, ?, ?, ?, ?, ?)',
+                    (task_id, str(source_folder), json.dumps(files, ensure_ascii=False), int(transfer), weight, fast)
+                )
+                conn.executemany(
+                    'INSERT INTO shard_files (shard_id, relative_path, data) VALUES (?, ?, ?)',
+                    ((cursor.lastrowid, path, data) for path, data in contents)
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            count += 1
+        return count
+
+    def collect(self, task_id):
+        """取出已完成或已失败、尚未取回的分片：[(状态, 图片列表, 结果行列表, 错误)]"""
+        conn = self._transaction()
+        try:
+            rows = conn.execute(
+                "SELECT id, status, files, result, error FROM shards "
+                "WHERE task_id = ? AND collected = 0 AND status IN ('done', 'failed')",
+                (task_id,)
+            ).fetchall()
+            conn.executemany('UPDATE shards SET collected = 1 WHERE id = ?', [(row[0],) for row in rows])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [
+            (status, json.loads(files), json.loads(result) if result else [], error)
+            for _, status, files, result, error in rows
+        ]
+
+    def progress(self, task_id):
+        """各状态的分片数"""
+        rows = self.connect().execute(
+            'SELECT status, COUNT(*) FROM shards WHERE task_id = ? GROUP BY status', (task_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def active_leases(self):
+        """所有任务中租约未过期的分片数（为0说明当前没有worker在处理）"""
+        return self.connect().execute(
+            "SELECT COUNT(*) FROM shards WHERE status = 'leased' AND lease_until >= ?", (time.time(),)
+        ).fetchone()[0]
+
+    def withdraw(self, task_id):
+        """收回任务中尚未领取或租约已过期的分片，返回其中的图片列表 [[相对路径, ...]]
+        
+        收回的分片不再分发；租约过期的worker之后提交的结果会被丢弃（complete返回False）。
+        """
+        conn = self._transaction()
+        try:
+            rows = conn.execute(
+                "SELECT id, files FROM shards WHERE task_id = ? "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_until < ?))",
+                (task_id, time.time())
+            ).fetchall()
+            ids = [(shard_id,) for shard_id, _ in rows]
+            conn.executemany(
+                "UPDATE shards SET status = 'withdrawn', worker = NULL, lease_until = NULL WHERE id = ?", ids
+            )
+            conn.executemany('DELETE FROM shard_files WHERE shard_id = ?', ids)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [json.loads(files) for _, files in rows]
+
+    def delete_task(self, task_id):
+        conn = self._transaction()
+        try:
+            conn.execute('DELETE FROM shard_files WHERE shard_id IN (SELECT id FROM shards WHERE task_id = ?)', (task_id,))
+            conn.execute('DELETE FROM shards WHERE task_id = ?', (task_id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    # ---------- worker端 ----------
+
+    def lease(self, worker, lease_seconds=LEASE_SECONDS):
+        """领取一个待处理或租约已过期的分片，没有时返回None"""
+        now = time.time()
+        conn = self._transaction()
+        try:
+            # 租约过期且已达到最大次数的分片标记为失败
+            conn.execute(
+                "UPDATE shards SET status = 'failed', error = '多次处理未完成（worker退出或超时）' "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT id, task_id, source, files, transfer, attempts FROM shards AS s "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY fast DESC, "
+                "(SELECT COUNT(*) FROM shards AS l WHERE l.task_id = s.task_id AND l.status = 'leased' "
+                " AND l.lease_until >= ?) * 1.0 / weight, id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            shard_id, task_id, source, files, transfer, attempts = row
+            conn.execute(
+                "UPDATE shards SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now + lease_seconds, shard_id)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if attempts:
+            print(f"↻ 重新分发分片 {shard_id}（第 {attempts + 1} 次）")
+        return {
+            'id': shard_id,
+            'task_id': task_id,
+            'source': source,
+            'files': json.loads(files),
+            'transfer': bool(transfer),
+        }
+
+    def shard_files(self, shard_id):
+        """transfer模式下读取分片中的图片内容：[(相对路径, 内容)]"""
+        return self.connect().execute(
+            'SELECT relative_path, data FROM shard_files WHERE shard_id = ?', (shard_id,)
+        ).fetchall()
+
+    def renew(self, shard_id, worker, lease_seconds=LEASE_SECONDS):
+        """续约，租约已被其他worker接手时返回False"""
+        cursor = self.connect().execute(
+            "UPDATE shards SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, shard_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, shard_id, worker, rows):
+        """提交分片结果（rows为ImageRecord行）；租约已转给其他worker时丢弃，返回False"""
+        conn = self._transaction()
+        try:
+            cursor = conn.execute(
+                "UPDATE shards SET status = 'done', result = ?, lease_until = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(rows, ensure_ascii=False), shard_id, worker)
+            )
+            if cursor.rowcount == 1:
+                conn.execute('DELETE FROM shard_files WHERE shard_id = ?', (shard_id,))
+            conn.execute('COMMIT')
+            return cursor.rowcount == 1
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, shard_id, worker, error):
+        """处理出错，放回队列等待重新分发（达到最大次数则标记失败）"""
+        self.connect().execute(
+            "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, worker = NULL, lease_until = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+            (MAX_ATTEMPTS, error, shard_id, worker)
+        )
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """按环境变量OCR_BROKER创建的分片队列，未配置时返回None（本机处理）"""
+    global _broker
+    if not OCR_BROKER:
+        return None
+    with _broker_lock:
+        if _broker is None:
+            _broker = ShardBroker(OCR_BROKER)
+        return _broker
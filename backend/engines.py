@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR引擎 - 默认调用tesseract，压测时可替换为固定输出的模拟引擎
+
+环境变量:
+  OCR_ENGINE=fake          使用模拟引擎（不调用tesseract）
+  OCR_FAKE_LATENCY=0.5     模拟引擎单次识别耗时（秒）
+  OCR_FAKE_JITTER=0.2      耗时按文件内容在 ±JITTER 比例内浮动
+  OCR_FAKE_FAIL_RATE=0.1   常规识别返回无效文本的比例（触发深度识别）
+"""
+
+import os
+import time
+import hashlib
+import subprocess
+
+from mapped_file import is_path
+
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'tesseract')
+
+
+class TesseractEngine:
+    """调用tesseract命令行"""
+
+    name = 'tesseract'
+    downscale = True
+
+    def recognize(self, image, lang=None, psm=None, timeout=15, options=None):
+        """识别图片文字（image为文件路径或图片内容bytes/mmap，内容通过stdin传入；options为tesseract的-c配置），
+        超时或tesseract不存在时抛出异常"""
+        data = None if is_path(image) else image
+        command = ['tesseract', 'stdin' if data is not None else str(image), 'stdout']
+        if lang:
+            command += ['-l', lang]
+        if psm:
+            command += ['--psm', psm]
+        for key, value in (options or {}).items():
+            command += ['-c', f'{key}={value}']
+        result = subprocess.run(command, input=data, capture_output=True, timeout=timeout)
+        return result.stdout.decode('utf-8', errors='replace')
+
+
+class FakeEngine:
+    """模拟引擎：按文件内容生成固定的订单号和金额，并按配置的耗时休眠
+
+    相同内容的图片总是得到相同的结果，重复运行的压测结果可比较。
+    """
+
+    name = 'fake'
+    downscale = False  # 结果由文件内容决定，缩放会改变结果
+
+    def __init__(self, latency=None, jitter=None, fail_rate=None):
+        self.latency = float(os.environ.get('OCR_FAKE_LATENCY', 0.5) if latency is None else latency)
+        self.jitter = float(os.environ.get('OCR_FAKE_JITTER', 0.2) if jitter is None else jitter)
+        self.fail_rate = float(os.environ.get('OCR_FAKE_FAIL_RATE', 0.1) if fail_rate is None else fail_rate)
+
+    def recognize(self, image, lang=None, psm=None, timeout=15, options=None):
+        if is_path(image):
+            with open(image, 'rb') as f:
+                image = f.read()
+        digest = hashlib.md5(image).digest()
+        seed = int.from_bytes(digest[:8], 'big')
+        fraction = (seed % 10000) / 10000
+
+        delay = self.latency * (1 + self.jitter * (2 * fraction - 1))
+        if delay > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired('fake-ocr', timeout)
+        time.sleep(max(delay, 0))
+
+        if psm is None and (seed >> 16) % 10000 < self.fail_rate * 10000:
+            return 'unreadable\n'
+        order_number = '4200' + str(seed % 10 ** 24).zfill(24)
+        amount = (seed >> 24) % 50000 / 100 + 1
+        return f"交易单号 {order_number}\n-{amount:.2f}\n"
+
+
+_engines = {}
+
+
+def get_engine(name=None):
+    """按名称（默认读取环境变量OCR_ENGINE）获取引擎，同一进程内共用一个实例"""
+    name = name or OCR_ENGINE
+    if name not in _engines:
+        if name == 'fake':
+            _engines[name] = FakeEngine()
+        elif name == 'tesseract':
+            _engines[name] = TesseractEngine()
+        else:
+            raise ValueError(f'不支持的OCR引擎: {name}')
+    return _engines[name]
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单导出 - 把去重后的订单逐行生成为CSV/XLSX/Parquet，边生成边输出，内存占用与订单数无关
+
+- 订单按文件夹分组（组内金额从大到小），每个文件夹后一行小计，最后一行合计
+- 包含本任务内的重复图片数和跨任务重复标记（之前出现过该订单号的任务和时间）
+- CSV带BOM，Excel直接打开不乱码；订单号写成 ="..." 文本公式，Excel不会转成科学计数法丢失位数；
+  以 = + - @ 等开头的文本单元格前加单引号，防止文件名中的公式被Excel执行
+- XLSX按Office Open XML格式直接写出（单元格使用内联字符串，无需共享字符串表），
+  zip以流式模式写入，不需要openpyxl，也不需要可seek的输出
+- Parquet需要安装pyarrow（可选），每BATCH_SIZE行写一个row group
+"""
+
+import io
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+# 每批输出的行数
+BATCH_SIZE = 2000
+
+HEADERS = ('类型', '序号', '订单号', '金额', '文件夹', '文件名', '相对路径', '本任务重复图片数', '之前出现的任务', '之前出现时间')
+ROW_ORDER, ROW_SUBTOTAL, ROW_TOTAL = '订单', '小计', '合计'
+
+
+class ExportError(Exception):
+    """不支持的格式或缺少依赖"""
+
+
+def check_format(fmt):
+    """检查导出格式，不支持时抛出ExportError"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f'不支持的导出格式: {fmt}（可选 {"/".join(EXPORT_FORMATS)}）')
+    if fmt == 'parquet' and pyarrow is None:
+        raise ExportError('导出Parquet需要安装pyarrow')
+
+
+def table_rows(orders):
+    """订单行（result_store.ORDER_COLUMNS顺序，按文件夹分组）-> 导出行（HEADERS顺序，插入小计和合计）"""
+    folder = None
+    folder_cents = folder_count = 0
+    total_cents = total_count = 0
+    for idx, order_number, amount_cents, filename, order_folder, relative_path, duplicate_count, seen_task, seen_at in orders:
+        if order_folder != folder:
+            if folder is not None:
+                yield (ROW_SUBTOTAL, folder_count, None, folder_cents / 100, folder, None, None, None, None, None)
+            folder, folder_cents, folder_count = order_folder, 0, 0
+        folder_cents += amount_cents
+        folder_count += 1
+        total_cents += amount_cents
+        total_count += 1
+        yield (ROW_ORDER, idx, order_number, amount_cents / 100, order_folder, filename, relative_path,
+               duplicate_count, seen_task, seen_at)
+    if folder is not None:
+        yield (ROW_SUBTOTAL, folder_count, None, folder_cents / 100, folder, None, None, None, None, None)
+    yield (ROW_TOTAL, total_count, None, total_cents / 100, None, None, None, None, None, None)
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+ORDER_NUMBER_COLUMN = HEADERS.index('订单号')
+# Excel等表格软件会当作公式执行的开头字符
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_row(row):
+    """CSV的一行：订单号保持为文本，其他文本单元格去掉公式开头"""
+    cells = []
+    for column, value in enumerate(row):
+        if isinstance(value, str):
+            if column == ORDER_NUMBER_COLUMN:
+                value = '="' + value.replace('"', '""') + '"'
+            elif value.startswith(FORMULA_PREFIXES):
+                value = "'" + value
+        cells.append(value)
+    return cells
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for batch in _batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_csv_row(row) for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _Pipe(io.RawIOBase):
+    """只写的输出缓冲：写入的数据由生成器取走后清空（zipfile、pyarrow把它当作不可seek的文件）"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="订单" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # 样式：0 默认，1 粗体（表头、小计、合计），2 两位小数金额，3 粗体两位小数金额
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/></font><font><b/><sz val="11"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="4"><xf/><xf fontId="1" applyFont="1"/>'
+        '<xf numFmtId="4" applyNumberFormat="1"/><xf numFmtId="4" fontId="1" applyFont="1" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+AMOUNT_COLUMN = HEADERS.index('金额')
+
+
+COLUMN_LETTERS = 'ABCDEFGHIJ'
+
+
+def _xlsx_row(number, row, bold=False):
+    """一行的XML（空单元格不输出，单元格带引用位置）"""
+    cells = []
+    for column, value in enumerate(row):
+        if value is None:
+            continue
+        if column == AMOUNT_COLUMN and not isinstance(value, str):
+            style = 3 if bold else 2
+        else:
+            style = 1 if bold else 0
+        attrs = f' r="{COLUMN_LETTERS[column]}{number}"' + (f' s="{style}"' if style else '')
+        if isinstance(value, str):
+            cells.append(f'<c{attrs} t="inlineStr"><is><t>{escape(value)}</t></is></c>')
+        else:
+            cells.append(f'<c{attrs}><v>{value}</v></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def export_xlsx(rows):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield pipe.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+                '</sheetView></sheetViews>'
+                '<cols><col min="3" max="3" width="34" customWidth="1"/><col min="5" max="7" width="24" customWidth="1"/>'
+                '<col min="9" max="10" width="22" customWidth="1"/></cols>'
+                f'<sheetData>{_xlsx_row(1, HEADERS, bold=True)}'.encode('utf-8')
+            )
+            number = 1
+            for batch in _batches(rows):
+                sheet.write(''.join(
+                    _xlsx_row(row_number, row, bold=row[0] != ROW_ORDER) for row_number, row in enumerate(batch, number + 1)
+                ).encode('utf-8'))
+                number += len(batch)
+                yield pipe.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield pipe.drain()
+
+
+# 非字符串列的Parquet类型
+PARQUET_TYPES = {'序号': pyarrow.int64, '金额': pyarrow.float64, '本任务重复图片数': pyarrow.int64} if pyarrow else {}
+
+
+def export_parquet(rows):
+    schema = pyarrow.schema([
+        (header, PARQUET_TYPES.get(header, pyarrow.string)()) for header in HEADERS
+    ])
+    pipe = _Pipe()
+    sink = pyarrow.PythonFile(pipe, mode='w')
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for batch in _batches(rows):
+            columns = list(zip(*batch))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            yield pipe.drain()
+    finally:
+        writer.close()
+    yield pipe.drain()
+
+
+def export(orders, fmt):
+    """按格式逐块生成导出文件的字节（orders为按文件夹分组的订单行）"""
+    check_format(fmt)
+    writer = {'csv': export_csv, 'xlsx': export_xlsx, 'parquet': export_parquet}[fmt]
+    for chunk in writer(table_rows(orders)):
+        if chunk:
+            yield chunk
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单号和金额提取 - 后端和命令行工具共用，保证同一段OCR文本在各处得到相同的结果
+"""
+
+import re
+
+# 无标记的金额只在该范围内取值（元）
+MIN_AMOUNT = 0.01
+MAX_AMOUNT = 100000
+
+# 正则表达式在导入时编译（gunicorn preload时各worker共享）
+ORDER_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'订单号[:：\s]*([0-9A-Za-z]{18,32})',
+    r'单号[:：\s]*([0-9A-Za-z]{18,32})',
+    r'订单编号[:：\s]*([0-9A-Za-z]{18,32})',
+    r'商户订单号[:：\s]*([0-9A-Za-z]{18,32})',
+    r'交易单号[:：\s]*([0-9A-Za-z]{18,32})',
+    r'\b([0-9]{20,32})\b',
+    r'\b([0-9A-Za-z]{24,32})\b',
+)]
+ORDER_LABEL = re.compile(r'订单号|单号|订单编号|商户订单号|交易单号', re.IGNORECASE)
+LINE_TOKENS = re.compile(r'[:：\s]*([0-9A-Za-z]+)')
+LINE_HEAD = re.compile(r'^([0-9A-Za-z]+)')
+ALNUM = re.compile(r'[0-9A-Za-z]+')
+LINE_TAIL = re.compile(r'([0-9A-Za-z]{10,})$')
+CONTINUATION_HEAD = re.compile(r'^([0-9A-Za-z]{4,})')
+AMOUNT_PATTERNS = [re.compile(pattern) for pattern in (
+    r'-(\d+\.\d{2})',
+    r'¥(\d+\.\d{2})',
+    r'￥(\d+\.\d{2})',
+)]
+DECIMAL_NUMBER = re.compile(r'\b(\d+\.\d{2})\b')
+
+
+def extract_order_number(text):
+    """从OCR文本中提取订单编号 - 支持跨行识别"""
+    # 先尝试常规匹配（单行完整订单号）
+    for pattern in ORDER_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            order_num = matches[0].strip()
+            # 过滤掉一些常见的误识别（如日期、时间等）
+            if len(order_num) >= 18 and not order_num.startswith('2025') and not order_num.startswith('2024'):
+                return order_num
+
+    # 如果单行匹配失败，尝试跨行拼接
+    lines = text.split('\n')
+
+    for i, line in enumerate(lines):
+        # 查找包含"订单号"等关键词的行
+        if ORDER_LABEL.search(line):
+            # 提取当前行的数字字母部分
+            current_line_numbers = LINE_TOKENS.findall(line)
+
+            # 如果当前行有数字，且长度不够（可能被截断）
+            for num in current_line_numbers:
+                if len(num) >= 10 and len(num) < 32:
+                    # 检查下一行是否有继续的数字
+                    if i + 1 < len(lines):
+                        next_line = lines[i + 1].strip()
+                        next_numbers = LINE_HEAD.findall(next_line)
+
+                        if next_numbers:
+                            # 拼接两行的订单号
+                            combined = num + next_numbers[0]
+                            # 验证拼接后的长度是否合理
+                            if 18 <= len(combined) <= 32:
+                                if not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
+                                    return combined
+
+    # 查找可能跨行的长数字串
+    for i in range(len(lines) - 1):
+        line = lines[i].strip()
+        next_line = lines[i + 1].strip()
+
+        line_no_space = ''.join(ALNUM.findall(line))
+
+        end_match = LINE_TAIL.search(line_no_space)
+        if end_match:
+            end_part = end_match.group(1)
+
+            start_match = CONTINUATION_HEAD.search(next_line)
+            if start_match:
+                start_part = start_match.group(1)
+
+                combined = end_part + start_part
+
+                if 18 <= len(combined) <= 32:
+                    digit_ratio = sum(c.isdigit() for c in combined) / len(combined)
+                    if digit_ratio >= 0.7:
+                        if combined.startswith('4200') or combined.startswith('1000') or combined.startswith('372'):
+                            return combined
+                        elif not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
+                            return combined
+
+    return None
+
+
+def extract_amount(text):
+    """从OCR文本中提取金额"""
+    for pattern in AMOUNT_PATTERNS:
+        matches = pattern.findall(text)
+        if matches:
+            return float(matches[0])
+
+    all_numbers = DECIMAL_NUMBER.findall(text)
+    if all_numbers:
+        valid_amounts = [float(num) for num in all_numbers if MIN_AMOUNT <= float(num) < MAX_AMOUNT]
+        if valid_amounts:
+            return max(valid_amounts)
+
+    return None
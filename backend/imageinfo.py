@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片尺寸读取 - 只解析PNG/JPEG文件头，不解码图片
+"""
+
+import struct
+
+from mapped_file import is_path, as_file
+
+# JPEG中携带图片尺寸的SOF标记（排除DHT/JPG/DAC）
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # 无长度字段的标记
+        if marker == 0xD9 or marker == 0xDA:
+            return None  # 图像数据开始前未找到SOF
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack('>H', header)[0]
+        if marker in _SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def image_size(source):
+    """返回图片的 (宽, 高)，格式不支持或文件损坏时返回None
+
+    source可以是文件路径，也可以是已读入的bytes/mmap（不再重新打开文件）。
+    """
+    try:
+        if is_path(source):
+            with open(source, 'rb') as f:
+                return _image_size(f)
+        return _image_size(as_file(source))
+    except (OSError, struct.error):
+        return None
+
+
+def _image_size(f):
+    head = f.read(24)
+    if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+        return struct.unpack('>II', head[16:24])
+    if head.startswith(b'\xff\xd8'):
+        return _jpeg_size(f)
+    return None
+
+
+def image_pixels(path):
+    """图片像素数，无法读取尺寸时返回None"""
+    size = image_size(path)
+    return size[0] * size[1] if size else None
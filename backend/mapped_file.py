@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存映射读取 - 每张图片只映射一次，哈希、读取尺寸、缩放和OCR共用同一块内存
+
+- 哈希一次性交给hashlib（C实现，释放GIL），不再按4KB分块在Python中循环读取
+- mmap对象同时支持缓冲区协议和文件接口（read/seek），可以直接传给PIL和tesseract的stdin
+- 空文件、特殊文件等无法映射时退回到一次性读取为bytes
+
+只映射本程序自己写入、处理期间不会改动的文件（上传目录、worker下发的临时目录），调用方传入immutable=True。
+映射中的文件被截断或改写（用户监视的文件夹里替换了图片、网络文件系统出错）时，访问映射内存会触发SIGBUS，
+整个进程（gunicorn worker、监视进程）直接崩溃，无法作为Python异常处理；其他文件一律一次性读取为bytes。
+
+环境变量 OCR_READ_MODE=path 时tesseract改为自己按路径读取文件（用于对比测试）；
+OCR_MMAP=0 时所有文件都不映射（上传目录在网络文件系统上时使用）。
+"""
+
+import io
+import os
+import mmap
+import hashlib
+from contextlib import contextmanager
+
+OCR_READ_MODE = os.environ.get('OCR_READ_MODE', 'mmap')
+OCR_MMAP = os.environ.get('OCR_MMAP', '1') != '0'
+
+
+@contextmanager
+def open_mapped(path, immutable=False):
+    """读取文件内容，返回的对象在with块结束后失效
+
+    immutable=True（文件不会在处理期间被截断或改写）且未设置OCR_MMAP=0时只读映射，否则一次性读取为bytes。
+    """
+    with open(path, 'rb') as f:
+        if not (immutable and OCR_MMAP):
+            yield f.read()
+            return
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # 空文件或不支持映射的文件系统
+            yield f.read()
+            return
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def file_digest(path, algorithm='md5', immutable=False):
+    """计算文件摘要（16字节MD5），immutable见open_mapped"""
+    with open_mapped(path, immutable) as buffer:
+        return hashlib.new(algorithm, buffer).digest()
+
+
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def as_file(source):
+    """把bytes或mmap包装为从头读取的文件对象（路径原样返回）"""
+    if is_path(source):
+        return source
+    if isinstance(source, mmap.mmap):
+        source.seek(0)
+        return source
+    return io.BytesIO(source)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus指标 - OCR热点路径的耗时和计数
+
+gunicorn多worker部署时需设置环境变量 PROMETHEUS_MULTIPROC_DIR（见gunicorn.conf.py），
+各worker的指标写入该目录，/api/metrics 汇总所有worker的数据。
+未安装prometheus_client时所有指标为空操作，不影响OCR处理。
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# tesseract单次调用耗时分桶（秒）
+OCR_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 12, 15, 20, 30, 45, 60)
+# 哈希、排队等短耗时分桶（秒）
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# 任务吞吐（张/秒）分桶
+RATE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class _NoopMetric:
+    """未安装prometheus_client时使用的空指标"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if prometheus_client is not None:
+    TESSERACT_SECONDS = Histogram(
+        'hhg_ocr_tesseract_seconds', 'tesseract单次调用耗时', ['mode'], buckets=OCR_BUCKETS)
+    HASH_SECONDS = Histogram(
+        'hhg_ocr_hash_seconds', '文件哈希耗时', buckets=FAST_BUCKETS)
+    QUEUE_WAIT_SECONDS = Histogram(
+        'hhg_ocr_queue_wait_seconds', '图片从提交到开始处理的排队时间', buckets=FAST_BUCKETS + (10, 30, 60))
+    CACHE_REQUESTS = Counter(
+        'hhg_ocr_cache_requests_total', 'OCR缓存查询次数', ['result'])
+    IMAGES = Counter(
+        'hhg_ocr_images_total', '处理的图片数', ['outcome'])
+    DEEP_FALLBACKS = Counter(
+        'hhg_ocr_deep_fallback_total', '常规识别失败后进入深度识别的图片数')
+    QUARANTINED = Counter(
+        'hhg_ocr_quarantined_total', '识别超时后进入隔离队列的图片数')
+    DOWNSCALE_RETRIES = Counter(
+        'hhg_ocr_downscale_retry_total', '缩小后识别失败、用原图重新识别的图片数')
+    BLOOM_LOOKUPS = Counter(
+        'hhg_order_bloom_lookups_total', '订单号布隆过滤器查询结果（误判率 = false_positive / (false_positive + negative)）',
+        ['result'])
+    TASK_IMAGES_PER_SECOND = Histogram(
+        'hhg_task_images_per_second', '每个任务的处理吞吐（张/秒）', buckets=RATE_BUCKETS)
+    TASK_SECONDS = Histogram(
+        'hhg_task_duration_seconds', '每个任务的总耗时', buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+    ACTIVE_TASKS = Gauge(
+        'hhg_active_tasks', '每个worker正在处理的任务数', multiprocess_mode='liveall')
+    FIRST_OCR_SECONDS = Gauge(
+        'hhg_first_ocr_seconds', '每个worker的首次OCR：启动后的等待时间（since_start）和识别耗时（ocr）',
+        ['stage'], multiprocess_mode='liveall')
+else:
+    TESSERACT_SECONDS = HASH_SECONDS = QUEUE_WAIT_SECONDS = _NoopMetric()
+    CACHE_REQUESTS = IMAGES = DEEP_FALLBACKS = QUARANTINED = DOWNSCALE_RETRIES = BLOOM_LOOKUPS = _NoopMetric()
+    TASK_IMAGES_PER_SECOND = TASK_SECONDS = ACTIVE_TASKS = FIRST_OCR_SECONDS = _NoopMetric()
+
+
+@contextmanager
+def timed(metric):
+    """记录代码块耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+def render():
+    """生成指标文本，返回 (内容, Content-Type)；未安装prometheus_client时返回None"""
+    if prometheus_client is None:
+        return None, None
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """worker退出时清理其存活类指标（在gunicorn child_exit钩子中调用）"""
+    if prometheus_client is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
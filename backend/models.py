@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+识别结果数据模型 - 紧凑的结果记录，在整个处理流程中传递而不复制
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from serializer import dumps
+
+
+def to_cents(amount):
+    """金额（元）转换为整数分"""
+    if amount is None:
+        return None
+    return int(round(amount * 100))
+
+
+class ImageRecord(NamedTuple):
+    """单张图片的识别结果
+
+    - relative_path: 相对于源文件夹的路径（不保存Path对象）
+    - amount_cents: 金额，单位为分（整数，避免浮点误差）
+    - folder: 所属文件夹（驻留字符串，同一文件夹的记录共享同一个对象）
+    """
+    type: str
+    relative_path: str
+    order_number: Optional[str] = None
+    amount_cents: Optional[int] = None
+    folder: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def create(cls, type, relative_path, order_number=None, amount=None, folder=None, error=None):
+        """由识别得到的元金额创建记录"""
+        return cls(
+            type,
+            relative_path,
+            order_number,
+            to_cents(amount),
+            sys.intern(folder) if folder else folder,
+            error,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        """从磁盘记录（JSON数组）恢复"""
+        record = cls(*row)
+        if record.folder:
+            record = record._replace(folder=sys.intern(record.folder))
+        return record
+
+    @property
+    def amount(self):
+        """金额（元）"""
+        if self.amount_cents is None:
+            return None
+        return self.amount_cents / 100
+
+    @property
+    def filename(self):
+        """文件名"""
+        return os.path.basename(self.relative_path)
+
+    def resolve(self, source_folder):
+        """还原为源文件的绝对路径"""
+        return Path(source_folder) / self.relative_path
+
+    def to_json(self):
+        """编码为紧凑JSON数组（bytes）"""
+        return dumps(tuple(self))
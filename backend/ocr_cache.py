@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR结果缓存 - 后端和命令行工具（ocr_deduplicate.py、ocr.py）共用的一份缓存
+
+按图片内容的MD5摘要和引擎名保存识别结果，与文件路径、任务无关：
+命令行识别过的图片上传到后端时直接命中，同一张图片在不同任务中也只识别一次。
+SQLite（WAL）存储，多个gunicorn worker和命令行进程可以同时读写。
+
+命令行工具反复扫描同一目录，files表按 路径+大小+修改时间 记录摘要，未变化的文件无需重新计算。
+只识别出金额的图片（ocr.py只需要金额）订单号保存为空字符串，默认查询不返回这些结果。
+
+环境变量 OCR_CACHE_DB 设置缓存数据库路径（默认 backend/results/ocr_cache.sqlite3）。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+from mapped_file import file_digest
+
+OCR_CACHE_DB = os.environ.get('OCR_CACHE_DB') or str(Path(__file__).resolve().parent / 'results' / 'ocr_cache.sqlite3')
+# 每条SQL中最多的参数个数（SQLite默认上限999）
+BATCH_SIZE = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    digest        BLOB NOT NULL,
+    engine        TEXT NOT NULL,
+    order_number  TEXT NOT NULL,
+    amount_cents  INTEGER NOT NULL,
+    ocr_time      TEXT NOT NULL,
+    PRIMARY KEY (digest, engine)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    digest    BLOB NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class CachedResult:
+    """缓存的识别结果"""
+    __slots__ = ('order_number', 'amount', 'ocr_time')
+
+    def __init__(self, order_number, amount_cents, ocr_time):
+        self.order_number = order_number
+        self.amount = amount_cents / 100
+        self.ocr_time = ocr_time
+
+
+class OCRCache:
+    def __init__(self, path=OCR_CACHE_DB, engine='tesseract'):
+        self.path = Path(path)
+        self.engine = engine
+        self.local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 建表使用临时连接，不缓存（gunicorn preload时在主进程执行，连接不能带到fork后的worker中）
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self):
+        """每个线程复用一个连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def get(self, digest):
+        """按16字节摘要查询，未缓存时返回None"""
+        return self.get_many([digest]).get(digest)
+
+    def get_many(self, digests, amount_only=False):
+        """批量查询，返回 {摘要: CachedResult}，只包含已缓存的
+
+        amount_only为False时不返回没有订单号的结果（需要订单号去重的调用方按未缓存重新识别）。
+        """
+        found = {}
+        conn = self.connect()
+        digests = list(digests)
+        for start in range(0, len(digests), BATCH_SIZE):
+            batch = digests[start:start + BATCH_SIZE]
+            rows = conn.execute(
+                f'SELECT digest, order_number, amount_cents, ocr_time FROM results '
+                f'WHERE engine = ? AND digest IN ({",".join("?" * len(batch))})'
+                + ('' if amount_only else " AND order_number != ''"),
+                [self.engine, *batch]
+            ).fetchall()
+            for digest, order_number, amount_cents, ocr_time in rows:
+                found[digest] = CachedResult(order_number, amount_cents, ocr_time)
+        return found
+
+    def put(self, digest, order_number, amount):
+        """保存识别结果（金额单位为元，订单号为空时只保存金额），返回识别时间"""
+        ocr_time = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results (digest, engine, order_number, amount_cents, ocr_time) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (digest, self.engine, order_number or '', int(round(amount * 100)), ocr_time)
+            )
+        return ocr_time
+
+    def digest_for(self, path):
+        """文件的MD5摘要；大小和修改时间未变化时直接使用上次记录的摘要"""
+        path = str(path)
+        stat = os.stat(path)
+        conn = self.connect()
+        row = conn.execute('SELECT size, mtime_ns, digest FROM files WHERE path = ?', (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = file_digest(path)
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+        return digest
+
+    def count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM results WHERE engine = ?', (self.engine,)).fetchone()[0]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(engine=None):
+    """本进程共享的缓存（按引擎区分，模拟引擎的结果不会混入真实识别结果）
+
+    命令行工具不导入engines.py，默认按环境变量OCR_ENGINE选择（与engines.py相同）。
+    """
+    engine = engine or os.environ.get('OCR_ENGINE', 'tesseract')
+    with _caches_lock:
+        if engine not in _caches:
+            _caches[engine] = OCRCache(OCR_CACHE_DB, engine)
+        return _caches[engine]
@@ -1,321 +1,360 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-OCR服务 - 从ocr_deduplicate.py改造而来
+OCR服务 - 批量任务：哈希去重、查询共享缓存、并发识别、按订单号去重、生成结果文件
+
+单张图片的识别见recognizer.py（与命令行工具共用）。
 """
 
-import re
-import subprocess
 import shutil
+import sqlite3
 import hashlib
-import json
-import concurrent.futures
+import time
+import threading
+import functools
+import itertools
 from pathlib import Path
-from collections import defaultdict
-from datetime import datetime
 
-class OCRService:
-    def __init__(self, source_folder, result_folder):
+from models import ImageRecord, to_cents
+from broker import get_broker
+from recognizer import Recognizer
+from ocr_cache import get_cache
+from result_store import ResultStore, LiveResults
+from scheduler import get_scheduler, DEFAULT_PRIORITY
+from mapped_file import open_mapped, file_digest
+from timeouts import OCRTimeout
+from serializer import dumps, loads, load_file, atomic_write
+from tracing import TaskProfiler, PROFILE_MODE
+import concurrent.futures
+import metrics
+
+# 本进程的OCR线程数（所有任务共用，见scheduler.py）
+OCR_WORKERS = 4
+# 同时在途的最大任务数（滑动窗口），避免一次性为全部图片创建future
+MAX_IN_FLIGHT = OCR_WORKERS * 8
+# 结果列表在内存中最多保留的条数，超出部分写入磁盘
+SPILL_THRESHOLD = 2000
+# 隔离队列重试时每个任务同时在途的图片数
+QUARANTINE_WORKERS = max(1, OCR_WORKERS // 2)
+# 分发模式下轮询队列结果的间隔，以及无进展多久后提示检查worker（秒）
+DISPATCH_POLL_INTERVAL = 0.5
+DISPATCH_IDLE_WARNING = 60
+# 分发模式下无进展且没有worker持有租约多久后，收回未领取的分片改为本机识别（秒）
+DISPATCH_FALLBACK = 300
+
+
+class ResultSpool:
+    """结果列表的磁盘溢出存储：内存中只保留少量记录，超出部分追加写入JSONL文件"""
+
+    def __init__(self, path, threshold=SPILL_THRESHOLD):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.buffer = []
+        self.spilled = 0
+        if self.path.exists():
+            self.path.unlink()
+
+    def append(self, item):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.threshold:
+            self.flush()
+
+    def flush(self):
+        """将内存中的记录追加写入磁盘"""
+        if not self.buffer:
+            return
+        with open(self.path, 'ab') as f:
+            for item in self.buffer:
+                f.write(item.to_json())
+                f.write(b'\n')
+        self.spilled += len(self.buffer)
+        self.buffer = []
+
+    def __len__(self):
+        return self.spilled + len(self.buffer)
+
+    def __iter__(self):
+        if self.spilled:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    yield ImageRecord.from_row(loads(line))
+        yield from self.buffer
+
+    def cleanup(self):
+        """删除磁盘上的临时文件"""
+        self.buffer = []
+        self.spilled = 0
+        if self.path.exists():
+            self.path.unlink()
+
+
+class OrderDedup:
+    """按订单号去重并按金额排序：记录写入结果目录下的临时SQLite，查询时逐行读取，内存占用与订单数无关
+    
+    同一订单号第一次出现的记录保留，之后出现的为重复；订单按金额从大到小、金额相同时按出现顺序排列。
+    使用完毕后由调用方cleanup()。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.unlink(missing_ok=True)
+        # 自动提交模式：读取订单的同时可以写入之前出现过的订单号
+        self.conn = sqlite3.connect(str(self.path), isolation_level=None)
+        self.conn.executescript('''
+            PRAGMA journal_mode=OFF;
+            PRAGMA synchronous=OFF;
+            CREATE TABLE records (
+                seq INTEGER PRIMARY KEY, type TEXT, relative_path TEXT, order_number TEXT,
+                amount_cents INTEGER, folder TEXT, error TEXT, first INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE seen (
+                order_number TEXT PRIMARY KEY, task_id TEXT, amount_cents INTEGER, relative_path TEXT, seen_at TEXT
+            );
+        ''')
+
+    def load(self, records):
+        """写入识别成功的记录（按出现顺序），标记每个订单号第一次出现的记录"""
+        self.conn.execute('BEGIN')
+        records = iter(records)
+        while True:
+            batch = [tuple(record) for _, record in zip(range(SPILL_THRESHOLD), records)]
+            if not batch:
+                break
+            self.conn.executemany('INSERT INTO records VALUES (NULL, ?, ?, ?, ?, ?, ?, 0)', batch)
+        self.conn.execute('CREATE INDEX records_order ON records (order_number, seq)')
+        self.conn.execute('UPDATE records SET first = 1 WHERE seq IN (SELECT MIN(seq) FROM records GROUP BY order_number)')
+        self.conn.execute('CREATE INDEX records_rank ON records (first, amount_cents DESC, seq)')
+        self.conn.execute('COMMIT')
+
+    def summary(self):
+        """返回 (唯一订单数, 有重复的订单号数, 金额合计（分）)"""
+        unique_count, total_cents = self.conn.execute(
+            'SELECT COUNT(*), SUM(amount_cents) FROM records WHERE first = 1'
+        ).fetchone()
+        duplicate_count = self.conn.execute(
+            'SELECT COUNT(DISTINCT order_number) FROM records WHERE first = 0'
+        ).fetchone()[0]
+        return unique_count, duplicate_count, total_cents or 0
+
+    def _rows(self, sql, params=()):
+        cursor = self.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(SPILL_THRESHOLD)
+            if not rows:
+                break
+            yield from rows
+
+    def iter_orders(self):
+        """按金额从大到小逐个读取保留的订单（ImageRecord）"""
+        for row in self._rows(
+            'SELECT type, relative_path, order_number, amount_cents, folder, error FROM records '
+            'WHERE first = 1 ORDER BY amount_cents DESC, seq'
+        ):
+            yield ImageRecord.from_row(row)
+
+    def iter_order_details(self):
+        """同iter_orders，另外返回 (ImageRecord, 本任务中的重复数, 之前出现的信息或None)"""
+        for row in self._rows(
+            'SELECT r.type, r.relative_path, r.order_number, r.amount_cents, r.folder, r.error, '
+            '(SELECT COUNT(*) FROM records d WHERE d.order_number = r.order_number) - 1, '
+            's.task_id, s.amount_cents, s.relative_path, s.seen_at '
+            'FROM records r LEFT JOIN seen s ON s.order_number = r.order_number '
+            'WHERE r.first = 1 ORDER BY r.amount_cents DESC, r.seq'
+        ):
+            seen_task, seen_cents, seen_path, seen_at = row[7:]
+            seen = {
+                'task_id': seen_task, 'amount': seen_cents / 100, 'relative_path': seen_path, 'seen_at': seen_at
+            } if seen_task is not None else None
+            yield ImageRecord.from_row(row[:6]), row[6], seen
+
+    def iter_duplicates(self):
+        """按重复第一次出现的顺序逐组读取 (订单号, 保留的记录, [重复的记录])"""
+        rows = self._rows(
+            'SELECT r.type, r.relative_path, r.order_number, r.amount_cents, r.folder, r.error FROM records r '
+            'JOIN (SELECT order_number, MIN(seq) AS first_duplicate FROM records WHERE first = 0 '
+            '      GROUP BY order_number) g ON g.order_number = r.order_number '
+            'ORDER BY g.first_duplicate, r.seq'
+        )
+        for order_number, group in itertools.groupby(rows, key=lambda row: row[2]):
+            kept, *duplicates = (ImageRecord.from_row(row) for row in group)
+            yield order_number, kept, duplicates
+
+    def add_seen(self, items):
+        """记录之前的任务中出现过的订单号：items为 (订单号, {'task_id', 'amount', 'relative_path', 'seen_at'})"""
+        items = iter(items)
+        while True:
+            batch = [
+                (order_number, info['task_id'], to_cents(info['amount']), info['relative_path'], info['seen_at'])
+                for _, (order_number, info) in zip(range(SPILL_THRESHOLD), items)
+            ]
+            if not batch:
+                break
+            self.conn.executemany('INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?, ?)', batch)
+
+    def seen_summary(self):
+        """返回 (之前出现过的订单数, 这些订单在本任务中的金额合计（分）)"""
+        count, cents = self.conn.execute(
+            'SELECT COUNT(*), SUM(r.amount_cents) FROM seen s JOIN records r '
+            'ON r.order_number = s.order_number AND r.first = 1'
+        ).fetchone()
+        return count, cents or 0
+
+    def cleanup(self):
+        """关闭并删除临时数据库"""
+        self.conn.close()
+        self.path.unlink(missing_ok=True)
+
+
+class OCRService(Recognizer):
+    def __init__(self, source_folder, result_folder, progress_callback=None, profile=PROFILE_MODE, engine=None,
+                 order_index=None, task_id=None, broker=None, priority=DEFAULT_PRIORITY, cache=None,
+                 immutable_source=True):
+        # OCR引擎、自适应超时、策略链、缩放档位和耗时追踪（见recognizer.py）
+        super().__init__(engine)
         self.source_folder = Path(source_folder)
+        # 源文件夹是否为本程序写入、处理期间不会改动的目录（上传目录）：是时按内存映射读取图片，
+        # 否则一次性读取（映射的文件被截断会触发SIGBUS，见mapped_file.py）
+        self.immutable_source = immutable_source
+        # 跨任务的订单号索引（可选），task_id默认为结果文件夹名
+        self.order_index = order_index
+        self.task_id = task_id or Path(result_folder).name
+        # 任务优先级（low / normal / high），决定在共享OCR线程中的权重
+        self.priority = priority
+        # 分片队列（设置OCR_BROKER时由ocr_worker.py进程识别，否则本机线程池识别）
+        self.broker = broker if broker is not None else get_broker()
+        # 识别超时的图片数（在主批次完成后重试）
+        self.quarantined_count = 0
+        # 进度回调：progress_callback(已处理数, 总数, 缓存命中数)
+        self.progress_callback = progress_callback
+        # 可选的性能分析（cprofile / pyinstrument）
+        self.profile = profile
+        self.profiler = None
         self.result_folder = Path(result_folder)
         self.deduped_folder = self.result_folder / 'deduped'
         self.deduped_folder.mkdir(exist_ok=True)
         
-        # 缓存文件路径
+        # 共享的OCR结果缓存（按图片内容，后端各任务和命令行工具共用），
+        # 本任务用到的记录另外导出为ocr_cache.json供下载
+        self.cache = cache or get_cache(self.engine.name)
         self.cache_file = self.result_folder / 'ocr_cache.json'
-        self.cache = self.load_cache()
+        self.cache_entries = {}
+        self.cache_lock = threading.Lock()
+        # 完整结果文件路径（订单、重复、失败列表写入磁盘，不常驻内存）
+        self.result_file = self.result_folder / 'result.json'
+        # 去重订单的索引库（导出等逐行读取订单的接口使用）
+        self.result_store = ResultStore(self.result_folder)
+        # 处理中已识别的图片（前端增量显示），写入结果库后删除
+        self.live_results = LiveResults(self.result_folder)
+        self.trace_file = self.result_folder / 'trace.json'
+        self.archive_file = self.result_folder / 'deduped.zip'
     
-    def get_file_fingerprint(self, file_path):
-        """生成文件指纹（路径+大小+修改时间）"""
+    def describe(self, image_file):
+        """图片的显示名（相对路径）和所属文件夹"""
         try:
-            stat = file_path.stat()
-            relative_path = str(file_path.relative_to(self.source_folder))
-            fingerprint = f"{relative_path}:{stat.st_size}:{stat.st_mtime}"
-            return hashlib.md5(fingerprint.encode()).hexdigest()
-        except:
-            return None
+            relative_path = image_file.relative_to(self.source_folder)
+            folder_path = str(relative_path.parent) if relative_path.parent != Path('.') else '根目录'
+            return str(relative_path), folder_path
+        except ValueError:
+            return str(image_file), image_file.parent.name
     
-    def load_cache(self):
-        """加载OCR缓存"""
-        if not self.cache_file.exists():
-            return {}
-        
-        try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                print(f"✓ 加载缓存: {len(cache)} 条记录")
-                return cache
-        except Exception as e:
-            print(f"✗ 加载缓存失败: {e}")
-            return {}
-    
-    def save_cache(self):
-        """保存OCR缓存"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-                print(f"✓ 缓存已保存: {len(self.cache)} 条记录")
-        except Exception as e:
-            print(f"✗ 保存缓存失败: {e}")
-    
-    def is_cached(self, file_path):
-        """检查文件是否已缓存"""
-        fingerprint = self.get_file_fingerprint(file_path)
-        if not fingerprint:
-            return False
-        
-        if fingerprint in self.cache:
-            cached_data = self.cache[fingerprint]
-            # 验证缓存数据的完整性
-            if all(key in cached_data for key in ['order_number', 'amount', 'folder', 'relative_path', 'ocr_time']):
-                return True
-        
-        return False
-    
-    def get_cached_result(self, file_path):
-        """获取缓存的识别结果"""
-        fingerprint = self.get_file_fingerprint(file_path)
-        if fingerprint and fingerprint in self.cache:
-            return self.cache[fingerprint]
-        return None
-    
-    def cache_result(self, file_path, order_number, amount, folder, relative_path):
-        """缓存识别结果"""
-        fingerprint = self.get_file_fingerprint(file_path)
-        if fingerprint:
-            self.cache[fingerprint] = {
+    def cache_result(self, digest, order_number, amount, folder, relative_path, ocr_time=None):
+        """缓存识别结果（ocr_time不为空时为已缓存的结果，只记入本任务的导出）"""
+        if ocr_time is None:
+            try:
+                ocr_time = self.cache.put(digest, order_number, amount)
+            except sqlite3.Error as e:
+                print(f"✗ 写入OCR缓存失败: {e}")
+                return
+        with self.cache_lock:
+            self.cache_entries[digest.hex()] = {
                 'order_number': order_number,
                 'amount': amount,
                 'folder': folder,
                 'relative_path': relative_path,
-                'ocr_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'ocr_time': ocr_time,
             }
     
-    def get_file_hash(self, file_path):
-        """计算文件的MD5哈希值"""
-        hash_md5 = hashlib.md5()
+    def cached_record(self, image_file, digest, cached):
+        """由缓存命中的结果生成记录"""
+        display_name, folder_path = self.describe(image_file)
+        metrics.CACHE_REQUESTS.labels('hit').inc()
+        print(f"✓ 使用缓存: {display_name}")
+        self.cache_result(digest, cached.order_number, cached.amount, folder_path, display_name, cached.ocr_time)
+        return ImageRecord.create(
+            'cached',
+            display_name,
+            order_number=cached.order_number,
+            amount=cached.amount,
+            folder=folder_path
+        )
+    
+    def save_cache(self):
+        """导出本任务用到的缓存记录（ocr_cache.json，按图片MD5索引）"""
+        if not self.cache_entries:
+            return
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            with self.cache_lock:
+                atomic_write(self.cache_file, dumps(self.cache_entries))
+            print(f"✓ 缓存已保存: {len(self.cache_entries)} 条记录")
         except Exception as e:
-            print(f"计算文件哈希失败: {file_path} - {e}")
-            return None
+            print(f"✗ 保存缓存失败: {e}")
     
-    def ocr_image(self, image_path):
-        """使用tesseract识别图片文字"""
+    def get_file_hash(self, file_path, raw=False):
+        """计算文件的MD5哈希值（raw=True时返回16字节摘要，节省内存）"""
         try:
-            result = subprocess.run(
-                ['tesseract', str(image_path), 'stdout', '-l', 'chi_sim+eng'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            return result.stdout
-        except:
-            # 如果中文失败，尝试仅英文
-            try:
-                result = subprocess.run(
-                    ['tesseract', str(image_path), 'stdout'],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
-                return result.stdout
-            except Exception as e:
-                return ""
-    
-    def ocr_image_deep(self, image_path):
-        """深度OCR - 使用多种PSM模式"""
-        texts = []
-        
-        # 尝试不同的PSM模式
-        for psm in ['6', '11', '12']:
-            try:
-                result = subprocess.run(
-                    ['tesseract', str(image_path), 'stdout', '--psm', psm],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
-                texts.append(result.stdout)
-            except:
-                pass
-        
-        return "\n".join(texts)
-    
-    def extract_order_number(self, text):
-        """从OCR文本中提取订单编号 - 支持跨行识别"""
-        # 先尝试常规匹配（单行完整订单号）
-        patterns = [
-            r'订单号[:：\s]*([0-9A-Za-z]{18,32})',
-            r'单号[:：\s]*([0-9A-Za-z]{18,32})',
-            r'订单编号[:：\s]*([0-9A-Za-z]{18,32})',
-            r'商户订单号[:：\s]*([0-9A-Za-z]{18,32})',
-            r'交易单号[:：\s]*([0-9A-Za-z]{18,32})',
-            r'\b([0-9]{20,32})\b',
-            r'\b([0-9A-Za-z]{24,32})\b',
-        ]
-        
-        # 首先尝试常规单行匹配
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                order_num = matches[0].strip()
-                # 过滤掉一些常见的误识别（如日期、时间等）
-                if len(order_num) >= 18 and not order_num.startswith('2025') and not order_num.startswith('2024'):
-                    return order_num
-        
-        # 如果单行匹配失败，尝试跨行拼接
-        lines = text.split('\n')
-        
-        for i, line in enumerate(lines):
-            # 查找包含"订单号"等关键词的行
-            if re.search(r'订单号|单号|订单编号|商户订单号|交易单号', line, re.IGNORECASE):
-                # 提取当前行的数字字母部分
-                current_line_numbers = re.findall(r'[:：\s]*([0-9A-Za-z]+)', line)
-                
-                # 如果当前行有数字，且长度不够（可能被截断）
-                for num in current_line_numbers:
-                    if len(num) >= 10 and len(num) < 32:
-                        # 检查下一行是否有继续的数字
-                        if i + 1 < len(lines):
-                            next_line = lines[i + 1].strip()
-                            next_numbers = re.findall(r'^([0-9A-Za-z]+)', next_line)
-                            
-                            if next_numbers:
-                                # 拼接两行的订单号
-                                combined = num + next_numbers[0]
-                                # 验证拼接后的长度是否合理
-                                if 18 <= len(combined) <= 32:
-                                    if not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
-                                        return combined
-        
-        # 查找可能跨行的长数字串
-        for i in range(len(lines) - 1):
-            line = lines[i].strip()
-            next_line = lines[i + 1].strip()
-            
-            line_no_space = ''.join(re.findall(r'[0-9A-Za-z]+', line))
-            
-            end_match = re.search(r'([0-9A-Za-z]{10,})$', line_no_space)
-            if end_match:
-                end_part = end_match.group(1)
-                
-                start_match = re.search(r'^([0-9A-Za-z]{4,})', next_line)
-                if start_match:
-                    start_part = start_match.group(1)
-                    
-                    combined = end_part + start_part
-                    
-                    if 18 <= len(combined) <= 32:
-                        digit_ratio = sum(c.isdigit() for c in combined) / len(combined)
-                        if digit_ratio >= 0.7:
-                            if combined.startswith('4200') or combined.startswith('1000') or combined.startswith('372'):
-                                return combined
-                            elif not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
-                                return combined
-        
-        return None
+            with metrics.timed(metrics.HASH_SECONDS):
+                digest = file_digest(file_path, immutable=self.immutable_source)
+            return digest if raw else digest.hex()
+        except Exception as e:
+            print(f"计算文件哈希失败: {file_path} - {e}")
+            return None
     
-    def extract_amount(self, text):
-        """从OCR文本中提取金额"""
-        patterns = [
-            r'-(\d+\.\d{2})',
-            r'¥(\d+\.\d{2})',
-            r'￥(\d+\.\d{2})',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                return float(matches[0])
-        
-        all_numbers = re.findall(r'\b(\d+\.\d{2})\b', text)
-        if all_numbers:
-            valid_amounts = [float(num) for num in all_numbers if 0.01 <= float(num) < 100000]
-            if valid_amounts:
-                return max(valid_amounts)
-        
-        return None
+    def process_single_image(self, image_file, quarantine=False):
+        """处理单个图片（用于并发处理，调用方已排除重复文件）
+        
+        识别超时返回类型为timeout的记录，由调用方放入隔离队列；
+        quarantine=True时为隔离队列重试，使用宽松的固定超时，超时记为失败。
+        """
+        with self.tracer.span('image', 'image', file=image_file.name, **({'quarantine': True} if quarantine else {})):
+            return self._process_single_image(image_file, quarantine)
     
-    def process_single_image(self, image_file):
-        """处理单个图片（用于并发处理）"""
+    def _process_single_image(self, image_file, quarantine=False):
+        display_name = image_file.name
         try:
-            # 检查是否为重复文件
-            file_hash = self.get_file_hash(image_file)
-            is_duplicate = file_hash in self.duplicate_files
-            
-            # 计算相对路径，保持文件夹结构
-            try:
-                relative_path = image_file.relative_to(self.source_folder)
-                folder_path = str(relative_path.parent) if relative_path.parent != Path('.') else '根目录'
-                display_name = str(relative_path)
-            except:
-                folder_path = image_file.parent.name
-                display_name = image_file.name
-            
-            if is_duplicate:
-                return {'type': 'duplicate', 'file': image_file, 'display_name': display_name}
-            
-            # 检查缓存
-            if self.is_cached(image_file):
-                cached_result = self.get_cached_result(image_file)
-                if cached_result:
-                    print(f"✓ 使用缓存: {display_name}")
-                    return {
-                        'type': 'cached',
-                        'file': image_file,
-                        'order_number': cached_result['order_number'],
-                        'amount': cached_result['amount'],
-                        'folder': cached_result['folder'],
-                        'relative_path': cached_result['relative_path'],
-                        'display_name': display_name
-                    }
+            display_name, folder_path = self.describe(image_file)
             
             # 进行OCR识别
+            metrics.CACHE_REQUESTS.labels('miss').inc()
             print(f"🔍 OCR识别: {display_name}")
             
-            # 第一轮：常规OCR
-            ocr_text = self.ocr_image(image_file)
-            
-            order_number = self.extract_order_number(ocr_text)
-            amount = self.extract_amount(ocr_text)
-            
-            # 如果常规OCR失败，尝试深度OCR
-            if order_number is None or amount is None:
-                print(f"  → 常规识别失败，尝试深度识别...")
-                deep_text = self.ocr_image_deep(image_file)
-                
-                combined_text = ocr_text + "\n" + deep_text
-                
-                if order_number is None:
-                    order_number = self.extract_order_number(combined_text)
-                if amount is None:
-                    amount = self.extract_amount(combined_text)
+            # 图片只映射一次，读取尺寸、缩放、各轮OCR和缓存摘要共用同一块内存
+            with open_mapped(image_file, self.immutable_source) as buffer:
+                order_number, amount = self.recognize_image(image_file, buffer, quarantine)
+                if order_number and amount:
+                    self.cache_result(hashlib.md5(buffer).digest(), order_number, amount, folder_path, display_name)
             
             if order_number and amount:
-                # 缓存结果
-                self.cache_result(image_file, order_number, amount, folder_path, display_name)
-                
                 print(f"  ✓ 订单号: {order_number} (长度:{len(order_number)}), 金额: ¥{amount:.2f}")
-                return {
-                    'type': 'success',
-                    'file': image_file,
-                    'order_number': order_number,
-                    'amount': amount,
-                    'folder': folder_path,
-                    'relative_path': display_name,
-                    'display_name': display_name
-                }
+                return ImageRecord.create(
+                    'success',
+                    display_name,
+                    order_number=order_number,
+                    amount=amount,
+                    folder=folder_path
+                )
             else:
                 print(f"  ✗ 识别失败 - 订单号: {order_number or '无'}, 金额: {amount or '无'}")
-                return {'type': 'failed', 'file': image_file, 'display_name': display_name}
+                return ImageRecord.create('failed', display_name)
                 
+        except OCRTimeout as e:
+            if quarantine:
+                print(f"  ✗ 隔离重试仍超时: {display_name}")
+                return ImageRecord.create('failed', display_name, error=str(e))
+            print(f"  ⏱ {e}，稍后重试: {display_name}")
+            return ImageRecord.create('timeout', display_name, error=str(e))
         except Exception as e:
             print(f"  ✗ 处理异常: {image_file.name} - {e}")
-            return {'type': 'error', 'file': image_file, 'error': str(e)}
+            return ImageRecord.create('error', display_name, error=str(e))
     
     def find_all_images(self):
         """递归查找所有图片，保持文件夹结构"""
@@ -326,95 +365,132 @@ class OCRService:
         
         return sorted(image_files)
     
+    def _queued_call(self, func, item, submitted_at):
+        """记录排队等待时间后执行"""
+        metrics.QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted_at)
+        return func(item)
+    
+    def iter_bounded(self, executor, func, items, window=MAX_IN_FLIGHT):
+        """滑动窗口并发：最多window个future在途，完成一个再提交一个，按完成顺序产出结果"""
+        in_flight = set()
+        for item in items:
+            in_flight.add(executor.submit(self._queued_call, func, item, time.perf_counter()))
+            if len(in_flight) >= window:
+                done, in_flight = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield future.result()
+        for future in concurrent.futures.as_completed(in_flight):
+            yield future.result()
+    
     def process_images(self, image_files):
-        """处理所有图片，提取订单号和金额，同时检测重复（支持缓存和并发）"""
-        results = []
-        failed_files = []
-        duplicate_files = {}  # {hash: [file1, file2, ...]}
+        """处理所有图片，提取订单号和金额，同时检测重复（支持缓存和并发）
         
-        total = len(image_files)
+        返回的results和failed_files为ResultSpool，超过SPILL_THRESHOLD条后溢出到磁盘，
+        使用完毕后由调用方cleanup()。
+        """
+        results = ResultSpool(self.result_folder / 'results.spool.jsonl')
+        failed_files = ResultSpool(self.result_folder / 'failed.spool.jsonl')
+        self.live_results.start()
+        duplicate_files = {}  # {hash: [file1, file2, ...]}，只记录真正重复的组
         
         # 第一步：计算所有文件的哈希值，检测重复
+        # 只保存16字节摘要，并与image_files按下标对应，第二步无需重新计算
         print("正在检测重复文件...")
-        file_hashes = {}
-        for image_file in image_files:
-            file_hash = self.get_file_hash(image_file)
+        file_hashes = {}  # {digest: 首次出现的文件下标}
+        digests = []
+        hash_start = time.perf_counter()
+        for idx, image_file in enumerate(image_files):
+            with self.tracer.span('hash', 'image'):
+                file_hash = self.get_file_hash(image_file, raw=True)
+            digests.append(file_hash)
             if file_hash:
                 if file_hash in file_hashes:
                     if file_hash not in duplicate_files:
-                        duplicate_files[file_hash] = [file_hashes[file_hash]]
+                        duplicate_files[file_hash] = [image_files[file_hashes[file_hash]]]
                     duplicate_files[file_hash].append(image_file)
                     print(f"发现重复文件: {image_file.name}")
                 else:
-                    file_hashes[file_hash] = image_file
+                    file_hashes[file_hash] = idx
+        file_hashes = None
+        self.tracer.add('hash', 'stage', hash_start, time.perf_counter() - hash_start)
         
-        self.duplicate_files = duplicate_files
+        # 第二步：按内容摘要批量查询共享缓存（命令行工具或其他任务识别过的图片直接使用结果）
+        with self.tracer.span('cache_lookup'):
+            try:
+                cached = self.cache.get_many({digest for digest in digests if digest and digest not in duplicate_files})
+            except sqlite3.Error as e:
+                print(f"✗ 查询OCR缓存失败: {e}")
+                cached = {}
         
-        # 第二步：并发处理非重复文件
+        # 第三步：并发处理非重复、未缓存的文件
         print("开始并发OCR识别...")
-        non_duplicate_files = []
-        for image_file in image_files:
-            file_hash = self.get_file_hash(image_file)
-            if file_hash not in duplicate_files:
-                non_duplicate_files.append(image_file)
+        total_duplicate_files = sum(len(files) for files in duplicate_files.values())
+        pending_total = len(image_files) - total_duplicate_files
         
         print(f"总文件数: {len(image_files)} 个")
-        print(f"需要处理的文件: {len(non_duplicate_files)} 个")
+        print(f"需要处理的文件: {pending_total} 个")
         print(f"重复文件组: {len(duplicate_files)} 组")
-        print(f"重复文件总数: {sum(len(files) for files in duplicate_files.values())} 个")
+        print(f"重复文件总数: {total_duplicate_files} 个")
         
         # 详细显示重复文件信息
         if duplicate_files:
             print("重复文件详情:")
             for hash_val, files in duplicate_files.items():
-                print(f"  哈希 {hash_val[:8]}...: {[f.name for f in files]}")
+                print(f"  哈希 {hash_val.hex()[:8]}...: {[f.name for f in files]}")
         
-        # 使用线程池并发处理
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            # 提交所有任务
-            future_to_file = {executor.submit(self.process_single_image, img): img for img in non_duplicate_files}
+        # 使用线程池并发处理，滑动窗口限制在途任务数
+        processed_count = 0
+        cached_count = 0
+        
+        def collect(result):
+            nonlocal processed_count, cached_count
+            processed_count += 1
+            metrics.IMAGES.labels(result.type).inc()
             
-            # 收集结果
-            processed_count = 0
-            cached_count = 0
-            for future in concurrent.futures.as_completed(future_to_file):
-                processed_count += 1
-                result = future.result()
-                
-                if result['type'] == 'success':
-                    results.append({
-                        'file': result['file'],
-                        'order_number': result['order_number'],
-                        'amount': result['amount'],
-                        'folder': result['folder'],
-                        'relative_path': result['relative_path'],
-                    })
-                elif result['type'] == 'cached':
-                    cached_count += 1
-                    results.append({
-                        'file': result['file'],
-                        'order_number': result['order_number'],
-                        'amount': result['amount'],
-                        'folder': result['folder'],
-                        'relative_path': result['relative_path'],
-                    })
-                elif result['type'] == 'failed':
-                    failed_files.append(result['file'])
-                elif result['type'] == 'error':
-                    failed_files.append(result['file'])
-                
-                # 显示进度
-                if processed_count % 10 == 0 or processed_count == len(non_duplicate_files):
-                    print(f"进度: {processed_count}/{len(non_duplicate_files)} (缓存: {cached_count})")
+            if result.type == 'success':
+                results.append(result)
+            elif result.type == 'cached':
+                cached_count += 1
+                results.append(result)
+            else:
+                failed_files.append(result)
+            self.live_results.append(result)
+            
+            # 显示进度
+            if processed_count % 10 == 0 or processed_count == pending_total:
+                print(f"进度: {processed_count}/{pending_total} (缓存: {cached_count})")
+                self.live_results.flush()
+                if self.progress_callback:
+                    self.progress_callback(processed_count, pending_total, cached_count)
+        
+        def uncached_files():
+            # 生成器，按需产出 (图片, 摘要)，不构建完整列表；缓存命中的图片直接计入结果
+            for image_file, file_hash in zip(image_files, digests):
+                if file_hash in duplicate_files:
+                    continue
+                if file_hash in cached:
+                    collect(self.cached_record(image_file, file_hash, cached[file_hash]))
+                else:
+                    yield image_file, file_hash
+        
+        if self.broker:
+            self.dispatch_files(uncached_files(), collect)
+        else:
+            self.ocr_files((image_file for image_file, _ in uncached_files()), collect,
+                           size=pending_total - len(cached))
+        self.live_results.flush()
         
         # 保存缓存
-        self.save_cache()
+        with self.tracer.span('save_cache'):
+            self.save_cache()
         
         # 处理重复文件信息
         duplicate_info = []
         for file_hash, files in duplicate_files.items():
             duplicate_info.append({
-                'hash': file_hash,
+                'hash': file_hash.hex(),
                 'files': [str(f.relative_to(self.source_folder)) if f.parent != self.source_folder else f.name for f in files],
                 'count': len(files)
             })
@@ -423,26 +499,235 @@ class OCRService:
         
         return results, failed_files, duplicate_info
     
+    def ocr_files(self, image_files, collect, size=None):
+        """本机识别图片，每完成一张调用collect(record)
+        
+        图片提交到进程共享的OCR调度器，与其他任务按优先级公平分配线程（size为图片数，小任务走快速通道）。
+        识别超时的图片进入隔离队列，主批次完成后用较少并发和宽松超时重试，慢图片不影响其他图片的吞吐。
+        """
+        quarantine = []
+        process_func = self.process_single_image
+        if self.profiler:
+            process_func = self.profiler.wrap(process_func)
+        
+        scheduler = get_scheduler(OCR_WORKERS)
+        with scheduler.lane(self.task_id, self.priority, size) as executor, self.tracer.span('ocr'):
+            for result in self.iter_bounded(executor, process_func, image_files):
+                if result.type == 'timeout':
+                    metrics.QUARANTINED.inc()
+                    quarantine.append(result.resolve(self.source_folder))
+                else:
+                    collect(result)
+        
+        self.quarantined_count += len(quarantine)
+        if quarantine:
+            print(f"重试识别超时的图片: {len(quarantine)} 张")
+            retry = functools.partial(process_func, quarantine=True)
+            with scheduler.lane(self.task_id, self.priority) as executor, self.tracer.span('quarantine'):
+                for result in self.iter_bounded(executor, retry, quarantine, window=QUARANTINE_WORKERS):
+                    collect(result)
+    
+    def dispatch_files(self, image_files, collect):
+        """分发模式：把图片切成分片提交到队列，由ocr_worker.py处理后合并结果
+        
+        image_files为 (图片, 内容摘要)，识别成功的图片用已计算的摘要写入缓存，不再重新读取文件。
+        worker退出导致租约过期的分片由队列重新分发；多次未完成的分片中的图片记为处理异常。
+        DISPATCH_FALLBACK秒无进展且队列中没有有效租约（没有worker在运行）时，收回未领取的分片改为本机识别。
+        """
+        digests = {str(image_file.relative_to(self.source_folder)): digest for image_file, digest in image_files}
+        if not digests:
+            return
+        
+        with self.tracer.span('dispatch'):
+            try:
+                shard_count = self.broker.submit(self.task_id, self.source_folder, list(digests), priority=self.priority)
+                print(f"已提交到OCR队列: {len(digests)} 张图片, {shard_count} 个分片")
+                finished = 0
+                idle_since = warned_at = time.monotonic()
+                while finished < shard_count:
+                    shards = self.broker.collect(self.task_id)
+                    for status, files, rows, error in shards:
+                        finished += 1
+                        if status == 'failed':
+                            print(f"✗ 分片处理失败: {error}")
+                            for relative_path in files:
+                                collect(ImageRecord.create('error', relative_path, error=error))
+                            continue
+                        for row in rows:
+                            record = ImageRecord.from_row(row)
+                            if record.type == 'success':
+                                self.cache_result(digests[record.relative_path], record.order_number,
+                                                  record.amount, record.folder, record.relative_path)
+                            collect(record)
+                    now = time.monotonic()
+                    if shards:
+                        idle_since = warned_at = now
+                    elif now - idle_since > DISPATCH_FALLBACK and not self.broker.active_leases():
+                        withdrawn = self.broker.withdraw(self.task_id)
+                        if withdrawn:
+                            files = [self.source_folder / path for shard in withdrawn for path in shard]
+                            print(f"⚠ OCR队列 {DISPATCH_FALLBACK} 秒没有worker处理，收回 {len(withdrawn)} 个分片"
+                                  f"（{len(files)} 张图片）改为本机识别")
+                            shard_count -= len(withdrawn)
+                            self.ocr_files(files, collect, size=len(files))
+                            idle_since = warned_at = time.monotonic()
+                            continue
+                    elif now - warned_at > DISPATCH_IDLE_WARNING:
+                        print(f"⚠ OCR队列 {DISPATCH_IDLE_WARNING} 秒无进展，请检查ocr_worker是否在运行: "
+                              f"{self.broker.progress(self.task_id)}")
+                        warned_at = now
+                    if finished < shard_count:
+                        time.sleep(DISPATCH_POLL_INTERVAL)
+            finally:
+                self.broker.delete_task(self.task_id)
+    
     def deduplicate_by_order(self, results):
-        """根据订单号去重"""
-        unique_orders = {}
-        duplicates = defaultdict(list)
-        
-        for result in results:
-            order_num = result['order_number']
-            if order_num not in unique_orders:
-                unique_orders[order_num] = result
-            else:
-                duplicates[order_num].append(result)
-        
-        return unique_orders, duplicates
+        """根据订单号去重（在磁盘上的临时SQLite中完成），返回OrderDedup"""
+        dedup = OrderDedup(self.result_folder / 'dedup.sqlite3')
+        dedup.load(results)
+        return dedup
+    
+    def write_result_file(self, summary, dedup, duplicate_info, failed_files):
+        """将完整结果逐条写入result.json的临时文件，避免在内存中构建完整的列表
+        
+        写完列表后不结束对象，由finish_result_file()追加最后的字段（写结果阶段结束后才能得到的耗时）并替换result.json。
+        """
+        tmp_file = self.result_file.with_suffix('.json.tmp')
+        
+        def write_list(f, key, items):
+            f.write(b',' + dumps(key) + b':[')
+            for n, item in enumerate(items):
+                if n:
+                    f.write(b',')
+                f.write(dumps(item))
+            f.write(b']')
+        
+        with open(tmp_file, 'wb') as f:
+            # 先写摘要字段，再逐个写列表字段
+            f.write(dumps(summary)[:-1])
+            
+            # 详细订单列表
+            write_list(f, 'orders', (
+                {
+                    'index': i,
+                    'order_number': result.order_number,
+                    'amount': result.amount,
+                    'filename': result.filename,
+                    'folder': result.folder,
+                    'relative_path': result.relative_path,
+                    # 之前的任务中出现过的订单：原任务ID、金额和时间
+                    'previously_seen': seen
+                }
+                for i, (result, _, seen) in enumerate(dedup.iter_order_details(), 1)
+            ))
+            
+            # 重复订单列表
+            write_list(f, 'duplicates', (
+                {
+                    'order_number': order_num,
+                    'amount': kept.amount,
+                    'original_file': kept.filename,
+                    'duplicate_files': [dup.filename for dup in dup_list],
+                    'duplicate_count': len(dup_list)
+                }
+                for order_num, kept, dup_list in dedup.iter_duplicates()
+            ))
+            
+            write_list(f, 'duplicate_images_list', duplicate_info)
+            write_list(f, 'failed_files', (result.filename for result in failed_files))
+    
+    def finish_result_file(self, fields):
+        """向write_result_file()写好的临时文件追加字段，结束对象后替换result.json"""
+        tmp_file = self.result_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'ab') as f:
+            for key, value in fields.items():
+                f.write(b',' + dumps(key) + b':' + dumps(value))
+            f.write(b'}')
+        tmp_file.replace(self.result_file)
+    
+    def write_result_store(self, dedup, duplicate_info, failed_files):
+        """将去重订单、重复订单、重复图片和识别失败文件写入结果库（供查询和导出接口使用）"""
+        orders = (
+            (
+                i,
+                result.order_number,
+                result.amount_cents,
+                result.filename,
+                result.folder or '根目录',
+                result.relative_path,
+                duplicate_count,
+                seen['task_id'] if seen else None,
+                seen['seen_at'] if seen else None,
+            )
+            for i, (result, duplicate_count, seen) in enumerate(dedup.iter_order_details(), 1)
+        )
+        duplicate_orders = (
+            (order_num, kept.amount_cents, kept.filename, [dup.filename for dup in dup_list])
+            for order_num, kept, dup_list in dedup.iter_duplicates()
+        )
+        self.result_store.write(orders, duplicate_orders, duplicate_info,
+                                (result.filename for result in failed_files))
+    
+    def copy_deduped_files(self, sorted_orders):
+        """复制去重后的文件，保持文件夹结构"""
+        for i, result in enumerate(sorted_orders, 1):
+            source_file = result.resolve(self.source_folder)
+            folder_path = result.folder or '根目录'
+            
+            # 创建目标文件夹
+            dest_folder = self.deduped_folder
+            if folder_path != '根目录':
+                dest_folder = dest_folder / folder_path
+                dest_folder.mkdir(parents=True, exist_ok=True)
+            
+            # 生成新文件名
+            new_filename = f"{i:03d}_¥{result.amount:.2f}_{source_file.name}"
+            dest_file = dest_folder / new_filename
+            
+            try:
+                shutil.copy2(source_file, dest_file)
+            except Exception as e:
+                print(f"复制文件失败: {source_file.name} - {e}")
+    
+    def build_archive(self):
+        """打包去重后的文件（下载时直接使用，无需临时打包）"""
+        shutil.make_archive(str(self.archive_file.with_suffix('')), 'zip', str(self.deduped_folder))
+    
+    def load_result(self):
+        """读取完整结果（包含订单、重复、失败列表）"""
+        return load_file(self.result_file)
     
     def process(self):
-        """主处理流程"""
+        """主处理流程
+        
+        返回结果摘要；订单、重复、失败等完整列表写入result_file，通过load_result()读取。
+        """
+        metrics.ACTIVE_TASKS.inc()
+        start = time.perf_counter()
+        if self.profile:
+            self.profiler = TaskProfiler(self.profile, self.result_folder)
+            self.profiler.start()
+        try:
+            result_data = self._process()
+        finally:
+            metrics.ACTIVE_TASKS.dec()
+            if self.profiler:
+                profile_file = self.profiler.stop()
+                if profile_file:
+                    print(f"✓ 性能分析已保存: {profile_file}")
+                self.profiler = None
+        elapsed = time.perf_counter() - start
+        metrics.TASK_SECONDS.observe(elapsed)
+        if result_data.get('total_files') and elapsed > 0:
+            metrics.TASK_IMAGES_PER_SECOND.observe(result_data['total_files'] / elapsed)
+        return result_data
+    
+    def _process(self):
         print(f"开始处理文件夹: {self.source_folder}")
         
         # 查找所有图片
-        image_files = self.find_all_images()
+        with self.tracer.span('scan'):
+            image_files = self.find_all_images()
         total_files = len(image_files)
         
         print(f"找到 {total_files} 张图片")
@@ -457,87 +742,77 @@ class OCRService:
         
         # 处理所有图片（包含重复检测）
         results, failed_files, duplicate_info = self.process_images(image_files)
+        image_files = None
         
         success_count = len(results)
         failed_count = len(failed_files)
         
-        # 去重
-        unique_orders = {}
-        duplicates = {}
-        total_amount = 0
-        
-        if results:
-            unique_orders, duplicates = self.deduplicate_by_order(results)
-            
-            # 计算总金额
-            for order_num, result in unique_orders.items():
-                total_amount += result['amount']
+        # 去重：记录写入临时SQLite，按订单号去重、按金额排序都在磁盘上完成
+        with self.tracer.span('dedup'):
+            dedup = self.deduplicate_by_order(results)
+            unique_count, duplicate_count, total_cents = dedup.summary()
+        total_amount = total_cents / 100
+        previously_seen_count, previously_seen_cents = 0, 0
+        
+        if unique_count:
+            # 检查之前的任务中是否出现过相同订单号，并登记本任务的订单
+            if self.order_index is not None:
+                with self.tracer.span('order_index'):
+                    try:
+                        dedup.add_seen(self.order_index.iter_seen_and_add(self.task_id, dedup.iter_orders()))
+                    except sqlite3.Error as e:
+                        print(f"✗ 订单号索引查询失败: {e}")
+                previously_seen_count, previously_seen_cents = dedup.seen_summary()
+                if previously_seen_count:
+                    print(f"⚠ {previously_seen_count} 个订单号在之前的任务中出现过")
             
             # 复制去重后的文件，保持文件夹结构
-            for i, (order_num, result) in enumerate(sorted(unique_orders.items(), key=lambda x: x[1]['amount'], reverse=True), 1):
-                source_file = result['file']
-                folder_path = result.get('folder', '根目录')
-                relative_path = result.get('relative_path', source_file.name)
-                
-                # 创建目标文件夹
-                dest_folder = self.deduped_folder
-                if folder_path != '根目录':
-                    dest_folder = dest_folder / folder_path
-                    dest_folder.mkdir(parents=True, exist_ok=True)
-                
-                # 生成新文件名
-                new_filename = f"{i:03d}_¥{result['amount']:.2f}_{source_file.name}"
-                dest_file = dest_folder / new_filename
-                
-                try:
-                    shutil.copy2(source_file, dest_file)
-                except Exception as e:
-                    print(f"复制文件失败: {source_file.name} - {e}")
+            with self.tracer.span('copy'):
+                self.copy_deduped_files(dedup.iter_orders())
+        
+        with self.tracer.span('archive'):
+            self.build_archive()
         
         # 计算重复文件统计
         total_duplicate_files = sum(info['count'] for info in duplicate_info)
         
-        # 准备返回结果
+        # 结果摘要（常驻内存）
         result_data = {
             'total_files': total_files,
             'success_count': success_count,
             'failed_count': failed_count,
-            'unique_orders': len(unique_orders),
-            'duplicate_orders': len(duplicates),
+            'unique_orders': unique_count,
+            'duplicate_orders': duplicate_count,
             'duplicate_images': len(duplicate_info),
             'total_duplicate_files': total_duplicate_files,
             'total_amount': round(total_amount, 2),
-            'orders': [],
-            'duplicates': [],
-            'duplicate_images_list': duplicate_info,
-            'failed_files': [f.name for f in failed_files]
+            'quarantined_count': self.quarantined_count,
+            'previously_seen_orders': previously_seen_count,
+            'previously_seen_amount': previously_seen_cents / 100,
+            'downscale': self.scaler.summary() if self.scaler else None,
+            'strategies': self.chain.summary(),
         }
         
-        # 详细订单列表
-        for i, (order_num, result) in enumerate(sorted(unique_orders.items(), key=lambda x: x[1]['amount'], reverse=True), 1):
-            result_data['orders'].append({
-                'index': i,
-                'order_number': order_num,
-                'amount': result['amount'],
-                'filename': result['file'].name,
-                'folder': result['folder'],
-                'relative_path': result.get('relative_path', result['file'].name)
-            })
+        # 完整列表逐条写入磁盘
+        with self.tracer.span('write_result'):
+            self.write_result_file(result_data, dedup, duplicate_info, failed_files)
+            self.write_result_store(dedup, duplicate_info, failed_files)
         
-        # 重复订单列表
-        for order_num, dup_list in duplicates.items():
-            original = unique_orders[order_num]
-            result_data['duplicates'].append({
-                'order_number': order_num,
-                'amount': original['amount'],
-                'original_file': original['file'].name,
-                'duplicate_files': [dup['file'].name for dup in dup_list],
-                'duplicate_count': len(dup_list)
-            })
+        # 耗时汇总在写结果阶段结束后记录，包含write_result本身
+        result_data['timings'] = self.tracer.summary()
+        self.finish_result_file({'timings': result_data['timings']})
         
-        # 重复图片列表已经在duplicate_info中处理，不需要额外处理
+        dedup.cleanup()
+        results.cleanup()
+        failed_files.cleanup()
+        self.live_results.remove()
         
-        print(f"处理完成: 成功 {success_count}, 失败 {failed_count}, 唯一订单 {len(unique_orders)}")
+        # 导出Chrome trace
+        try:
+            atomic_write(self.trace_file, dumps(self.tracer.to_chrome_trace()))
+        except Exception as e:
+            print(f"✗ 保存trace失败: {e}")
+        
+        print(f"处理完成: 成功 {success_count}, 失败 {failed_count}, 唯一订单 {unique_count}")
         
         return result_data
-
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR worker - 从分片队列领取图片分片，识别后把结果写回队列，由提交任务的后端合并
+
+可以在多台机器上各启动若干个worker；图片通过共享目录读取（上传目录挂载到相同路径），
+或者后端设置 OCR_BROKER_TRANSFER=1 把图片内容随分片一起下发。
+
+使用示例:
+  OCR_BROKER=results/broker.sqlite3 python ocr_worker.py
+  python ocr_worker.py --broker /mnt/shared/broker.sqlite3 --threads 8
+  python ocr_worker.py --once   # 队列为空时退出
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import ocr_service
+from broker import ShardBroker, OCR_BROKER, LEASE_SECONDS, worker_name
+from ocr_service import OCRService
+
+
+class LeaseKeeper(threading.Thread):
+    """处理分片期间定期续约"""
+
+    def __init__(self, broker, shard_id, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.broker = broker
+        self.shard_id = shard_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.broker.renew(self.shard_id, self.worker, self.lease_seconds):
+                print(f"⚠ 分片 {self.shard_id} 的租约已失效，结果将被丢弃")
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def process_shard(broker, shard, scratch):
+    """识别一个分片，返回ImageRecord行列表"""
+    source_folder = Path(shard['source'])
+    if shard['transfer']:
+        # 图片随分片下发，写入临时目录后按相同的相对路径处理
+        source_folder = scratch / 'source'
+        for relative_path, data in broker.shard_files(shard['id']):
+            path = source_folder / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+    result_folder = scratch / 'result'
+    result_folder.mkdir()
+
+    # 共享目录可能是网络文件系统，只有本进程写入的临时目录按内存映射读取
+    service = OCRService(source_folder, result_folder, task_id=shard['task_id'], broker=False,
+                         immutable_source=shard['transfer'])
+    records = []
+    service.ocr_files((source_folder / relative_path for relative_path in shard['files']), records.append)
+    return [list(record) for record in records]
+
+
+def run(broker, worker, lease_seconds=LEASE_SECONDS, poll=1.0, once=False):
+    print(f"OCR worker {worker} 已启动，队列: {broker.path}")
+    while True:
+        shard = broker.lease(worker, lease_seconds)
+        if shard is None:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+
+        print(f"领取分片 {shard['id']}: 任务 {shard['task_id']}, {len(shard['files'])} 张图片")
+        start = time.perf_counter()
+        keeper = LeaseKeeper(broker, shard['id'], worker, lease_seconds)
+        keeper.start()
+        scratch = Path(tempfile.mkdtemp(prefix='ocr_worker_'))
+        try:
+            rows = process_shard(broker, shard, scratch)
+        except Exception as e:
+            print(f"✗ 分片 {shard['id']} 处理失败: {e}")
+            broker.release(shard['id'], worker, str(e))
+            continue
+        except BaseException:
+            # Ctrl+C / 终止：放回队列，由其他worker接手
+            broker.release(shard['id'], worker, 'worker已退出')
+            raise
+        finally:
+            keeper.stop()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        if broker.complete(shard['id'], worker, rows):
+            print(f"✓ 分片 {shard['id']} 完成: {len(rows)} 张图片, {time.perf_counter() - start:.1f} 秒")
+        else:
+            print(f"⚠ 分片 {shard['id']} 已由其他worker接手，丢弃本次结果")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR worker：从分片队列领取图片并识别')
+    parser.add_argument('--broker', default=OCR_BROKER, help='分片队列数据库路径（默认读取环境变量OCR_BROKER）')
+    parser.add_argument('--threads', type=int, default=ocr_service.OCR_WORKERS, help='每个分片的OCR并发线程数')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help='分片租约时长（秒）')
+    parser.add_argument('--once', action='store_true', help='队列为空时退出')
+    args = parser.parse_args()
+
+    if not args.broker:
+        print("✗ 未指定分片队列，请使用 --broker 或设置环境变量 OCR_BROKER")
+        sys.exit(1)
+    ocr_service.OCR_WORKERS = args.threads
+    ocr_service.QUARANTINE_WORKERS = max(1, args.threads // 2)
+
+    try:
+        run(ShardBroker(args.broker), worker_name(), args.lease, once=args.once)
+    except KeyboardInterrupt:
+        print("\nOCR worker 已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订单号索引 - 跨任务记录已出现过的订单号，检测重复提交的截图
+
+SQLite单表，订单号为主键（WITHOUT ROWID，按主键B树存储），每个订单号的查询和插入都是一次索引查找，
+千万级订单也只需几百MB磁盘。WAL模式下多个gunicorn worker可以同时读，写入由SQLite加锁串行。
+任务被清理后索引记录仍然保留，之后再提交相同订单号仍会被标记。
+
+索引前面有一个布隆过滤器（order_index.bloom，mmap共享），新订单号（绝大多数情况）
+无需查询SQLite。过滤器定期在后台重建，误判率通过Prometheus指标上报。
+
+新插入的订单号由触发器记入order_log（序号单调递增），过滤器文件头记录已包含到哪个序号。
+每批查询前先补录该序号之后的订单号：重建期间、重建之后其他worker写入旧文件、
+或进程在补录前退出时新增的订单号都不会漏掉。order_log在重建时清理到上一个过滤器已包含的序号。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+from bloom import BloomFilter
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境
+    fcntl = None
+
+# 每条SQL中最多的参数个数（SQLite默认上限999）
+BATCH_SIZE = 500
+# 布隆过滤器的目标误判率、重建间隔（小时）和最小容量
+BLOOM_FP_RATE = float(os.environ.get('BLOOM_FP_RATE', 0.01))
+BLOOM_REBUILD_HOURS = float(os.environ.get('BLOOM_REBUILD_HOURS', 24))
+BLOOM_MIN_CAPACITY = 1000000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS orders (
+    order_number  TEXT PRIMARY KEY,
+    task_id       TEXT NOT NULL,
+    amount_cents  INTEGER NOT NULL,
+    relative_path TEXT,
+    created_at    REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at);
+CREATE TABLE IF NOT EXISTS order_log (
+    seq           INTEGER PRIMARY KEY,
+    order_number  TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS orders_log AFTER INSERT ON orders
+BEGIN
+    INSERT INTO order_log (order_number) VALUES (new.order_number);
+END;
+'''
+
+
+class OrderIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.bloom_path = self.path.with_suffix('.bloom')
+        self.local = threading.local()
+        self.bloom = None
+        self.bloom_lock = threading.Lock()
+        self.rebuilding = False
+        self.bloom_stats = {'negative': 0, 'false_positive': 0}
+        self.stats_lock = threading.Lock()
+        # 建表使用临时连接，不缓存（gunicorn preload时在主进程执行，连接不能带到fork后的worker中）
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self):
+        """每个线程复用一个连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def prefetch(self):
+        """预读索引和布隆过滤器文件到页缓存（gunicorn主进程fork之前调用，不打开连接）"""
+        for path in (self.path, self.bloom_path):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except (AttributeError, OSError):
+                pass
+            finally:
+                os.close(fd)
+
+    def open_bloom(self):
+        """worker启动时打开布隆过滤器
+
+        不能在fork之前打开：文件锁按打开的文件区分，继承同一个文件的进程会共用一把锁。
+        """
+        return self._bloom()
+
+    def _bloom(self):
+        """当前的布隆过滤器；不存在、过期或其他worker重建后重新加载，不可用时返回None（直接查SQLite）
+
+        被替换的旧过滤器不主动close：其他线程可能仍在使用，最后一个引用释放时mmap和文件随对象关闭。
+        """
+        with self.bloom_lock:
+            if self.bloom is not None and not self.bloom.is_current():
+                self.bloom = None
+            if self.bloom is None and self.bloom_path.exists():
+                try:
+                    self.bloom = BloomFilter(self.bloom_path)
+                except (OSError, ValueError) as e:
+                    print(f"✗ 加载布隆过滤器失败: {e}")
+            bloom = self.bloom
+        try:
+            rebuild = bloom is None or self.needs_rebuild(bloom)
+        except (OSError, ValueError) as e:
+            print(f"✗ 布隆过滤器不可用，改为直接查询索引: {e}")
+            with self.bloom_lock:
+                if self.bloom is bloom:
+                    self.bloom = None
+            bloom, rebuild = None, True
+        if rebuild:
+            self.start_rebuild()
+        return bloom
+
+    def needs_rebuild(self, bloom):
+        """超过重建间隔，或元素数增长导致误判率超过目标的两倍"""
+        return (time.time() - bloom.built_at > BLOOM_REBUILD_HOURS * 3600
+                or bloom.estimated_fp_rate() > BLOOM_FP_RATE * 2)
+
+    def start_rebuild(self):
+        """后台重建布隆过滤器（本进程内只启动一个）"""
+        with self.bloom_lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self.rebuild_bloom, name='bloom-rebuild', daemon=True).start()
+
+    def rebuild_bloom(self):
+        """从SQLite重建过滤器并原子替换；多个worker之间用文件锁保证只有一个在重建
+
+        扫描在一个读事务中完成，新过滤器恰好包含序号不超过扫描时order_log最大序号的订单号，
+        之后新增的由各worker使用前补录。
+        """
+        lock_file = open(self.path.with_suffix('.bloom.lock'), 'w')
+        previous_seq = 0
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+                # 拿到锁后再确认一次，其他worker可能刚重建完
+                try:
+                    current = BloomFilter(self.bloom_path)
+                    try:
+                        fresh = not self.needs_rebuild(current)
+                        previous_seq = current.synced_seq
+                    finally:
+                        current.close()
+                    if fresh:
+                        return
+                except (OSError, ValueError):
+                    pass
+            
+            start = time.time()
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            try:
+                conn.execute('BEGIN')
+                synced_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM order_log').fetchone()[0]
+                total = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+                tmp_path = self.bloom_path.with_suffix('.bloom.tmp')
+                bloom = BloomFilter.create(tmp_path, max(total * 2, BLOOM_MIN_CAPACITY), BLOOM_FP_RATE)
+                try:
+                    cursor = conn.execute('SELECT order_number FROM orders')
+                    while True:
+                        rows = cursor.fetchmany(10000)
+                        if not rows:
+                            break
+                        bloom.add_many(row[0] for row in rows)
+                    conn.rollback()
+                    bloom.add_many((), synced_seq=synced_seq)
+                    bloom.flush()
+                    estimated = bloom.estimated_fp_rate()
+                finally:
+                    bloom.close()
+                os.replace(tmp_path, self.bloom_path)
+                # 仍在使用旧过滤器的worker需要的日志保留到上一个过滤器的序号之后；
+                # 最大序号的一行始终保留，序号不会重复使用
+                with conn:
+                    conn.execute(
+                        'DELETE FROM order_log WHERE seq <= ? AND seq < (SELECT MAX(seq) FROM order_log)',
+                        (previous_seq,)
+                    )
+                print(f"✓ 布隆过滤器已重建: {total} 个订单号, 用时 {time.time() - start:.1f} 秒, "
+                      f"预估误判率 {estimated:.4%}, 本进程实测 {self.observed_fp_rate()}")
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"✗ 重建布隆过滤器失败: {e}")
+        finally:
+            lock_file.close()
+            with self.bloom_lock:
+                self.rebuilding = False
+
+    def _synced_bloom(self, conn):
+        """当前的布隆过滤器，先补录order_log中它还没有包含的订单号；不可用时返回None（直接查SQLite）"""
+        bloom = self._bloom()
+        if bloom is None:
+            return None
+        try:
+            synced_seq = bloom.synced_seq
+            cursor = conn.execute(
+                'SELECT seq, order_number FROM order_log WHERE seq > ? ORDER BY seq', (synced_seq,)
+            )
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                bloom.add_many((row[1] for row in rows), synced_seq=rows[-1][0])
+            # 日志只从头部清理：读完之后最早的序号仍紧接在已包含的序号之后，说明没有漏掉被清理的记录
+            oldest = conn.execute('SELECT MIN(seq) FROM order_log').fetchone()[0]
+            if oldest is not None and oldest - 1 > synced_seq:
+                print("✗ 布隆过滤器落后于已清理的订单日志，本批直接查询索引")
+                return None
+        except (OSError, ValueError) as e:
+            print(f"✗ 布隆过滤器不可用，改为直接查询索引: {e}")
+            return None
+        return bloom
+
+    def observed_fp_rate(self):
+        """本进程实测误判率：过滤器判断可能存在、但SQLite中不存在的比例"""
+        with self.stats_lock:
+            stats = dict(self.bloom_stats)
+        negatives = stats['negative'] + stats['false_positive']
+        return f"{stats['false_positive'] / negatives:.4%}" if negatives else '无数据'
+
+    def check_and_add(self, task_id, records):
+        """查询records中在其他任务出现过的订单号，并登记本任务的新订单号
+
+        返回 {订单号: {'task_id', 'amount', 'relative_path', 'seen_at'}}，只包含之前出现过的订单。
+        """
+        return dict(self.iter_seen_and_add(task_id, records))
+
+    def iter_seen_and_add(self, task_id, records):
+        """同check_and_add，但按批逐个产出 (订单号, 之前出现的信息)，不在内存中保留全部结果"""
+        conn = self.connect()
+        records = iter(records)
+        while True:
+            batch = [record for _, record in zip(range(BATCH_SIZE), records)]
+            if not batch:
+                break
+            # 每批重新获取过滤器（其他worker可能已重建替换）并补录其他worker新增的订单号
+            bloom = self._synced_bloom(conn)
+            # 过滤器判断不存在的订单号无需查询
+            numbers = [record.order_number for record in batch]
+            if bloom is not None:
+                try:
+                    numbers = [number for number in numbers if number in bloom]
+                except (OSError, ValueError) as e:
+                    # 过滤器不可用（映射已关闭或文件出错），本批直接查SQLite
+                    print(f"✗ 布隆过滤器不可用，改为直接查询索引: {e}")
+                    bloom = None
+            if bloom is not None:
+                with self.stats_lock:
+                    self.bloom_stats['negative'] += len(batch) - len(numbers)
+                metrics.BLOOM_LOOKUPS.labels('negative').inc(len(batch) - len(numbers))
+            now = time.time()
+            with conn:
+                rows = conn.execute(
+                    f'SELECT order_number, task_id, amount_cents, relative_path, created_at FROM orders '
+                    f'WHERE order_number IN ({",".join("?" * len(numbers))})',
+                    numbers
+                ).fetchall() if numbers else []
+                if bloom is not None:
+                    with self.stats_lock:
+                        self.bloom_stats['false_positive'] += len(numbers) - len(rows)
+                    metrics.BLOOM_LOOKUPS.labels('false_positive').inc(len(numbers) - len(rows))
+                    metrics.BLOOM_LOOKUPS.labels('true_positive').inc(len(rows))
+                seen = [
+                    (order_number, {
+                        'task_id': seen_task,
+                        'amount': amount_cents / 100,
+                        'relative_path': relative_path,
+                        'seen_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(created_at)),
+                    })
+                    for order_number, seen_task, amount_cents, relative_path, created_at in rows
+                    if seen_task != task_id
+                ]
+                # 先加入过滤器再写入SQLite，其他worker不会在两步之间漏查
+                if bloom is not None:
+                    try:
+                        bloom.add_many(record.order_number for record in batch)
+                    except (OSError, ValueError) as e:
+                        # 新订单号已记入order_log，下一个使用过滤器的worker会补录
+                        print(f"✗ 写入布隆过滤器失败: {e}")
+                conn.executemany(
+                    'INSERT OR IGNORE INTO orders (order_number, task_id, amount_cents, relative_path, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(record.order_number, task_id, record.amount_cents, record.relative_path, now) for record in batch]
+                )
+            # 提交这一批之后再产出，调用方处理期间不持有写事务
+            yield from seen
+
+    def count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM orders').fetchone()[0]
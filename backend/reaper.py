@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务文件自动清理 - 后台线程按TTL和磁盘水位回收uploads/results下的任务文件夹
+
+- 只处理名称为任务ID（UUID）的文件夹，共享的OCR缓存、索引等其他文件不受影响
+- 每轮只检查少量文件夹，分多轮完成一次完整扫描，不会阻塞请求处理
+- 扫描时记录各任务的最近访问时间，磁盘超过高水位时按记录淘汰，不再重新扫描全部任务；
+  最近访问过的任务（刚上传、刚完成或正在查看结果）不会被淘汰
+- 多个gunicorn worker中只有拿到文件锁的一个执行清理
+"""
+
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+
+from serializer import load_file
+from task_store import is_valid_task_id
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境
+    fcntl = None
+
+# 已完成/失败任务的保留时间（小时）
+TASK_TTL_HOURS = float(os.environ.get('TASK_TTL_HOURS', 24))
+# 上传后一直未处理的任务保留时间（小时）
+UPLOAD_TTL_HOURS = float(os.environ.get('UPLOAD_TTL_HOURS', 6))
+# 处理中但长时间无进度的任务（worker已退出）保留时间（小时）
+STALE_PROCESSING_HOURS = float(os.environ.get('STALE_PROCESSING_HOURS', 12))
+# 磁盘使用率超过高水位（%）时按最近访问时间淘汰，直到低于低水位
+DISK_HIGH_WATER = float(os.environ.get('DISK_HIGH_WATER', 85))
+DISK_LOW_WATER = float(os.environ.get('DISK_LOW_WATER', 75))
+# 磁盘淘汰时跳过最近多少分钟内访问过的任务
+EVICT_MIN_IDLE_MINUTES = float(os.environ.get('EVICT_MIN_IDLE_MINUTES', 30))
+# 每轮间隔（秒）和每轮最多检查的文件夹数
+REAP_INTERVAL = float(os.environ.get('REAP_INTERVAL', 30))
+REAP_BATCH = int(os.environ.get('REAP_BATCH', 50))
+
+# 记录最近访问时间的标记文件
+ACCESS_MARKER = '.last_access'
+
+
+def touch_access(result_folder):
+    """记录任务最近一次被访问的时间（用于LRU淘汰）"""
+    marker = Path(result_folder) / ACCESS_MARKER
+    try:
+        marker.touch()
+    except OSError:
+        pass
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0
+
+
+def disk_usage_percent(path):
+    """磁盘使用率（%）"""
+    usage = shutil.disk_usage(path)
+    return usage.used * 100 / usage.total
+
+
+class TaskReaper(threading.Thread):
+    def __init__(self, upload_folder, result_folder):
+        super().__init__(name='task-reaper', daemon=True)
+        self.upload_folder = Path(upload_folder)
+        self.result_folder = Path(result_folder)
+        self.lock_file = None
+        self._scan = None  # 跨轮次延续的目录扫描
+        self._scan_ids = set()  # 本次完整扫描已检查的任务
+        self.accessed = {}  # 非处理中任务的最近访问时间（扫描时更新），磁盘淘汰的候选
+        self._low_space_warned = False
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def acquire_lock(self):
+        """多个worker中只让一个执行清理"""
+        if fcntl is None:
+            return True
+        if self.lock_file is None:
+            self.lock_file = open(self.result_folder / '.reaper.lock', 'w')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def iter_task_ids(self):
+        """遍历uploads和results下所有任务ID（同一任务可能在两个目录中都出现）"""
+        for folder in (self.result_folder, self.upload_folder):
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and is_valid_task_id(entry.name):
+                            yield entry.name
+            except FileNotFoundError:
+                continue
+
+    def task_info(self, task_id):
+        """返回 (状态, 最近更新时间, 最近访问时间)"""
+        task_file = self.result_folder / task_id / 'task.json'
+        status = None
+        updated = _mtime(task_file)
+        if updated:
+            try:
+                status = load_file(task_file).get('status')
+            except Exception:
+                pass
+        else:
+            updated = max(_mtime(self.upload_folder / task_id), _mtime(self.result_folder / task_id))
+        accessed = max(updated, _mtime(self.result_folder / task_id / ACCESS_MARKER))
+        return status, updated, accessed
+
+    def is_expired(self, status, updated, accessed, now):
+        if status == 'processing':
+            return now - updated > STALE_PROCESSING_HOURS * 3600
+        if status in (None, 'uploaded'):
+            return now - accessed > UPLOAD_TTL_HOURS * 3600
+        return now - accessed > TASK_TTL_HOURS * 3600
+
+    def remove_task(self, task_id, reason):
+        """删除任务的上传和结果文件夹"""
+        removed = False
+        for folder in (self.upload_folder / task_id, self.result_folder / task_id):
+            if folder.exists():
+                shutil.rmtree(folder, ignore_errors=True)
+                removed = True
+        if removed:
+            print(f"🧹 清理任务 {task_id} ({reason})")
+
+    def reap_expired(self):
+        """检查一批任务，删除过期的，记录其余任务的最近访问时间；一次完整扫描分多轮完成"""
+        if self._scan is None:
+            self._scan = self.iter_task_ids()
+            self._scan_ids = set()
+        now = time.time()
+        for _ in range(REAP_BATCH):
+            task_id = next(self._scan, None)
+            if task_id is None:
+                # 完整扫描结束，去掉已被其他方式删除的任务
+                for gone in self.accessed.keys() - self._scan_ids:
+                    del self.accessed[gone]
+                self._scan = None
+                break
+            if task_id in self._scan_ids:
+                continue
+            self._scan_ids.add(task_id)
+            status, updated, accessed = self.task_info(task_id)
+            if self.is_expired(status, updated, accessed, now):
+                self.remove_task(task_id, '过期')
+                self.accessed.pop(task_id, None)
+            elif status == 'processing':
+                self.accessed.pop(task_id, None)
+            else:
+                self.accessed[task_id] = accessed
+
+    def evict_lru(self):
+        """磁盘使用率超过高水位时，按最近访问时间从旧到新淘汰非处理中的任务，直到低于低水位
+
+        候选来自扫描时的记录；删除前重新读取该任务的状态，处理中或最近访问过的跳过。
+        """
+        if disk_usage_percent(self.result_folder) < DISK_HIGH_WATER:
+            self._low_space_warned = False
+            return
+        now = time.time()
+        min_idle = EVICT_MIN_IDLE_MINUTES * 60
+        evicted = 0
+        for accessed, task_id in sorted((accessed, task_id) for task_id, accessed in self.accessed.items()):
+            if self._stop_event.is_set() or disk_usage_percent(self.result_folder) < DISK_LOW_WATER:
+                return
+            if now - accessed < min_idle:
+                break
+            status, _, accessed = self.task_info(task_id)
+            if status == 'processing':
+                self.accessed.pop(task_id, None)
+                continue
+            if now - accessed < min_idle:
+                self.accessed[task_id] = accessed
+                continue
+            self.remove_task(task_id, '磁盘空间不足')
+            self.accessed.pop(task_id, None)
+            evicted += 1
+            time.sleep(0)  # 让出GIL
+        if not evicted and not self._low_space_warned:
+            # 空间可能被其他数据占用，不再删除最近访问过的任务
+            print(f"⚠ 磁盘使用率 {disk_usage_percent(self.result_folder):.0f}% 超过高水位，"
+                  f"但没有超过 {EVICT_MIN_IDLE_MINUTES:g} 分钟未访问的任务可以清理")
+            self._low_space_warned = True
+
+    def run_once(self):
+        if not self.acquire_lock():
+            return
+        try:
+            self.reap_expired()
+            self.evict_lru()
+        except Exception as e:
+            print(f"✗ 清理任务失败: {e}")
+
+    def run(self):
+        while not self._stop_event.wait(REAP_INTERVAL):
+            self.run_once()
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def start_reaper(upload_folder, result_folder):
+    """启动本进程的清理线程（重复调用无副作用）"""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None or not _reaper.is_alive():
+            _reaper = TaskReaper(upload_folder, result_folder)
+            _reaper.start()
+        return _reaper
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单张图片识别 - 按策略链调用OCR引擎、大图缩放、深度识别兜底，提取订单号和金额
+
+后端的OCRService（批量任务）和命令行工具共用；自适应超时（按引擎）、策略统计和缩放档位在进程内共享。
+"""
+
+import time
+import threading
+import subprocess
+
+from engines import get_engine
+from extract import extract_order_number, extract_amount
+from imageinfo import image_size
+from mapped_file import open_mapped, OCR_READ_MODE
+from scaling import get_learner, downscale
+from strategies import get_chain, STRATEGIES
+from timeouts import get_timeouts, OCRTimeout, OCR_TIMEOUT_MAX, QUARANTINE_TIMEOUT
+from tracing import Tracer
+from warmup import record_ocr
+import metrics
+
+
+class Recognizer:
+    def __init__(self, engine=None):
+        # OCR引擎（默认tesseract，压测时可用OCR_ENGINE=fake替换）
+        self.engine = engine or get_engine()
+        # 自适应超时（进程内按引擎共享，新任务不必重新积累样本），超时的图片由调用方重试
+        self.timeouts = get_timeouts(self.engine.name)
+        # 识别策略链（进程内共享统计）
+        self.chain = get_chain()
+        # 大图缩放档位（进程内共享；模拟引擎按文件内容生成结果，不缩放）
+        self.scaler = get_learner() if getattr(self.engine, 'downscale', True) else None
+        # 耗时追踪
+        self.tracer = Tracer()
+    
+    def ocr_image(self, image_path, timeout=OCR_TIMEOUT_MAX, pixels=None, strategy='chi_sim_eng'):
+        """按指定策略识别图片文字，超时抛出OCRTimeout，其他错误返回空文本"""
+        start = time.perf_counter()
+        with self.tracer.span('tesseract', 'image', strategy=strategy), metrics.timed(metrics.TESSERACT_SECONDS.labels(strategy)):
+            try:
+                text = self.engine.recognize(image_path, timeout=timeout, **STRATEGIES[strategy])
+            except subprocess.TimeoutExpired:
+                raise OCRTimeout(f'识别超时（{timeout:.1f}秒）')
+            except Exception as e:
+                print(f"  ✗ {strategy} 识别出错: {e}")
+                return ""
+        seconds = time.perf_counter() - start
+        self.timeouts.observe(strategy, seconds, pixels)
+        record_ocr(seconds)
+        return text
+    
+    def recognize_fields(self, image, pixels=None, quarantine=False):
+        """按策略链识别订单号和金额，返回 (订单号, 金额, 所有策略的识别文本)
+        
+        某个策略的输出为空或提取不出字段时，继续用下一个策略识别缺失的字段。
+        """
+        found = {'order_number': None, 'amount': None}
+        extractors = {'order_number': extract_order_number, 'amount': extract_amount}
+        texts = []
+        tried = set()
+        # 探索时跑完配置的全部策略，让排在后面的策略也有统计
+        explore = self.chain.start_image()
+        while True:
+            fields = list(found) if explore else [field for field, value in found.items() if value is None]
+            strategy = self.chain.next_strategy(fields, tried, explore) if fields else None
+            if strategy is None:
+                break
+            tried.add(strategy)
+            timeout = QUARANTINE_TIMEOUT if quarantine else self.timeouts.timeout(strategy, pixels)
+            start = time.perf_counter()
+            text = self.ocr_image(image, timeout, pixels, strategy)
+            elapsed = time.perf_counter() - start
+            texts.append(text)
+            
+            outcome = {}
+            for field in fields:
+                value = extractors[field](text)
+                outcome[field] = value is not None
+                if found[field] is None:
+                    found[field] = value
+            self.chain.record(strategy, elapsed, outcome)
+        
+        return found['order_number'], found['amount'], "\n".join(texts)
+    
+    def ocr_image_deep(self, image_path, timeout=OCR_TIMEOUT_MAX, pixels=None, stop_on_timeout=True):
+        """深度OCR - 使用多种PSM模式
+        
+        stop_on_timeout为True时任一模式超时即抛出OCRTimeout，不再尝试其余模式；
+        否则跳过超时的模式。
+        """
+        texts = []
+        
+        # 尝试不同的PSM模式
+        for psm in ['6', '11', '12']:
+            start = time.perf_counter()
+            try:
+                with self.tracer.span('deep_ocr', 'image', psm=psm), metrics.timed(metrics.TESSERACT_SECONDS.labels('deep')):
+                    texts.append(self.engine.recognize(image_path, psm=psm, timeout=timeout))
+                self.timeouts.observe('deep', time.perf_counter() - start, pixels)
+            except subprocess.TimeoutExpired:
+                if stop_on_timeout:
+                    raise OCRTimeout(f'深度识别超时（{timeout:.1f}秒）')
+            except:
+                pass
+        
+        return "\n".join(texts)
+    
+    def recognize_image(self, image_file, buffer, quarantine=False, texts=None):
+        """识别一张图片的订单号和金额（buffer为已映射的图片内容），返回 (订单号, 金额)
+        
+        texts为列表时追加各轮的识别文本（命令行调试模式使用）。
+        """
+        # 图片尺寸只读取文件头，用于缩放和计算超时
+        source = image_file if OCR_READ_MODE == 'path' else buffer
+        size = image_size(buffer)
+        pixels = size[0] * size[1] if size else None
+        deep_timeout = QUARANTINE_TIMEOUT if quarantine else self.timeouts.timeout('deep', pixels)
+        
+        # 大图先缩小到目标字高再识别
+        ocr_input, ocr_pixels = source, pixels
+        target_width = self.scaler.choose(size[0]) if self.scaler and size and not quarantine else None
+        if target_width:
+            try:
+                with self.tracer.span('downscale', 'image'):
+                    ocr_input, ocr_pixels = downscale(buffer, target_width)
+            except Exception as e:
+                print(f"  缩放失败，使用原图: {e}")
+                target_width = None
+        
+        # 第一轮：按策略链识别（默认先用快速的数字识别，再用中文模型）
+        order_number, amount, ocr_text = self.recognize_fields(ocr_input, ocr_pixels, quarantine)
+        
+        if target_width:
+            if order_number is not None and amount is not None:
+                self.scaler.record(target_width, True)
+            else:
+                # 缩小后识别失败，用原图重新识别；原图能识别才说明是缩放导致的失败
+                metrics.DOWNSCALE_RETRIES.inc()
+                order_number, amount, ocr_text = self.recognize_fields(source, pixels)
+                if order_number is not None and amount is not None:
+                    self.scaler.record(target_width, False)
+        
+        if texts is not None:
+            texts.append(ocr_text)
+        
+        # 如果常规OCR失败，尝试深度OCR
+        if order_number is None or amount is None:
+            print(f"  → 常规识别失败，尝试深度识别...")
+            metrics.DEEP_FALLBACKS.inc()
+            deep_text = self.ocr_image_deep(source, deep_timeout, pixels, stop_on_timeout=not quarantine)
+            
+            combined_text = ocr_text + "\n" + deep_text
+            if texts is not None:
+                texts.append(deep_text)
+            
+            if order_number is None:
+                order_number = extract_order_number(combined_text)
+            if amount is None:
+                amount = extract_amount(combined_text)
+        
+        return order_number, amount
+
+    def recognize_file(self, image_file, texts=None):
+        """识别图片文件（命令行工具使用），返回 (订单号, 金额)，识别超时按识别失败处理
+
+        命令行处理的是用户的文件夹，图片可能随时被替换，一次性读取而不映射（见mapped_file.py）。
+        """
+        try:
+            with open_mapped(image_file) as buffer:
+                return self.recognize_image(image_file, buffer, texts=texts)
+        except OCRTimeout as e:
+            print(f"  ✗ {e}")
+            return None, None
+
+
+_recognizer = None
+_recognizer_lock = threading.Lock()
+
+
+def get_recognizer():
+    """本进程共享的识别器（命令行工具使用）"""
+    global _recognizer
+    with _recognizer_lock:
+        if _recognizer is None:
+            _recognizer = Recognizer()
+        return _recognizer
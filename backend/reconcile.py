@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对账 - 识别总额与预期金额不一致时，找出金额合计正好等于差额的图片组合
+
+金额按分计算。先用哈希表查找1～3张图片的组合（最常见的情况：漏放、重复或放错文件夹的一两张截图），
+找不到时再用位集动态规划求一个任意张数的组合。动态规划的内存和时间都有上限，超过时放弃，
+几百个金额时也能在毫秒到数百毫秒内返回。
+"""
+
+import time
+from array import array
+from collections import defaultdict
+
+# 哈希查找的最大组合张数、最多返回的组合数
+MAX_SMALL_SUBSET = 3
+MAX_RESULTS = 3
+# 动态规划上限：差额（分，每分占4字节）、耗时（秒）
+DP_MAX_CENTS = 5 * 10 ** 6
+DP_SECONDS = 1.0
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def _small_subsets(items, target, max_results, deadline):
+    """1～3张图片的组合（下标递增，不重复）；3张的查找为O(n²)，超时后停止"""
+    by_cents = defaultdict(list)
+    for index, (_, cents) in enumerate(items):
+        by_cents[cents].append(index)
+    found = []
+
+    for k in by_cents.get(target, ()):
+        found.append((k,))
+        if len(found) >= max_results:
+            return found
+    for i, (_, first) in enumerate(items):
+        for k in by_cents.get(target - first, ()):
+            if k > i:
+                found.append((i, k))
+                if len(found) >= max_results:
+                    return found
+    if MAX_SMALL_SUBSET >= 3:
+        for i, (_, first) in enumerate(items):
+            if time.monotonic() > deadline:
+                break
+            for j in range(i + 1, len(items)):
+                rest = target - first - items[j][1]
+                if rest <= 0:
+                    continue
+                for k in by_cents.get(rest, ()):
+                    if k > j:
+                        found.append((i, j, k))
+                        if len(found) >= max_results:
+                            return found
+    return found
+
+
+def _dp_subset(items, target, seconds):
+    """位集动态规划：第i位为1表示可以凑出i分；每个金额记录第一次凑出它的图片，用于回溯出组合"""
+    if target > DP_MAX_CENTS:
+        return None
+    deadline = time.monotonic() + seconds
+    mask = (1 << (target + 1)) - 1
+    reachable = 1
+    first = array('i', [-1]) * (target + 1)
+    for index, (_, cents) in enumerate(items):
+        new = (reachable << cents) & mask & ~reachable
+        if new:
+            reachable |= new
+            # 新凑出的金额（bin字符串反转后第k位对应k分）
+            bits = bin(new)[:1:-1]
+            position = bits.find('1')
+            while position >= 0:
+                first[position] = index
+                position = bits.find('1', position + 1)
+            if reachable >> target & 1:
+                break
+        if time.monotonic() > deadline:
+            return None
+    if first[target] < 0:
+        return None
+    # 第一次凑出s分时用到的图片为first[s]，剩余金额在此之前已能凑出，下标严格递减，不会重复
+    subset = []
+    remaining = target
+    while remaining:
+        index = first[remaining]
+        subset.append(index)
+        remaining -= items[index][1]
+    return tuple(reversed(subset))
+
+
+def find_subsets(items, target, max_results=MAX_RESULTS, seconds=DP_SECONDS):
+    """在 [(标签, 金额分)] 中查找合计等于target分的组合，返回 [[标签, ...]]，张数少的在前"""
+    if target <= 0:
+        return []
+    items = [(label, cents) for label, cents in items if 0 < cents <= target]
+    subsets = _small_subsets(items, target, max_results, time.monotonic() + seconds)
+    if not subsets:
+        subset = _dp_subset(items, target, seconds)
+        subsets = [subset] if subset else []
+    return [[items[index][0] for index in subset] for subset in subsets]
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务结果库 - 每个任务的去重订单、重复订单、重复图片和识别失败文件写入结果目录下的SQLite（results.sqlite3）
+
+- 订单按文件夹、金额、订单号建索引，筛选、排序、分页和按文件夹汇总都在SQLite中完成，
+  前端不再需要下载完整的result.json在浏览器中排序
+- 导出等需要逐行读取订单的接口按索引顺序游标读取，内存占用固定
+
+处理完成时由OCRService写入；没有结果库的旧任务在第一次读取时由result.json生成。
+处理过程中已识别的图片追加写入results.live.jsonl（LiveResults），前端按偏移量增量读取，
+不必等整个任务完成才显示结果。
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+from serializer import dumps_str, loads, load_file
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境
+    fcntl = None
+
+RESULT_STORE_NAME = 'results.sqlite3'
+LIVE_RESULTS_NAME = 'results.live.jsonl'
+# 处理中的结果每次最多返回的行数
+MAX_LIVE_ROWS = 2000
+# 每批写入、读取的行数
+BATCH_SIZE = 1000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS orders (
+    idx              INTEGER PRIMARY KEY,
+    order_number     TEXT NOT NULL,
+    amount_cents     INTEGER NOT NULL,
+    filename         TEXT NOT NULL,
+    folder           TEXT NOT NULL,
+    relative_path    TEXT NOT NULL,
+    duplicate_count  INTEGER NOT NULL DEFAULT 0,
+    seen_task        TEXT,
+    seen_at          TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_folder ON orders (folder, amount_cents DESC);
+CREATE INDEX IF NOT EXISTS orders_amount ON orders (amount_cents);
+CREATE INDEX IF NOT EXISTS orders_number ON orders (order_number);
+CREATE TABLE IF NOT EXISTS duplicates (
+    idx              INTEGER PRIMARY KEY,
+    order_number     TEXT NOT NULL,
+    amount_cents     INTEGER NOT NULL,
+    original_file    TEXT NOT NULL,
+    duplicate_files  TEXT NOT NULL,
+    duplicate_count  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS duplicate_images (
+    idx    INTEGER PRIMARY KEY,
+    hash   TEXT NOT NULL,
+    files  TEXT NOT NULL,
+    count  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failed (
+    idx       INTEGER PRIMARY KEY,
+    filename  TEXT NOT NULL
+);
+'''
+
+# 订单排序方式（接口参数 -> ORDER BY）
+ORDER_SORTS = {
+    'index': 'idx',
+    'amount': 'amount_cents, idx',
+    '-amount': 'amount_cents DESC, idx',
+    'folder': 'folder, amount_cents DESC, idx',
+    'order_number': 'order_number, idx',
+}
+MAX_PAGE_SIZE = 500
+
+# 旧任务生成结果库：进程内的线程用这个锁，worker进程之间用结果目录下的文件锁
+_ensure_lock = threading.Lock()
+
+# 订单行的列（与orders表相同，金额为分）
+ORDER_COLUMNS = ('idx', 'order_number', 'amount_cents', 'filename', 'folder', 'relative_path',
+                 'duplicate_count', 'seen_task', 'seen_at')
+
+
+class ResultStore:
+    def __init__(self, result_folder):
+        self.path = Path(result_folder) / RESULT_STORE_NAME
+
+    def exists(self):
+        return self.path.exists()
+
+    def connect(self):
+        """每次读取新建连接（不跨线程、跨进程复用）
+        
+        结果库写入后不再修改，只会被整个替换为新文件，按immutable只读打开：不加锁，也不生成-wal/-shm文件；
+        替换时已打开的连接继续读旧文件。
+        """
+        return sqlite3.connect(self.path.resolve().as_uri() + '?immutable=1', uri=True)
+
+    def write(self, orders, duplicates=(), duplicate_images=(), failed=()):
+        """写入结果，覆盖已有结果；先写临时文件再替换，读取方不会看到写了一半的库
+        
+        orders: ORDER_COLUMNS顺序的元组
+        duplicates: (订单号, 金额分, 原始文件, [重复文件])
+        duplicate_images: {'hash', 'files', 'count'}
+        failed: 文件名
+        """
+        # 每次写入使用独立的临时文件，同时写入的请求不会互相删除对方的文件
+        fd, tmp_name = tempfile.mkstemp(dir=str(self.path.parent), prefix=f'.{self.path.name}.', suffix='.tmp')
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            self._write_file(tmp_path, orders, duplicates, duplicate_images, failed)
+            tmp_path.replace(self.path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def _write_file(self, path, orders, duplicates, duplicate_images, failed):
+        conn = sqlite3.connect(str(path))
+        try:
+            conn.executescript(SCHEMA)
+            self._insert(conn, 'INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', orders)
+            self._insert(conn, 'INSERT INTO duplicates VALUES (NULL, ?, ?, ?, ?, ?)', (
+                (order_number, amount_cents, original_file, dumps_str(files), len(files))
+                for order_number, amount_cents, original_file, files in duplicates
+            ))
+            self._insert(conn, 'INSERT INTO duplicate_images VALUES (NULL, ?, ?, ?)', (
+                (info['hash'], dumps_str(info['files']), info['count']) for info in duplicate_images
+            ))
+            self._insert(conn, 'INSERT INTO failed VALUES (NULL, ?)', ((filename,) for filename in failed))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert(conn, sql, rows):
+        rows = iter(rows)
+        while True:
+            batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+            if not batch:
+                break
+            conn.executemany(sql, batch)
+
+    def ensure(self, result_file):
+        """旧任务没有结果库时由result.json生成（并发的请求中只有一个生成，其余等待后直接使用）"""
+        if self.exists() or not Path(result_file).exists():
+            return
+        with _ensure_lock, open(self.path.with_suffix('.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # 拿到锁后再确认一次，其他请求可能刚生成完
+            if not self.exists():
+                self._build(result_file)
+
+    def _build(self, result_file):
+        result = load_file(result_file)
+        duplicates = result.get('duplicates', [])
+        duplicate_counts = {item['order_number']: item['duplicate_count'] for item in duplicates}
+        orders = (
+            (order['index'], order['order_number'], round(order['amount'] * 100), order['filename'],
+             order.get('folder') or '根目录', order.get('relative_path') or order['filename'],
+             duplicate_counts.get(order['order_number'], 0),
+             (order.get('previously_seen') or {}).get('task_id'), (order.get('previously_seen') or {}).get('seen_at'))
+            for order in result.get('orders', [])
+        )
+        self.write(
+            orders,
+            ((item['order_number'], round(item['amount'] * 100), item['original_file'], item['duplicate_files'])
+             for item in duplicates),
+            result.get('duplicate_images_list', []),
+            result.get('failed_files', []),
+        )
+
+    def iter_by_folder(self):
+        """按文件夹、金额从大到小逐行读取订单（走orders_folder索引，内存占用固定）"""
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                f'SELECT {", ".join(ORDER_COLUMNS)} FROM orders ORDER BY folder, amount_cents DESC'
+            )
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _page(conn, sql, params, total, page, page_size, convert):
+        """分页查询（sql中的最后两个参数为LIMIT和OFFSET，total为符合条件的总行数），
+        返回 {'total', 'page', 'page_size', 'items'}"""
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        rows = conn.execute(sql, [*params, page_size, (page - 1) * page_size]).fetchall()
+        return {'total': total, 'page': page, 'page_size': page_size, 'items': [convert(row) for row in rows]}
+
+    @staticmethod
+    def _count(conn, table):
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    @staticmethod
+    def _order_filter(folder=None, min_amount=None, max_amount=None, search=None, seen=None):
+        """订单筛选条件（金额单位为元），返回 (WHERE子句, 参数)"""
+        conditions, params = [], []
+        if folder is not None:
+            conditions.append('folder = ?')
+            params.append(folder)
+        if min_amount is not None:
+            conditions.append('amount_cents >= ?')
+            params.append(round(min_amount * 100))
+        if max_amount is not None:
+            conditions.append('amount_cents <= ?')
+            params.append(round(max_amount * 100))
+        if search:
+            # 订单号前缀（范围查询，可以使用orders_number索引）
+            conditions.append('order_number >= ? AND order_number < ?')
+            params += [search, search + '\uffff']
+        if seen is not None:
+            conditions.append('seen_task IS NOT NULL' if seen else 'seen_task IS NULL')
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def query_orders(self, sort='-amount', page=1, page_size=50, **filters):
+        """筛选、排序、分页查询订单，并返回筛选结果的订单数和金额合计"""
+        where, params = self._order_filter(**filters)
+        conn = self.connect()
+        try:
+            total, cents = conn.execute(f'SELECT COUNT(*), SUM(amount_cents) FROM orders{where}', params).fetchone()
+            # 先在索引上分页取出行号再读取整行，翻到很后面的页时不用逐行读取跳过的订单
+            result = self._page(
+                conn, f'SELECT {", ".join(ORDER_COLUMNS)} FROM orders WHERE idx IN ('
+                      f'SELECT idx FROM orders{where} ORDER BY {ORDER_SORTS[sort]} LIMIT ? OFFSET ?'
+                      f') ORDER BY {ORDER_SORTS[sort]}',
+                params, total, page, page_size, self._order_item
+            )
+            result['amount'] = (cents or 0) / 100
+            return result
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _order_item(row):
+        idx, order_number, amount_cents, filename, folder, relative_path, duplicate_count, seen_task, seen_at = row
+        return {
+            'index': idx,
+            'order_number': order_number,
+            'amount': amount_cents / 100,
+            'filename': filename,
+            'folder': folder,
+            'relative_path': relative_path,
+            'duplicate_count': duplicate_count,
+            'previously_seen': {'task_id': seen_task, 'seen_at': seen_at} if seen_task else None,
+        }
+
+    def folder_totals(self, min_amount=None, max_amount=None, seen=None):
+        """按文件夹汇总订单数和金额"""
+        where, params = self._order_filter(min_amount=min_amount, max_amount=max_amount, seen=seen)
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                f'SELECT folder, COUNT(*), SUM(amount_cents) FROM orders{where} GROUP BY folder ORDER BY folder', params
+            ).fetchall()
+        finally:
+            conn.close()
+        return [{'folder': folder, 'count': count, 'amount': cents / 100} for folder, count, cents in rows]
+
+    def query_duplicates(self, page=1, page_size=50):
+        conn = self.connect()
+        try:
+            return self._page(
+                conn, 'SELECT order_number, amount_cents, original_file, duplicate_files, duplicate_count '
+                      'FROM duplicates ORDER BY idx LIMIT ? OFFSET ?', [], self._count(conn, 'duplicates'), page, page_size,
+                lambda row: {'order_number': row[0], 'amount': row[1] / 100, 'original_file': row[2],
+                             'duplicate_files': loads(row[3]), 'duplicate_count': row[4]}
+            )
+        finally:
+            conn.close()
+
+    def query_duplicate_images(self, page=1, page_size=50):
+        conn = self.connect()
+        try:
+            return self._page(
+                conn, 'SELECT hash, files, count FROM duplicate_images ORDER BY idx LIMIT ? OFFSET ?', [],
+                self._count(conn, 'duplicate_images'), page, page_size,
+                lambda row: {'hash': row[0], 'files': loads(row[1]), 'count': row[2]}
+            )
+        finally:
+            conn.close()
+
+    def query_failed(self, page=1, page_size=50):
+        conn = self.connect()
+        try:
+            return self._page(
+                conn, 'SELECT idx, filename FROM failed ORDER BY idx LIMIT ? OFFSET ?', [],
+                self._count(conn, 'failed'), page, page_size,
+                lambda row: {'index': row[0], 'filename': row[1]}
+            )
+        finally:
+            conn.close()
+
+
+class LiveResults:
+    """处理中已识别图片的追加日志（每行一个ImageRecord的JSON数组），任务完成、写入结果库后删除
+    
+    写入方为处理任务的线程（可能在另一个worker进程），读取方按字节偏移量增量读取，只读取完整的行。
+    第一行是本次处理的标识（JSON字符串）：任务重新处理时日志被截断重写，读取方据此发现旧偏移量失效。
+    """
+
+    def __init__(self, result_folder):
+        self.path = Path(result_folder) / LIVE_RESULTS_NAME
+        self.buffer = []
+
+    def start(self):
+        """新建日志（覆盖上次处理的日志）；先写临时文件再替换，读取方不会看到没有标识的文件"""
+        self.buffer = []
+        fd, tmp_name = tempfile.mkstemp(dir=str(self.path.parent), prefix=f'.{self.path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(f'"{os.urandom(8).hex()}"\n'.encode())
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def append(self, record):
+        self.buffer.append(record.to_json() + b'\n')
+
+    def flush(self):
+        """追加写入（每次进度回调时调用，读取方每批看到的行不超过两次回调之间的图片数）"""
+        if not self.buffer:
+            return
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(self.buffer))
+        self.buffer = []
+
+    def remove(self):
+        self.buffer = []
+        self.path.unlink(missing_ok=True)
+
+    def read(self, offset=0, limit=MAX_LIVE_ROWS, generation=None):
+        """从字节偏移量offset开始读取最多limit行
+        
+        返回 (记录列表, 下一次读取的偏移量, 日志标识, 是否从头重新读取)。generation为上次返回的标识；
+        标识不同（任务已重新处理）、偏移量超出文件大小或不在行首时从头读取，调用方应丢弃之前读到的记录。
+        """
+        items = []
+        reset = False
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.readline()
+                current = self._generation(header)
+                start = len(header) if current is not None else 0
+                size = os.fstat(f.fileno()).st_size
+                if offset and (offset < start or offset > size or (generation and generation != current)):
+                    offset, reset = start, True
+                offset = max(offset, start)
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n') or len(items) >= limit:
+                        break
+                    try:
+                        item = self._live_item(loads(line))
+                    except (ValueError, TypeError):
+                        if items or offset == start:
+                            raise
+                        # 偏移量落在行中间（没有传入标识的旧客户端），从头读取
+                        return self.read(start, limit, current)[:3] + (True,)
+                    offset += len(line)
+                    items.append(item)
+        except FileNotFoundError:
+            current = generation
+        return items, offset, current, reset
+
+    @staticmethod
+    def _generation(line):
+        """第一行中的日志标识；旧版本写入的日志没有标识行时返回None"""
+        if not line.endswith(b'\n'):
+            return None
+        try:
+            value = loads(line)
+        except ValueError:
+            return None
+        return value if isinstance(value, str) else None
+
+    @staticmethod
+    def _live_item(row):
+        # ImageRecord字段顺序：type, relative_path, order_number, amount_cents, folder, error
+        record_type, relative_path, order_number, amount_cents, folder, error = row
+        return {
+            'type': 'failed' if record_type not in ('success', 'cached') else 'order',
+            'order_number': order_number,
+            'amount': amount_cents / 100 if amount_cents is not None else None,
+            'filename': relative_path.rsplit('/', 1)[-1],
+            'folder': folder or '根目录',
+            'relative_path': relative_path,
+            'error': error,
+        }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR前自动缩小大图 - 按目标文字高度缩放，目标高度根据识别结果自动调整
+
+微信账单截图的界面随屏幕宽度等比缩放，正文字高约为图片宽度的 TEXT_HEIGHT_RATIO。
+从 DEFAULT_TEXT_HEIGHT 开始，按 EXPLORE_EVERY 的间隔用更小一档试探；
+某一档的识别成功率达到 MIN_SUCCESS_RATE 即采用，当前档成功率下降则退回更保守的一档。
+默认档也不够时（例如翻拍屏幕的高像素照片）继续退到更大的字高，最大一档仍不够则不再缩放，
+之后仍按间隔试探最大一档，成功率恢复后重新启用。
+缩小后识别失败的图片会用原图重新识别，不影响准确率。
+
+环境变量 OCR_DOWNSCALE=0 关闭缩放（用于基准测试对比）。
+"""
+
+import os
+import io
+import threading
+
+from mapped_file import as_file
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+OCR_DOWNSCALE = os.environ.get('OCR_DOWNSCALE', '1') != '0'
+# 正文字高 / 图片宽度（1080宽截图的正文约40像素）
+TEXT_HEIGHT_RATIO = 40 / 1080
+# 候选目标字高（像素），从保守到激进；开始时使用DEFAULT_TEXT_HEIGHT
+TARGET_TEXT_HEIGHTS = (64, 52, 40, 34, 28, 24)
+DEFAULT_TEXT_HEIGHT = 40
+# 缩放比例小于该值才缩放（缩小不足10%时收益太小）
+MIN_SCALE_GAIN = 0.9
+# 每隔多少张图片用更小一档试探一次
+EXPLORE_EVERY = 10
+# 判断一档是否可用需要的样本数和成功率
+MIN_SAMPLES = 20
+MIN_SUCCESS_RATE = 0.97
+
+
+class ScaleLearner:
+    """根据各档目标字高的识别成功率选择缩放档位，线程安全（同一进程内的任务共享）"""
+
+    def __init__(self, heights=TARGET_TEXT_HEIGHTS, default=DEFAULT_TEXT_HEIGHT):
+        self.heights = heights
+        self.level = heights.index(default)  # 当前采用的档位下标，-1表示不缩放
+        self.stats = {height: [0, 0] for height in heights}  # {字高: [尝试次数, 成功次数]}
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def choose(self, width):
+        """返回本张图片的目标宽度，无需缩放时返回None"""
+        if not width:
+            return None
+        with self.lock:
+            self.counter += 1
+            level = self.level
+            if level + 1 < len(self.heights) and self.counter % EXPLORE_EVERY == 0:
+                level += 1
+        if level < 0:
+            return None
+        target_width = round(self.heights[level] / TEXT_HEIGHT_RATIO)
+        if target_width >= width * MIN_SCALE_GAIN:
+            return None
+        return target_width
+
+    def height_for(self, target_width):
+        return min(self.heights, key=lambda height: abs(height / TEXT_HEIGHT_RATIO - target_width))
+
+    def record(self, target_width, success):
+        """记录缩放后的识别结果，并调整当前档位"""
+        height = self.height_for(target_width)
+        with self.lock:
+            stats = self.stats[height]
+            stats[0] += 1
+            stats[1] += int(success)
+            level = self.heights.index(height)
+            rate = stats[1] / stats[0]
+            if stats[0] < MIN_SAMPLES:
+                return
+            if level == self.level + 1 and rate >= MIN_SUCCESS_RATE:
+                self.level = level
+                print(f"📐 缩放档位调整为字高 {height}px（成功率 {rate:.1%}）")
+            elif level == self.level and rate < MIN_SUCCESS_RATE:
+                self.level -= 1
+                # 退回后重新统计，避免旧样本导致反复切换
+                self.stats[height] = [0, 0]
+                if self.level < 0:
+                    print(f"📐 字高 {height}px 成功率仍不足（{rate:.1%}），暂停缩放")
+                else:
+                    print(f"📐 缩放档位退回字高 {self.heights[self.level]}px（成功率 {rate:.1%}）")
+
+    def summary(self):
+        with self.lock:
+            return {
+                'text_height': self.heights[self.level] if self.level >= 0 else None,
+                'stats': {str(height): {'tries': tries, 'success': success}
+                          for height, (tries, success) in self.stats.items() if tries},
+            }
+
+
+def downscale(source, target_width):
+    """按目标宽度等比缩小，返回PNG字节（无损，避免文字边缘出现压缩噪点）
+
+    source为文件路径或已映射的图片内容。
+    """
+    with Image.open(as_file(source)) as image:
+        image.draft('RGB', (target_width, target_width * image.height // image.width))  # JPEG解码时直接降采样
+        image = image.convert('L')
+        height = round(image.height * target_width / image.width)
+        image = image.resize((target_width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue(), target_width * height
+
+
+_learner = ScaleLearner()
+
+
+def get_learner():
+    """本进程共享的缩放档位（没有Pillow或已关闭缩放时返回None）"""
+    if Image is None or not OCR_DOWNSCALE:
+        return None
+    return _learner
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR调度器 - 同一进程内的所有任务共用一组OCR线程，按任务加权公平调度
+
+- 每个任务一条队列，按虚拟时间轮流取图片：每识别一张，任务的虚拟时间增加 1/权重，
+  调度器总是取虚拟时间最小的任务，权重由任务优先级决定（高优先级分到更多线程时间）
+- 新任务从当前虚拟时间开始计时，不会因为之前没有排队而一次性占满线程
+- 图片数不超过 FAST_LANE_LIMIT 的小任务进入快速通道，优先于普通任务调度，
+  但最多占用 OCR线程数-1 个线程，保证大任务不会完全停顿
+
+环境变量 OCR_FAST_LANE 设置快速通道的图片数上限（0表示关闭）。
+"""
+
+import os
+import threading
+import concurrent.futures
+from collections import deque
+
+# 优先级 -> 权重
+PRIORITY_WEIGHTS = {'low': 1, 'normal': 2, 'high': 4}
+DEFAULT_PRIORITY = 'normal'
+FAST_LANE_LIMIT = int(os.environ.get('OCR_FAST_LANE', 50))
+
+
+class Lane:
+    """一个任务的排队通道，提供与ThreadPoolExecutor相同的submit接口"""
+
+    def __init__(self, scheduler, task_id, priority, size):
+        self.scheduler = scheduler
+        self.task_id = task_id
+        self.priority = priority
+        self.weight = PRIORITY_WEIGHTS[priority]
+        self.fast = size is not None and 0 < size <= FAST_LANE_LIMIT
+        self.queue = deque()
+        self.vtime = 0.0
+        self.running = 0
+
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        self.scheduler._enqueue(self, (future, fn, args, kwargs))
+        return future
+
+    def close(self):
+        self.scheduler._remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OCRScheduler:
+    def __init__(self, workers):
+        self.workers = workers
+        self.lanes = []
+        self.vtime = 0.0
+        self.fast_running = 0
+        self.cond = threading.Condition()
+        self.threads = []
+
+    def lane(self, task_id, priority=DEFAULT_PRIORITY, size=None):
+        """为任务创建排队通道（size为预计图片数，用于判断是否进入快速通道）"""
+        lane = Lane(self, task_id, priority, size)
+        self.start()
+        with self.cond:
+            lane.vtime = self.vtime
+            self.lanes.append(lane)
+        return lane
+
+    def start(self):
+        """启动OCR线程（重复调用无副作用）
+
+        在worker进程中调用（gunicorn的post_fork或第一个任务到来时），fork之前启动的线程不会被继承。
+        """
+        with self.cond:
+            if not self.threads:
+                self._start_threads()
+
+    def _start_threads(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'ocr-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _enqueue(self, lane, item):
+        with self.cond:
+            if not lane.queue:
+                # 空闲后重新排队的任务从当前虚拟时间开始，不积累“欠账”
+                lane.vtime = max(lane.vtime, self.vtime)
+            lane.queue.append(item)
+            self.cond.notify()
+
+    def _remove(self, lane):
+        with self.cond:
+            if lane in self.lanes:
+                self.lanes.remove(lane)
+            cancelled, lane.queue = lane.queue, deque()
+        for future, *_ in cancelled:
+            future.cancel()
+
+    def _next(self):
+        """选出下一张图片（调用方持有锁）"""
+        waiting = [lane for lane in self.lanes if lane.queue]
+        if not waiting:
+            return None
+        fast = [lane for lane in waiting if lane.fast]
+        normal = [lane for lane in waiting if not lane.fast]
+        if fast and (not normal or self.fast_running < max(1, self.workers - 1)):
+            candidates = fast
+        else:
+            candidates = normal
+        lane = min(candidates, key=lambda lane: lane.vtime)
+        self.vtime = max(self.vtime, lane.vtime)
+        lane.vtime += 1 / lane.weight
+        return lane, lane.queue.popleft()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                selected = self._next()
+                while selected is None:
+                    self.cond.wait()
+                    selected = self._next()
+                lane, (future, fn, args, kwargs) = selected
+                lane.running += 1
+                self.fast_running += lane.fast
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self.cond:
+                    lane.running -= 1
+                    self.fast_running -= lane.fast
+
+    def snapshot(self, task_id):
+        """任务的排队情况：已提交未开始、正在识别的图片数，以及整个进程的排队情况"""
+        with self.cond:
+            lanes = [lane for lane in self.lanes if lane.task_id == task_id]
+            return {
+                'queued': sum(len(lane.queue) for lane in lanes),
+                'running': sum(lane.running for lane in lanes),
+                'lane': 'fast' if any(lane.fast for lane in lanes) else 'normal',
+                'priority': lanes[0].priority if lanes else None,
+                'active_tasks': len({lane.task_id for lane in self.lanes}),
+                'pool_queued': sum(len(lane.queue) for lane in self.lanes),
+                'pool_workers': self.workers,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(workers):
+    """本进程共享的OCR调度器（线程数在第一次调用时确定）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = OCRScheduler(workers)
+        return _scheduler
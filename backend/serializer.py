@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化层 - 优先使用orjson/msgspec，未安装时回退到标准库json
+"""
+
+import os
+import gzip
+import json
+import tempfile
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 超过该大小（字节）的响应才进行压缩
+COMPRESS_THRESHOLD = 16 * 1024
+
+_std_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_std_pretty_encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+if orjson is not None:
+    BACKEND = 'orjson'
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+else:
+    BACKEND = 'json'
+
+
+def dumps(obj, pretty=False):
+    """序列化为UTF-8字节串（默认紧凑格式，pretty=True时缩进便于人工查看）"""
+    if pretty:
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return _std_pretty_encoder.encode(obj).encode('utf-8')
+    if orjson is not None:
+        return orjson.dumps(obj)
+    if msgspec is not None:
+        return _msgspec_encoder.encode(obj)
+    return _std_encoder.encode(obj).encode('utf-8')
+
+
+def dumps_str(obj):
+    """序列化为紧凑的字符串"""
+    if orjson is None and msgspec is None:
+        return _std_encoder.encode(obj)
+    return dumps(obj).decode('utf-8')
+
+
+def loads(data):
+    """反序列化（接受bytes或str）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return _msgspec_decoder.decode(data.encode('utf-8') if isinstance(data, str) else data)
+    return json.loads(data)
+
+
+def load_file(path):
+    """读取并解析JSON文件"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def atomic_write(path, data):
+    """原子写入：先写临时文件再重命名，避免写入中断导致文件损坏"""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _accepted_encodings(accept_encoding):
+    """解析Accept-Encoding，返回 {编码: q值}；q值格式错误的项按不接受处理"""
+    accepted = {}
+    for item in (accept_encoding or '').lower().split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+                if not 0 <= q <= 1:
+                    q = 0.0
+        accepted['gzip' if coding == 'x-gzip' else coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding):
+    """根据Accept-Encoding选择压缩算法：q值最高的，相同时优先brotli；q=0表示不接受
+
+    未列出的编码按 * 的q值处理（没有 * 时不接受）。
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding):
+    """按指定算法压缩"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+
+def compressed_cached(data, encoding, cache_path):
+    """读取或生成压缩后的内容，压缩结果缓存到cache_path（内容不变时复用）"""
+    cache_path = Path(cache_path)
+    if cache_path.exists():
+        return cache_path.read_bytes()
+    compressed = compress(data, encoding)
+    atomic_write(cache_path, compressed)
+    return compressed
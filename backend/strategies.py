@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR识别策略链 - 按字段（订单号、金额）依次尝试不同的tesseract参数
+
+订单号和金额都是ASCII字符，默认先用只识别数字的英文模型（快），
+识别不出时再用中文+英文模型（可以靠“交易单号”等标签定位，慢）。
+每个策略按字段统计成功率和平均耗时，样本足够后按“成功率/耗时”自动调整顺序。
+
+环境变量 OCR_CHAIN_ORDER_NUMBER / OCR_CHAIN_AMOUNT 可配置各字段的策略顺序（逗号分隔）。
+"""
+
+import os
+import threading
+
+# 策略名称 -> tesseract参数
+STRATEGIES = {
+    # 英文模型 + 字符白名单，只输出数字、小数点和负号
+    'eng_digits': {'lang': 'eng', 'options': {'tessedit_char_whitelist': '0123456789.-'}},
+    # 英文模型，保留字母（部分商户订单号含字母）
+    'eng': {'lang': 'eng'},
+    # 中文+英文模型，可识别“交易单号”等标签，用于折行订单号的定位
+    'chi_sim_eng': {'lang': 'chi_sim+eng'},
+}
+
+FIELDS = ('order_number', 'amount')
+DEFAULT_CHAIN = ('eng_digits', 'chi_sim_eng')
+
+# 每个策略至少需要的样本数，所有策略都达到后才自动调整顺序
+MIN_SAMPLES = 30
+# 每隔多少张图片按配置的顺序执行一次，持续更新排在后面的策略的统计
+EXPLORE_EVERY = 20
+
+
+def _load_chain(field):
+    value = os.environ.get(f'OCR_CHAIN_{field.upper()}')
+    if not value:
+        return DEFAULT_CHAIN
+    chain = tuple(name.strip() for name in value.split(',') if name.strip())
+    unknown = [name for name in chain if name not in STRATEGIES]
+    if unknown or not chain:
+        raise ValueError(f'未知的OCR策略: {unknown}，可选: {list(STRATEGIES)}')
+    return chain
+
+
+class StrategyChain:
+    """按字段选择下一个策略，线程安全（同一进程内的任务共享统计）"""
+
+    def __init__(self, chains=None):
+        self.chains = chains or {field: _load_chain(field) for field in FIELDS}
+        self.stats = {}  # {(字段, 策略): [尝试次数, 成功次数]}
+        self.seconds = {}  # {策略: [调用次数, 总耗时]}
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def start_image(self):
+        """开始一张新图片，返回本张图片是否按配置顺序执行（探索）"""
+        with self.lock:
+            self.counter += 1
+            return self.counter % EXPLORE_EVERY == 0
+
+    def order(self, field, explore=False):
+        """字段的策略顺序"""
+        chain = self.chains[field]
+        if explore:
+            return chain
+        with self.lock:
+            scores = []
+            for index, name in enumerate(chain):
+                tries, success = self.stats.get((field, name), (0, 0))
+                calls, total = self.seconds.get(name, (0, 0.0))
+                if tries < MIN_SAMPLES or not calls:
+                    return chain
+                scores.append((-(success / tries) / max(total / calls, 1e-3), index, name))
+        return tuple(name for _, _, name in sorted(scores))
+
+    def next_strategy(self, missing, tried, explore=False):
+        """缺失字段的下一个未执行过的策略，没有时返回None"""
+        for field in FIELDS:
+            if field not in missing:
+                continue
+            for name in self.order(field, explore):
+                if name not in tried:
+                    return name
+        return None
+
+    def record(self, strategy, seconds, results):
+        """记录一次调用：耗时和各字段是否识别成功（results为{字段: 是否成功}）"""
+        with self.lock:
+            calls = self.seconds.setdefault(strategy, [0, 0.0])
+            calls[0] += 1
+            calls[1] += seconds
+            for field, success in results.items():
+                stats = self.stats.setdefault((field, strategy), [0, 0])
+                stats[0] += 1
+                stats[1] += int(success)
+
+    def summary(self):
+        order = {field: list(self.order(field)) for field in FIELDS}
+        with self.lock:
+            return {
+                'order': order,
+                'stats': {
+                    f'{field}/{strategy}': {'tries': tries, 'success': success}
+                    for (field, strategy), (tries, success) in sorted(self.stats.items())
+                },
+                'avg_seconds': {
+                    strategy: round(total / calls, 3) for strategy, (calls, total) in self.seconds.items() if calls
+                },
+            }
+
+
+_chain = None
+_chain_lock = threading.Lock()
+
+
+def get_chain():
+    """本进程共享的策略链"""
+    global _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = StrategyChain()
+        return _chain
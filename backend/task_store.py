@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务状态存储 - 每个任务一个task.json，多个gunicorn worker之间共享
+
+每次更新版本号加一，客户端可以用版本号长轮询“自版本N之后是否有变化”。
+"""
+
+import time
+import uuid
+import threading
+from pathlib import Path
+
+from serializer import dumps, load_file, atomic_write
+
+# 长轮询时检查其他worker写入的间隔（秒）
+POLL_INTERVAL = 0.5
+
+
+def is_valid_task_id(task_id):
+    """任务ID必须是UUID，防止路径穿越"""
+    try:
+        return str(uuid.UUID(task_id)) == task_id
+    except (ValueError, TypeError, AttributeError):
+        return False
+
+
+class TaskStore:
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.folder.mkdir(exist_ok=True)
+        self._tasks = {}  # {task_id: (文件mtime, 任务字典)}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def _path(self, task_id):
+        return self.folder / task_id / 'task.json'
+
+    def _write(self, task_id, task):
+        path = self._path(task_id)
+        path.parent.mkdir(exist_ok=True)
+        atomic_write(path, dumps(task))
+        self._tasks[task_id] = (path.stat().st_mtime_ns, task)
+        with self._changed:
+            self._changed.notify_all()
+
+    def get(self, task_id):
+        """读取任务；其他worker更新过时从磁盘重新加载"""
+        if not is_valid_task_id(task_id):
+            return None
+        path = self._path(task_id)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._tasks.pop(task_id, None)
+            return None
+        cached = self._tasks.get(task_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            task = load_file(path)
+        except Exception:
+            # 极少数情况下读到其他进程正在替换的文件，使用旧值
+            return cached[1] if cached else None
+        self._tasks[task_id] = (mtime, task)
+        return task
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+    def create(self, task_id, **fields):
+        """创建任务（版本号从1开始）"""
+        with self._lock:
+            task = dict(fields, version=1)
+            self._write(task_id, task)
+            return task
+
+    def update(self, task_id, **fields):
+        """更新任务字段，版本号加一"""
+        with self._lock:
+            task = self.get(task_id)
+            if task is None:
+                return None
+            task = dict(task, **fields)
+            task['version'] = task.get('version', 0) + 1
+            self._write(task_id, task)
+            return task
+
+    def delete(self, task_id):
+        """删除任务记录"""
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            path = self._path(task_id)
+            if path.exists():
+                path.unlink()
+
+    def wait_for_change(self, task_id, since_version, timeout):
+        """长轮询：等待任务版本号大于since_version，超时返回当前状态"""
+        deadline = time.monotonic() + timeout
+        while True:
+            task = self.get(task_id)
+            if task is None or task.get('version', 0) > since_version:
+                return task
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return task
+            # 本进程内的更新会立即唤醒；其他worker的更新靠定期检查文件
+            with self._changed:
+                self._changed.wait(min(remaining, POLL_INTERVAL))
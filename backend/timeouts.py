@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应OCR超时 - 根据最近的识别耗时分布和图片像素数计算每次调用的超时时间
+
+样本不足时使用固定的最大超时（与原来的15秒一致）；样本足够后按
+“每百万像素耗时的p95 × 图片百万像素数 × 倍数”计算，并限制在[最小, 最大]之间。
+超时的图片进入隔离队列，在主批次完成后用宽松的超时单独重试。
+"""
+
+import os
+import threading
+from collections import deque
+
+# 超时上下限（秒）
+OCR_TIMEOUT_MIN = float(os.environ.get('OCR_TIMEOUT_MIN', 3))
+OCR_TIMEOUT_MAX = float(os.environ.get('OCR_TIMEOUT_MAX', 15))
+# 超时 = p95耗时 × 该倍数
+OCR_TIMEOUT_FACTOR = float(os.environ.get('OCR_TIMEOUT_FACTOR', 4))
+# 隔离队列重试时每次调用的超时（秒）
+QUARANTINE_TIMEOUT = float(os.environ.get('QUARANTINE_TIMEOUT', 60))
+# 开始自适应前需要的样本数和保留的最近样本数
+MIN_SAMPLES = 20
+WINDOW = 500
+# 小于该像素数（百万）的图片按该值计算，避免小图得到过短的超时
+MIN_MEGAPIXELS = 0.5
+
+
+class OCRTimeout(Exception):
+    """OCR调用超时（图片进入隔离队列）"""
+
+
+class AdaptiveTimeout:
+    """按识别模式（normal/deep）分别统计耗时，线程安全"""
+
+    def __init__(self, minimum=OCR_TIMEOUT_MIN, maximum=OCR_TIMEOUT_MAX, factor=OCR_TIMEOUT_FACTOR):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.samples = {}  # {模式: deque[(耗时, 百万像素数或None)]}
+        self.cached = {}  # {模式: (每百万像素p95, 耗时p95)}
+        self.dirty = {}
+        self.lock = threading.Lock()
+
+    def observe(self, mode, seconds, pixels=None):
+        """记录一次成功调用的耗时"""
+        megapixels = max(pixels / 1e6, MIN_MEGAPIXELS) if pixels else None
+        with self.lock:
+            samples = self.samples.get(mode)
+            if samples is None:
+                samples = self.samples[mode] = deque(maxlen=WINDOW)
+            samples.append((seconds, megapixels))
+            self.dirty[mode] = self.dirty.get(mode, 0) + 1
+
+    def _p95(self, mode):
+        """每百万像素耗时和原始耗时的p95（每10个新样本重新计算一次）"""
+        samples = self.samples.get(mode)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        if mode not in self.cached or self.dirty.get(mode, 0) >= 10:
+            per_mp = sorted(seconds / megapixels for seconds, megapixels in samples if megapixels)
+            raw = sorted(seconds for seconds, _ in samples)
+            self.cached[mode] = (
+                per_mp[int(len(per_mp) * 0.95)] if len(per_mp) >= MIN_SAMPLES else None,
+                raw[int(len(raw) * 0.95)],
+            )
+            self.dirty[mode] = 0
+        return self.cached[mode]
+
+    def timeout(self, mode, pixels=None):
+        """本次调用的超时时间（秒）"""
+        with self.lock:
+            p95 = self._p95(mode)
+        if p95 is None:
+            return self.maximum
+        per_mp, raw = p95
+        if per_mp is not None and pixels:
+            expected = per_mp * max(pixels / 1e6, MIN_MEGAPIXELS)
+        else:
+            expected = raw
+        return min(max(expected * self.factor, self.minimum), self.maximum)
+
+
+_timeouts = {}
+_timeouts_lock = threading.Lock()
+
+
+def get_timeouts(engine_name):
+    """本进程共享的自适应超时，按引擎区分（不同引擎的耗时分布不同）"""
+    with _timeouts_lock:
+        if engine_name not in _timeouts:
+            _timeouts[engine_name] = AdaptiveTimeout()
+        return _timeouts[engine_name]
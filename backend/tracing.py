@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务耗时追踪 - 记录每个处理阶段和每张图片的耗时，导出Chrome trace格式
+
+trace.json 可在 chrome://tracing 或 https://ui.perfetto.dev 中打开。
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+# 单个任务最多保留的明细事件数（超出后只统计汇总，不再记录明细）
+MAX_TRACE_EVENTS = 200000
+
+# 性能分析模式：cprofile / pyinstrument，默认关闭
+PROFILE_MODE = os.environ.get('OCR_PROFILE', '')
+
+
+class Tracer:
+    """记录span（阶段、单张图片），线程安全"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []  # (名称, 类别, 线程号, 开始微秒, 持续微秒, 参数)
+        self.dropped = 0
+        self.totals = defaultdict(lambda: [0, 0.0, 0.0])  # {(类别, 名称): [次数, 总耗时, 最大耗时]}
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def _thread_id(self):
+        ident = threading.get_ident()
+        tid = self.threads.get(ident)
+        if tid is None:
+            with self.lock:
+                tid = self.threads.setdefault(ident, (len(self.threads) + 1, threading.current_thread().name))
+        return tid[0]
+
+    def add(self, name, category, start, duration, args=None):
+        """记录一个已结束的span（start为perf_counter时间）"""
+        tid = self._thread_id()
+        with self.lock:
+            total = self.totals[(category, name)]
+            total[0] += 1
+            total[1] += duration
+            total[2] = max(total[2], duration)
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append((
+                    name, category, tid,
+                    int((start - self.origin) * 1e6), int(duration * 1e6),
+                    args
+                ))
+            else:
+                self.dropped += 1
+
+    @contextmanager
+    def span(self, name, category='stage', **args):
+        """记录代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter() - start, args or None)
+
+    def summary(self):
+        """汇总耗时：stages为各阶段总耗时，per_image为单张图片各步骤的次数/总耗时/最大耗时"""
+        stages = {}
+        per_image = {}
+        for (category, name), (count, total, longest) in self.totals.items():
+            if category == 'stage':
+                stages[name] = round(total, 3)
+            else:
+                per_image[name] = {
+                    'count': count,
+                    'total': round(total, 3),
+                    'avg': round(total / count, 4) if count else 0,
+                    'max': round(longest, 3),
+                }
+        return {
+            'wall': round(time.perf_counter() - self.origin, 3),
+            'stages': stages,
+            'per_image': per_image,
+            'dropped_events': self.dropped,
+        }
+
+    def to_chrome_trace(self):
+        """导出为Chrome trace事件格式"""
+        pid = os.getpid()
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+            for tid, thread_name in self.threads.values()
+        ]
+        for name, category, tid, ts, dur, args in self.events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid, 'ts': ts, 'dur': dur}
+            if args:
+                event['args'] = args
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+class TaskProfiler:
+    """可选的性能分析（cProfile覆盖处理线程和所有OCR线程；pyinstrument只采样处理线程）"""
+
+    def __init__(self, mode, output_folder):
+        self.mode = mode
+        self.output_folder = output_folder
+        self.profiles = []
+        self.local = threading.local()
+        self.main = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            import cProfile
+            self.main = cProfile.Profile()
+            self.main.enable()
+        elif self.mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("✗ 未安装pyinstrument，跳过性能分析")
+                self.mode = ''
+                return
+            self.main = Profiler()
+            self.main.start()
+
+    def wrap(self, func):
+        """cProfile模式下，为每个OCR线程单独开启分析"""
+        if self.mode != 'cprofile':
+            return func
+
+        def profiled(*args, **kwargs):
+            profile = getattr(self.local, 'profile', None)
+            if profile is None:
+                import cProfile
+                profile = self.local.profile = cProfile.Profile()
+                self.profiles.append(profile)
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def stop(self):
+        """停止分析并写入结果文件，返回文件路径"""
+        if self.mode == 'cprofile':
+            import pstats
+            self.main.disable()
+            stats = pstats.Stats(self.main)
+            for profile in self.profiles:
+                stats.add(profile)
+            output = self.output_folder / 'profile.prof'
+            stats.dump_stats(str(output))
+            return output
+        if self.mode == 'pyinstrument':
+            self.main.stop()
+            output = self.output_folder / 'profile.html'
+            output.write_text(self.main.output_html(), encoding='utf-8')
+            return output
+        return None
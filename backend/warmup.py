@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动预热 - 减少gunicorn重启、worker回收（max_requests）后第一个任务的冷启动耗时
+
+preload()   在gunicorn主进程fork之前执行（when_ready钩子），加载只读数据，worker写时复制共享：
+            Pillow的图片格式插件、OCR的正则表达式（导入ocr_service时已编译），
+            并预读tesseract语言模型、订单索引和布隆过滤器文件到页缓存（所有进程共用）
+post_fork() 在每个worker启动后执行（post_fork钩子），初始化不能跨fork的资源：
+            OCR引擎、调度线程、清理线程、布隆过滤器（文件锁按打开的文件区分，不能继承）
+
+每个进程第一次OCR完成时输出“启动后多久完成第一次识别、该次识别耗时”，
+并记录到指标 hhg_first_ocr_seconds。
+"""
+
+import os
+import time
+import zlib
+import struct
+import threading
+
+import metrics
+
+# 进程启动时间（worker从fork开始计时）
+_started_at = time.monotonic()
+_first_ocr_done = False
+_first_ocr_lock = threading.Lock()
+
+
+def blank_png(width=64, height=32):
+    """生成白色灰度PNG，用于预热OCR引擎"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + b'\xff' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+def warm_engine(engine):
+    """用空白图片按每种语言调用一次引擎，让语言模型进入页缓存"""
+    from strategies import STRATEGIES
+    image = blank_png()
+    for lang in sorted({strategy.get('lang') for strategy in STRATEGIES.values()}, key=str):
+        try:
+            engine.recognize(image, lang=lang, timeout=30)
+        except Exception as e:
+            print(f"✗ 预热OCR引擎失败（{lang}）: {e}")
+
+
+def preload():
+    """fork之前执行：加载共享的只读数据（不启动线程、不保留数据库连接）"""
+    start = time.perf_counter()
+    from scaling import Image
+    if Image is not None:
+        Image.init()  # 导入全部图片格式插件，否则第一次打开图片时才导入
+    from engines import get_engine
+    import ocr_service  # noqa: F401  正则表达式在导入时编译
+    from app import order_index
+    warm_engine(get_engine())
+    order_index.prefetch()
+    print(f"✓ 预热完成: {time.perf_counter() - start:.2f} 秒")
+
+
+def post_fork():
+    """worker启动后执行：创建本进程的OCR引擎和后台线程"""
+    global _started_at
+    _started_at = time.monotonic()
+    from engines import get_engine
+    from scheduler import get_scheduler
+    from ocr_service import OCR_WORKERS
+    from reaper import start_reaper
+    from app import UPLOAD_FOLDER, RESULT_FOLDER, order_index
+    get_engine()
+    get_scheduler(OCR_WORKERS).start()
+    start_reaper(UPLOAD_FOLDER, RESULT_FOLDER)
+    order_index.open_bloom()
+
+
+def record_ocr(seconds):
+    """每次OCR后调用，记录本进程的第一次OCR"""
+    global _first_ocr_done
+    if _first_ocr_done:
+        return
+    with _first_ocr_lock:
+        if _first_ocr_done:
+            return
+        _first_ocr_done = True
+    since_start = time.monotonic() - _started_at
+    metrics.FIRST_OCR_SECONDS.labels('since_start').set(since_start)
+    metrics.FIRST_OCR_SECONDS.labels('ocr').set(seconds)
+    print(f"⏱ 进程 {os.getpid()} 首次OCR: 启动后 {since_start:.2f} 秒, 本次识别 {seconds:.2f} 秒")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件夹监视 - 报告目录树中新增、修改和删除的图片，不重复扫描整个目录
+
+- Linux上通过ctypes调用inotify（无需第三方库），每个子目录一个watch，新建的子目录自动加入；
+  只在文件写完关闭（IN_CLOSE_WRITE）或移入时报告，复制到一半的文件不会被识别
+- 其他系统、inotify不可用或网络文件系统（inotify看不到其他机器的修改）使用轮询：
+  定时比较文件的大小和修改时间，连续两次不变才报告，避免读到未写完的文件
+- 短时间内的多个事件合并为一批，一次放入几十张截图只触发一次处理
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+from pathlib import Path
+from collections import namedtuple
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+# 轮询间隔（秒）
+POLL_INTERVAL = float(os.environ.get('WATCH_POLL_INTERVAL', 2))
+# 事件合并：最后一个事件后等待的时间、一批最长等待的时间（秒）
+SETTLE_SECONDS = 0.3
+MAX_BATCH_SECONDS = 2.0
+
+# inotify常量（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+# changed: 新增或修改的图片；deleted: 删除或移出的图片或目录（目录表示其中的所有图片）；
+# rescan: 事件丢失（inotify队列溢出），调用方需要重新扫描整个目录
+Changes = namedtuple('Changes', 'changed deleted rescan')
+
+
+def is_image(path):
+    return Path(path).suffix.lower() in IMAGE_SUFFIXES
+
+
+def scan_images(root):
+    """遍历目录树，返回 {图片路径: (大小, 修改时间)}"""
+    found = {}
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif is_image(entry.name) and entry.is_file():
+                            stat = entry.stat()
+                            found[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue  # 扫描过程中被删除
+        except OSError:
+            continue
+    return found
+
+
+class InotifyWatcher:
+    """基于inotify的监视（仅Linux）"""
+
+    mode = 'inotify'
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+        self.root = Path(root)
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1失败')
+        self.directories = {}  # watch描述符 -> 目录
+        try:
+            self._add_tree(self.root)
+        except Exception:
+            self.close()
+            raise
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            import ctypes
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, 'inotify监视数达到上限（可调大 fs.inotify.max_user_watches）')
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return  # 目录已被删除
+            raise OSError(error, f'无法监视目录: {directory}')
+        self.directories[wd] = Path(directory)
+
+    def _add_tree(self, directory):
+        """监视目录及其所有子目录，返回其中已有的图片（新建或移入的目录在加入监视前可能已经写入了文件）"""
+        images = set()
+        for current, subdirectories, files in os.walk(directory):
+            self._add_watch(current)
+            images.update(Path(current) / name for name in files if is_image(name))
+        return images
+
+    def _read_events(self, timeout):
+        """读取一次事件，返回 [(mask, 路径)]；超时返回空列表"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self.directories.get(wd)
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, None))
+            elif directory is not None:
+                events.append((mask, directory / os.fsdecode(name) if name else directory))
+        return events
+
+    def changes(self, timeout=None):
+        """阻塞到有变化（或超时），返回一批Changes"""
+        changed, deleted = set(), set()
+        rescan = False
+        deadline = None
+        wait = timeout
+        while True:
+            events = self._read_events(wait)
+            if not events:
+                if deadline is not None or wait is not None:
+                    break
+                continue
+            for mask, path in events:
+                if path is None:
+                    rescan = True
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # 新目录：加入监视并报告其中已有的图片
+                        images = self._add_tree(path)
+                        changed |= images
+                        deleted -= images
+                    elif mask & (IN_MOVED_FROM | IN_DELETE):
+                        deleted.add(path)
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    if path == self.root:
+                        raise FileNotFoundError(f'监视的目录已被删除或移走: {path}')
+                elif is_image(path):
+                    if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        changed.add(path)
+                        deleted.discard(path)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        deleted.add(path)
+                        changed.discard(path)
+            if not (changed or deleted or rescan):
+                continue
+            # 合并短时间内的后续事件
+            now = time.monotonic()
+            deadline = deadline or now + MAX_BATCH_SECONDS
+            wait = min(SETTLE_SECONDS, deadline - now)
+            if wait <= 0:
+                break
+        return Changes(changed, deleted, rescan)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """定时比较文件大小和修改时间（不依赖系统通知）"""
+
+    mode = 'poll'
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        # 已报告的状态，以及上一次扫描看到的状态（连续两次相同才报告）
+        self.known = scan_images(self.root)
+        self.seen = dict(self.known)
+
+    def changes(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self.root.is_dir():
+                raise FileNotFoundError(f'监视的目录已被删除或移走: {self.root}')
+            current = scan_images(self.root)
+            changed = set()
+            for path, stat in current.items():
+                if stat != self.known.get(path) and stat == self.seen.get(path):
+                    changed.add(path)
+                    self.known[path] = stat
+            deleted = set(self.known) - set(current)
+            for path in deleted:
+                del self.known[path]
+            self.seen = current
+            if changed or deleted:
+                return Changes(changed, deleted, False)
+            if deadline is not None and time.monotonic() >= deadline:
+                return Changes(set(), set(), False)
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, poll=False):
+    """打开目录监视：优先使用inotify，不可用或poll为True时使用轮询"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"✗ inotify不可用，改为轮询: {e}")
+    return PollingWatcher(root)
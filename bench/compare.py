@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比两次基准测试结果
+
+使用示例:
+  python bench/compare.py bench/results/bench_abc123.json bench/results/bench_def456.json
+"""
+
+import sys
+import json
+
+METRICS = [
+    ('images_per_sec', '张/秒', True),
+    ('latency_p50', 'p50(秒)', False),
+    ('latency_p95', 'p95(秒)', False),
+    ('accuracy', '准确率', True),
+    ('deep_fallback_rate', '深度识别', False),
+    ('ocr_seconds_per_mp', '秒/百万像素', False),
+    ('peak_rss_mb', '峰值内存MB', False),
+]
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    return report, {(run['target'], run['size']): run for run in report['runs']}
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    old_report, old_runs = load(sys.argv[1])
+    new_report, new_runs = load(sys.argv[2])
+    print(f"基准: {old_report.get('commit')}  对比: {new_report.get('commit')}\n")
+
+    for key in sorted(set(old_runs) & set(new_runs)):
+        old, new = old_runs[key], new_runs[key]
+        print(f"{key[0]} @ {key[1]} 张")
+        for metric, label, higher_is_better in METRICS:
+            a, b = old.get(metric), new.get(metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else 0
+            better = (change > 0) == higher_is_better
+            mark = '' if abs(change) < 1 else ('✓' if better else '✗')
+            print(f"  {label:12s} {a:>10} -> {b:<10} ({change:+.1f}%) {mark}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP接口压测 - 模拟多个用户并发执行 上传 → 处理 → 轮询状态 → 获取结果 → 下载
+
+只依赖标准库。为了单独测量Web层、任务存储和文件读写的开销，服务端可以用模拟OCR引擎启动：
+  OCR_ENGINE=fake OCR_FAKE_LATENCY=0.2 gunicorn -c deploy/gunicorn.conf.py app:app
+
+使用示例:
+  python bench/loadtest.py --url http://127.0.0.1:5001 --clients 8 --batch-size 50 --tasks 3
+  python bench/loadtest.py --url http://127.0.0.1 --clients 32 --duration 300 --images bench/data/100_seed0
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import statistics
+import urllib.error
+import urllib.request
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict
+
+# 轮询时每次长轮询的最长等待（秒），与后端LONG_POLL_MAX_WAIT一致
+POLL_WAIT = 20
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def percentile(values, pct):
+    """百分位数（最近秩法）"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class ImageSource:
+    """提供每批上传的图片：来自目录（按批随机抽样），或生成指定大小的随机内容"""
+
+    def __init__(self, folder=None, image_kb=300):
+        self.files = []
+        if folder:
+            self.files = sorted(p for p in Path(folder).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+            if not self.files:
+                raise SystemExit(f'目录中没有图片: {folder}')
+        self.image_kb = image_kb
+
+    def batch(self, size, rng):
+        """返回 [(相对路径, 内容)]"""
+        if self.files:
+            picked = rng.sample(self.files, size) if size <= len(self.files) else rng.choices(self.files, k=size)
+            return [(f'loadtest/{path.parent.name}/{i}_{path.name}', path.read_bytes()) for i, path in enumerate(picked)]
+        # 随机内容：每张图片都不同，不会被去重；模拟引擎只读取文件内容，不解析图片格式
+        return [
+            (f'loadtest/folder{i % 5}/IMG_{i:05d}.jpg', b'\xff\xd8\xff\xe0' + rng.randbytes(self.image_kb * 1024))
+            for i in range(size)
+        ]
+
+
+def encode_multipart(images):
+    """按前端的格式编码上传表单：files + file_<i>_path"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, (relative_path, content) in enumerate(images):
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file_{i}_path"\r\n\r\n{relative_path}\r\n'.encode('utf-8')
+        )
+    for relative_path, content in images:
+        filename = relative_path.rsplit('/', 1)[-1]
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode('utf-8')
+        )
+        parts.append(content)
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.base_url = args.url.rstrip('/')
+        self.args = args
+        self.source = ImageSource(args.images, args.image_kb)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)  # {阶段: [耗时]}
+        self.errors = defaultdict(int)  # {阶段: 失败次数}
+        self.completed = 0
+        self.failed = 0
+        self.images = 0
+        self.deadline = None
+
+    def request(self, method, path, body=None, headers=None, timeout=120):
+        """发送请求，返回 (状态码, 响应头, 内容)"""
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    def timed(self, stage, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            status, headers, body = self.request(method, path, **kwargs)
+        except Exception:
+            with self.lock:
+                self.errors[stage] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[stage].append(elapsed)
+            if status >= 400:
+                self.errors[stage] += 1
+        return status, headers, body
+
+    def run_task(self, rng):
+        """完整执行一个任务，返回是否成功"""
+        images = self.source.batch(self.args.batch_size, rng)
+        body, content_type = encode_multipart(images)
+        task_start = time.perf_counter()
+
+        status, _, data = self.timed('upload', 'POST', '/api/upload', body=body, headers={'Content-Type': content_type})
+        if status != 200:
+            return False
+        task_id = json.loads(data)['task_id']
+
+        status, _, _ = self.timed('process', 'POST', f'/api/process/{task_id}')
+        if status != 200:
+            return False
+
+        # 长轮询：版本号变化才返回
+        version = 0
+        while True:
+            status, _, data = self.timed('status', 'GET', f'/api/status/{task_id}?since={version}&wait={POLL_WAIT}',
+                                         timeout=POLL_WAIT + 30)
+            if status == 304:
+                continue
+            if status != 200:
+                return False
+            task = json.loads(data)
+            version = task.get('version', version)
+            if task['status'] == 'completed':
+                break
+            if task['status'] == 'failed':
+                with self.lock:
+                    self.errors['task_failed'] += 1
+                return False
+
+        ocr_done = time.perf_counter()
+        status, _, _ = self.timed('result', 'GET', f'/api/result/{task_id}', headers={'Accept-Encoding': 'gzip, br'})
+        if status != 200:
+            return False
+        status, _, _ = self.timed('download', 'GET', f'/api/download/{task_id}')
+        if status != 200:
+            return False
+        if self.args.cleanup:
+            self.timed('cleanup', 'DELETE', f'/api/cleanup/{task_id}')
+
+        with self.lock:
+            self.latencies['task'].append(time.perf_counter() - task_start)
+            self.latencies['task_until_completed'].append(ocr_done - task_start)
+            self.images += len(images)
+        return True
+
+    def client(self, index):
+        rng = random.Random(self.args.seed * 1000 + index)
+        done = 0
+        while True:
+            if self.deadline is not None:
+                if time.monotonic() >= self.deadline:
+                    break
+            elif done >= self.args.tasks:
+                break
+            try:
+                ok = self.run_task(rng)
+            except Exception as e:
+                print(f"✗ 客户端 {index} 请求失败: {e}")
+                ok = False
+            with self.lock:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            done += 1
+
+    def run(self):
+        if self.args.duration:
+            self.deadline = time.monotonic() + self.args.duration
+        threads = []
+        start = time.perf_counter()
+        for i in range(self.args.clients):
+            thread = threading.Thread(target=self.client, args=(i,), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if self.args.ramp:
+                time.sleep(self.args.ramp / self.args.clients)
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        stages = {}
+        for stage, values in self.latencies.items():
+            stages[stage] = {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 4),
+                'p95': round(percentile(values, 95), 4),
+                'p99': round(percentile(values, 99), 4),
+                'max': round(max(values), 4),
+                'mean': round(statistics.mean(values), 4),
+            }
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'url': self.base_url,
+            'clients': self.args.clients,
+            'batch_size': self.args.batch_size,
+            'seconds': round(elapsed, 3),
+            'tasks_completed': self.completed,
+            'tasks_failed': self.failed,
+            'tasks_per_minute': round(self.completed * 60 / elapsed, 2) if elapsed else None,
+            'images_per_sec': round(self.images / elapsed, 2) if elapsed else None,
+            'stages': stages,
+            'errors': dict(self.errors),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP接口压测')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='服务地址（gunicorn或nginx）')
+    parser.add_argument('--clients', type=int, default=4, help='并发用户数')
+    parser.add_argument('--batch-size', type=int, default=20, help='每个任务上传的图片数')
+    parser.add_argument('--tasks', type=int, default=1, help='每个用户执行的任务数（未指定--duration时）')
+    parser.add_argument('--duration', type=float, help='持续压测的秒数（优先于--tasks）')
+    parser.add_argument('--ramp', type=float, default=0, help='在该秒数内逐步启动所有用户')
+    parser.add_argument('--images', help='图片目录（默认生成随机内容，需服务端使用模拟引擎）')
+    parser.add_argument('--image-kb', type=int, default=300, help='随机图片大小（KB）')
+    parser.add_argument('--no-cleanup', dest='cleanup', action='store_false', help='完成后不删除任务文件')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件')
+    args = parser.parse_args()
+
+    status, _, data = LoadTest(args).request('GET', '/api/health', timeout=10)
+    if status != 200:
+        print(f"✗ 服务不可用: {status}")
+        sys.exit(1)
+
+    test = LoadTest(args)
+    print(f"压测 {test.base_url}: {args.clients} 个用户, 每批 {args.batch_size} 张")
+    elapsed = test.run()
+    report = test.report(elapsed)
+
+    print(f"\n完成 {report['tasks_completed']} 个任务, 失败 {report['tasks_failed']} 个, 用时 {report['seconds']} 秒")
+    print(f"吞吐: {report['tasks_per_minute']} 任务/分钟, {report['images_per_sec']} 张/秒")
+    print(f"{'阶段':22s}{'次数':>8s}{'p50':>10s}{'p95':>10s}{'p99':>10s}{'最大':>10s}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:22s}{stats['count']:>8d}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['p99']:>10.3f}{stats['max']:>10.3f}")
+    if report['errors']:
+        print(f"错误: {report['errors']}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\n✓ 结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
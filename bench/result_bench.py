@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果表格基准测试 - 对比一次返回完整result.json和按页查询结果库两种方式
+
+生成N个订单的合成任务结果，分别测量：
+- 原来的方式：/api/result 返回的完整JSON大小和解析耗时（浏览器随后把每一行都渲染成DOM）
+- 分页查询：/api/result/<id>/orders 各种筛选和翻页的耗时、每页响应大小，按文件夹汇总的耗时
+- 处理中的增量结果：LiveResults 按偏移量读完全部记录的次数和耗时
+
+使用示例:
+  python bench/result_bench.py
+  python bench/result_bench.py --rows 100000
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from models import ImageRecord
+from result_store import ResultStore, LiveResults
+from serializer import dumps, loads
+
+
+def synth_orders(count, folders, seed):
+    """合成订单：(ImageRecord, 之前出现过的任务)"""
+    rng = random.Random(seed)
+    for i in range(count):
+        folder = f'部门{i % folders:02d}'
+        record = ImageRecord.create(
+            'success', f'{folder}/{i:06d}.jpg', f'4200{rng.randrange(10 ** 24):024d}',
+            rng.randrange(100, 500000) / 100, folder
+        )
+        yield record, ('task-old' if rng.random() < 0.05 else None)
+
+
+def timed(func, repeat=5):
+    """运行repeat次，返回 (最快一次的毫秒数, 结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='结果表格基准测试')
+    parser.add_argument('--rows', type=int, default=50000, help='订单数')
+    parser.add_argument('--folders', type=int, default=40, help='文件夹数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    records = list(synth_orders(args.rows, args.folders, args.seed))
+    with tempfile.TemporaryDirectory() as folder:
+        # 原来的方式：完整结果一次返回
+        full = dumps({'result': {'orders': [
+            {'index': i, 'order_number': r.order_number, 'amount': r.amount, 'filename': r.filename,
+             'folder': r.folder, 'relative_path': r.relative_path,
+             'previously_seen': {'task_id': seen, 'seen_at': '2026-01-01T00:00:00'} if seen else None}
+            for i, (r, seen) in enumerate(records, 1)
+        ]}})
+        parse_ms, _ = timed(lambda: loads(full))
+        print(f"{args.rows} 个订单")
+        print(f"完整结果: {len(full) / 1024 / 1024:.1f} MB, 解析 {parse_ms:.0f} ms, "
+              f"表格需要渲染 {args.rows} 行")
+
+        store = ResultStore(folder)
+        start = time.perf_counter()
+        store.write(
+            (i, r.order_number, r.amount_cents, r.filename, r.folder, r.relative_path, 0, seen, None)
+            for i, (r, seen) in enumerate(records, 1)
+        )
+        print(f"写入结果库: {(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"{store.path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        last_page = (args.rows + 199) // 200
+        queries = {
+            '第一页（金额从高到低）': lambda: store.query_orders(page_size=200),
+            '最后一页': lambda: store.query_orders(page=last_page, page_size=200),
+            '按文件夹筛选': lambda: store.query_orders(folder='部门03', page_size=200),
+            '金额区间+按金额排序': lambda: store.query_orders(sort='amount', min_amount=100, max_amount=200, page_size=200),
+            '订单号前缀': lambda: store.query_orders(search='42001', page_size=200),
+            '之前出现过': lambda: store.query_orders(seen=True, page_size=200),
+            '按文件夹汇总': lambda: store.folder_totals(),
+        }
+        for name, query in queries.items():
+            elapsed, result = timed(query)
+            size = len(dumps(result))
+            total = result['total'] if isinstance(result, dict) else len(result)
+            print(f"  {name}: {elapsed:.1f} ms, {total} 行, 响应 {size / 1024:.0f} KB")
+
+        # 处理中：追加写入，再按偏移量增量读完
+        live = LiveResults(folder)
+        live.start()
+        for n, (record, _) in enumerate(records, 1):
+            live.append(record)
+            if n % 10 == 0:
+                live.flush()
+        live.flush()
+        start = time.perf_counter()
+        offset, requests, count = 0, 0, 0
+        while True:
+            items, offset, _, _ = live.read(offset)
+            requests += 1
+            count += len(items)
+            if not items:
+                break
+        print(f"增量结果: {count} 行分 {requests} 次读取, 共 {(time.perf_counter() - start) * 1000:.0f} ms")
+        live.remove()
+
+
+if __name__ == '__main__':
+    main()
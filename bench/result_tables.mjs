@@ -0,0 +1,83 @@
+// 前端结果表格数据层基准测试（frontend/src/pagedList.js，不需要浏览器和依赖）
+//
+// 用模拟接口测量N行时：首屏加载、从头滚动到尾逐页加载、处理中增量追加的耗时和堆内存。
+// 表格本身使用 el-table-v2 虚拟滚动，DOM中只有可见的行（500px高、每行40px时约15行），与N无关。
+//
+// 使用示例:
+//   node bench/result_tables.mjs
+//   node bench/result_tables.mjs 100000
+
+import { PagedList, LiveList, PAGE_SIZE } from '../frontend/src/pagedList.js'
+
+const rows = Number(process.argv[2] || 50000)
+const LIVE_BATCH = 2000 // 后端 MAX_LIVE_ROWS
+
+const order = (i) => ({
+  index: i + 1,
+  order_number: `4200${String(i).padStart(24, '0')}`,
+  amount: (i % 5000) + 0.5,
+  filename: `${i}.jpg`,
+  folder: `部门${i % 40}`,
+  relative_path: `部门${i % 40}/${i}.jpg`,
+  duplicate_count: 0,
+  previously_seen: null,
+})
+
+const fetchPage = async (params, page, pageSize) => {
+  const start = (page - 1) * pageSize
+  const items = []
+  for (let i = start; i < Math.min(start + pageSize, rows); i++) items.push(order(i))
+  return { total: rows, amount: 0, page, page_size: pageSize, items }
+}
+
+const heapMB = () => {
+  if (global.gc) global.gc()
+  return process.memoryUsage().heapUsed / 1024 / 1024
+}
+
+const time = async (func) => {
+  const start = performance.now()
+  await func()
+  return performance.now() - start
+}
+
+const main = async () => {
+  console.log(`${rows} 行`)
+  const baseHeap = heapMB()
+
+  let renders = 0
+  const list = new PagedList(fetchPage, () => { renders++ })
+  const first = await time(() => list.reset({}))
+  console.log(`首屏（第一页 + ${rows} 行占位）: ${first.toFixed(1)} ms`)
+
+  // 从头滚动到尾：每次渲染范围推进一页
+  const scroll = await time(async () => {
+    for (let start = 0; start < rows; start += PAGE_SIZE) {
+      list.ensureRange(start, start + 15)
+      await new Promise(resolve => setImmediate(resolve))
+    }
+  })
+  const pages = Math.ceil(rows / PAGE_SIZE)
+  console.log(`滚动加载全部 ${pages} 页: ${scroll.toFixed(0)} ms（每页 ${(scroll / pages).toFixed(2)} ms）, ` +
+    `已加载 ${list.rows.filter(row => !row.loading).length} 行, 堆内存 +${(heapMB() - baseHeap).toFixed(1)} MB`)
+
+  // 处理中：每次轮询追加 LIVE_BATCH 行
+  let offset = 0
+  const live = new LiveList(async (from) => {
+    const items = []
+    for (let i = from; i < Math.min(from + LIVE_BATCH, rows); i++) items.push({ ...order(i), type: 'order' })
+    offset = from + items.length
+    return { status: 'processing', items, offset, more: false }
+  }, () => {})
+  let slowest = 0
+  const liveTotal = await time(async () => {
+    while (offset < rows) {
+      slowest = Math.max(slowest, await time(() => live.poll()))
+    }
+  })
+  console.log(`增量追加 ${rows} 行（每次 ${LIVE_BATCH} 行）: 共 ${liveTotal.toFixed(0)} ms, 最慢一次 ${slowest.toFixed(1)} ms, ` +
+    `合计 ${live.stats.orders} 张 ¥${live.stats.amount.toFixed(2)}`)
+  console.log(`表格更新 ${renders} 次`)
+}
+
+main()
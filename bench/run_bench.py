@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR吞吐基准测试 - 在合成截图上运行 OCRService.process 和 ocr_deduplicate.process_images
+
+每组测试在独立子进程中运行（冷缓存），统计吞吐、单张延迟p50/p95、准确率、
+深度识别比例和峰值内存，结果写入JSON文件，可用 bench/compare.py 对比不同提交。
+
+使用示例:
+  python bench/run_bench.py --sizes 100,1000
+  python bench/run_bench.py --sizes 100 --targets service --output bench/results/before.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import statistics
+from pathlib import Path
+from datetime import datetime
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+sys.path.insert(0, str(ROOT_DIR))
+
+
+def peak_rss_mb():
+    """当前进程的峰值内存（MB）"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def percentile(values, pct):
+    """百分位数（最近秩法）"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def score(manifest, recognized):
+    """按标准答案计算准确率：订单号完全一致且金额误差小于0.005才算正确"""
+    images = manifest['images']
+    correct = 0
+    for relative_path, truth in images.items():
+        got = recognized.get(relative_path)
+        if got and got[0] == truth['order_number'] and abs(got[1] - truth['amount']) < 0.005:
+            correct += 1
+    return correct / len(images) if images else None
+
+
+def source_megapixels(manifest):
+    """数据集的原图总像素数（百万）"""
+    return sum(image.get('width', 1080) * image.get('height', 2340) for image in manifest['images'].values()) / 1e6
+
+
+def run_service(data_dir, manifest):
+    """运行后端的 OCRService.process"""
+    from ocr_service import OCRService
+    from ocr_cache import OCRCache
+    from engines import get_engine
+
+    with tempfile.TemporaryDirectory() as result_folder:
+        # 使用临时缓存，保证每次都是冷启动
+        cache = OCRCache(Path(result_folder) / 'ocr_cache.sqlite3', get_engine().name)
+        service = OCRService(data_dir, result_folder, cache=cache)
+        start = time.perf_counter()
+        summary = service.process()
+        elapsed = time.perf_counter() - start
+        result = service.load_result()
+
+        latencies = [event[4] / 1e6 for event in service.tracer.events if event[0] == 'image']
+        deep_images = sum(1 for event in service.tracer.events
+                          if event[0] == 'deep_ocr' and event[5] and event[5].get('psm') == '6')
+        recognized = {order['relative_path']: (order['order_number'], order['amount']) for order in result['orders']}
+        # OCR相关耗时（含缩放）按原图像素数归一化，用于对比缩放前后每百万像素的耗时
+        ocr_seconds = sum(event[4] for event in service.tracer.events
+                          if event[0] in ('tesseract', 'deep_ocr', 'downscale')) / 1e6
+        extra = {
+            'ocr_seconds_per_mp': round(ocr_seconds / source_megapixels(manifest), 4),
+            'downscale': summary.get('downscale'),
+            'timings': summary.get('timings'),
+        }
+        return elapsed, latencies, deep_images, recognized, extra
+
+
+def run_cli(data_dir, manifest):
+    """运行命令行工具的 ocr_deduplicate.process_images（顺序处理）"""
+    import ocr_deduplicate
+    from ocr_cache import OCRCache
+    from recognizer import get_recognizer
+
+    per_file = {}
+    deep_files = set()
+    recognizer = get_recognizer()
+    original_recognize = recognizer.recognize_file
+
+    def timed_recognize(image_path, texts=None):
+        texts = [] if texts is None else texts
+        start = time.perf_counter()
+        try:
+            return original_recognize(image_path, texts)
+        finally:
+            per_file[str(image_path)] = time.perf_counter() - start
+            # 第二段文本是深度识别的结果
+            if len(texts) > 1:
+                deep_files.add(str(image_path))
+
+    recognizer.recognize_file = timed_recognize
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # 使用临时缓存，保证每次都是冷启动
+            cache = OCRCache(Path(cache_dir) / 'ocr_cache.sqlite3', recognizer.engine.name)
+            image_files = ocr_deduplicate.find_all_images(data_dir)
+            start = time.perf_counter()
+            results, failed_files, _ = ocr_deduplicate.process_images(image_files, cache=cache, incremental=False)
+            elapsed = time.perf_counter() - start
+    finally:
+        recognizer.recognize_file = original_recognize
+
+    base = Path(data_dir)
+    recognized = {
+        str(r['file'].relative_to(base)).replace(os.sep, '/'): (r['order_number'], r['amount'])
+        for r in results
+    }
+    return elapsed, list(per_file.values()), len(deep_files), recognized, {}
+
+
+def run_service_noscale(data_dir, manifest):
+    """关闭大图缩放运行 OCRService.process（对比缩放节省的耗时）"""
+    os.environ['OCR_DOWNSCALE'] = '0'
+    return run_service(data_dir, manifest)
+
+
+TARGETS = {
+    'service': run_service,
+    'service-noscale': run_service_noscale,
+    'cli': run_cli,
+}
+
+
+def run_child(target, data_dir):
+    """子进程：运行一组测试，结果以JSON输出到stdout最后一行"""
+    manifest = json.loads((Path(data_dir) / 'manifest.json').read_text(encoding='utf-8'))
+    total = len(manifest['images'])
+
+    # OCR过程中的日志输出到stderr，stdout只保留结果
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        elapsed, latencies, deep_images, recognized, extra = TARGETS[target](data_dir, manifest)
+    finally:
+        sys.stdout = real_stdout
+
+    report = {
+        'target': target,
+        'images': total,
+        'seconds': round(elapsed, 3),
+        'images_per_sec': round(total / elapsed, 3) if elapsed else None,
+        'latency_p50': round(percentile(latencies, 50) or 0, 4),
+        'latency_p95': round(percentile(latencies, 95) or 0, 4),
+        'latency_mean': round(statistics.mean(latencies), 4) if latencies else None,
+        'accuracy': round(score(manifest, recognized), 4),
+        'deep_fallback_rate': round(deep_images / total, 4) if total else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    report.update(extra)
+    print(json.dumps(report, ensure_ascii=False))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def tesseract_version():
+    try:
+        output = subprocess.run(['tesseract', '--version'], capture_output=True, text=True)
+        return (output.stdout or output.stderr).splitlines()[0]
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR吞吐基准测试')
+    parser.add_argument('--sizes', default='100,1000,10000', help='图片数量，逗号分隔')
+    parser.add_argument('--targets', default='service,service-noscale,cli', help='测试对象：service,service-noscale,cli')
+    parser.add_argument('--data', default=str(BENCH_DIR / 'data'), help='合成图片缓存目录')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件（默认 bench/results/bench_<commit>.json）')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.data)
+        return
+
+    from synth import generate
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'tesseract': tesseract_version(),
+        'runs': [],
+    }
+
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        data_dir = Path(args.data) / f'{size}_seed{args.seed}'
+        print(f"准备合成图片: {size} 张 -> {data_dir}")
+        generate(data_dir, size, seed=args.seed)
+
+        for target in [t for t in args.targets.split(',') if t]:
+            print(f"运行 {target} @ {size} ...")
+            child = subprocess.run(
+                [sys.executable, __file__, '--child', target, '--data', str(data_dir)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            lines = child.stdout.strip().splitlines()
+            if child.returncode != 0 or not lines:
+                print(f"  ✗ 运行失败 (退出码 {child.returncode})")
+                continue
+            run = json.loads(lines[-1])
+            run['size'] = size
+            report['runs'].append(run)
+            print(f"  {run['images_per_sec']} 张/秒, p50 {run['latency_p50']}s, p95 {run['latency_p95']}s, "
+                  f"准确率 {run['accuracy']:.1%}, 深度识别 {run['deep_fallback_rate']:.1%}, "
+                  f"峰值内存 {run['peak_rss_mb']} MB")
+
+    # 缩放节省的耗时：同一数据集上关闭/开启缩放的每百万像素OCR耗时之差
+    runs = {(run['target'], run['size']): run for run in report['runs']}
+    for (target, size), run in runs.items():
+        baseline = runs.get(('service-noscale', size))
+        if target == 'service' and baseline and 'ocr_seconds_per_mp' in run:
+            run['downscale_saving_per_mp'] = round(baseline['ocr_seconds_per_mp'] - run['ocr_seconds_per_mp'], 4)
+            print(f"缩放节省 @ {size}: 每百万像素 {run['downscale_saving_per_mp']} 秒 "
+                  f"({baseline['ocr_seconds_per_mp']} -> {run['ocr_seconds_per_mp']})")
+
+    output = Path(args.output) if args.output else BENCH_DIR / 'results' / f'bench_{commit or "unknown"}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n✓ 结果已保存: {output}")
+
+
+if __name__ == '__main__':
+    main()
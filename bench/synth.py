@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成微信支付截图 - 离线生成带已知订单号和金额的测试图片
+
+变体：浅色/深色模式、订单号折行、JPEG压缩噪点、高分辨率（1440宽）。生成结果写入manifest.json作为标准答案。
+
+使用示例:
+  python bench/synth.py --count 100 --output bench/data/100
+"""
+
+import json
+import random
+import argparse
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
+
+# 常见系统中文字体（找不到时使用Pillow默认字体，中文标签会显示为方框）
+FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    '/System/Library/Fonts/STHeiti Medium.ttc',
+    'C:/Windows/Fonts/msyh.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+]
+
+WIDTH = 1080
+HEIGHT = 2340
+
+THEMES = {
+    'light': {'bg': (247, 247, 247), 'card': (255, 255, 255), 'text': (25, 25, 25), 'label': (128, 128, 128)},
+    'dark': {'bg': (17, 17, 17), 'card': (30, 30, 30), 'text': (230, 230, 230), 'label': (140, 140, 140)},
+}
+
+# 部分图片放大到高分辨率手机的尺寸（1440宽）
+LARGE_WIDTH = 1440
+# 数据集格式版本，生成逻辑变化时加一，旧数据集会重新生成
+MANIFEST_VERSION = 2
+
+MERCHANTS = ['超市便利店', '餐饮美食', '交通出行', '生活缴费', '服装鞋包', '医疗健康']
+
+
+def load_font(size, font_path=None):
+    """加载字体"""
+    for path in ([font_path] if font_path else []) + FONT_CANDIDATES:
+        if path and Path(path).exists():
+            return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def random_order_number(rng):
+    """生成微信支付风格的交易单号（28位，4200开头）"""
+    return '4200' + ''.join(rng.choice('0123456789') for _ in range(24))
+
+
+def random_amount(rng):
+    """生成金额（元，保留两位小数）"""
+    return round(rng.choice([rng.uniform(1, 100), rng.uniform(100, 2000), rng.uniform(2000, 20000)]), 2)
+
+
+def render(order_number, amount, theme, wrap, fonts, rng):
+    """绘制一张账单详情截图"""
+    colors = THEMES[theme]
+    image = Image.new('RGB', (WIDTH, HEIGHT), colors['bg'])
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([40, 260, WIDTH - 40, 1700], fill=colors['card'])
+
+    draw.text((WIDTH // 2, 360), rng.choice(MERCHANTS), font=fonts['title'], fill=colors['text'], anchor='mm')
+    draw.text((WIDTH // 2, 520), f'-{amount:.2f}', font=fonts['amount'], fill=colors['text'], anchor='mm')
+    draw.text((WIDTH // 2, 640), '支付成功', font=fonts['body'], fill=colors['label'], anchor='mm')
+
+    y = 820
+    rows = [
+        ('支付时间', f'2025年{rng.randint(1, 12)}月{rng.randint(1, 28)}日 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}'),
+        ('支付方式', '零钱'),
+    ]
+    for label, value in rows:
+        draw.text((90, y), label, font=fonts['body'], fill=colors['label'])
+        draw.text((300, y), value, font=fonts['body'], fill=colors['text'])
+        y += 110
+
+    draw.text((90, y), '交易单号', font=fonts['body'], fill=colors['label'])
+    if wrap:
+        # 订单号折成两行
+        split = rng.randint(14, 20)
+        draw.text((300, y), order_number[:split], font=fonts['number'], fill=colors['text'])
+        draw.text((300, y + 60), order_number[split:], font=fonts['number'], fill=colors['text'])
+    else:
+        draw.text((300, y), order_number, font=fonts['number'], fill=colors['text'])
+    return image
+
+
+def add_noise(image, rng):
+    """轻微模糊 + 随机噪点，模拟截图转发后的压缩损失"""
+    image = image.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0.3, 1.0)))
+    pixels = image.load()
+    for _ in range(WIDTH * HEIGHT // 400):
+        x, y = rng.randrange(WIDTH), rng.randrange(HEIGHT)
+        value = rng.randint(0, 255)
+        pixels[x, y] = (value, value, value)
+    return image
+
+
+def generate(output, count, seed=0, font_path=None, folders=5):
+    """生成count张截图到output目录，按子文件夹分组，返回manifest"""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_file = output / 'manifest.json'
+    if manifest_file.exists():
+        manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+        if (manifest.get('count') == count and manifest.get('seed') == seed
+                and manifest.get('version') == MANIFEST_VERSION):
+            return manifest
+
+    rng = random.Random(seed)
+    fonts = {
+        'title': load_font(48, font_path),
+        'amount': load_font(110, font_path),
+        'body': load_font(44, font_path),
+        'number': load_font(38, font_path),
+    }
+    images = {}
+    for i in range(count):
+        theme = rng.choice(['light', 'dark'])
+        wrap = rng.random() < 0.2
+        noisy = rng.random() < 0.3
+        large = rng.random() < 0.3
+        order_number = random_order_number(rng)
+        amount = random_amount(rng)
+
+        image = render(order_number, amount, theme, wrap, fonts, rng)
+        quality = 90
+        if noisy:
+            image = add_noise(image, rng)
+            quality = rng.randint(35, 60)
+        if large:
+            image = image.resize((LARGE_WIDTH, HEIGHT * LARGE_WIDTH // WIDTH), Image.LANCZOS)
+
+        relative_path = f'folder{i % folders}/IMG_{i:06d}.jpg'
+        path = output / relative_path
+        path.parent.mkdir(exist_ok=True)
+        image.save(path, 'JPEG', quality=quality)
+        images[relative_path] = {
+            'order_number': order_number,
+            'amount': amount,
+            'theme': theme,
+            'wrap': wrap,
+            'noisy': noisy,
+            'width': image.width,
+            'height': image.height,
+        }
+
+    manifest = {'version': MANIFEST_VERSION, 'count': count, 'seed': seed, 'images': images}
+    manifest_file.write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成微信支付截图')
+    parser.add_argument('--count', type=int, default=100, help='图片数量')
+    parser.add_argument('--output', default='bench/data/100', help='输出目录')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子（相同种子生成相同图片）')
+    parser.add_argument('--font', help='中文字体路径')
+    args = parser.parse_args()
+
+    manifest = generate(args.output, args.count, seed=args.seed, font_path=args.font)
+    print(f"✓ 已生成 {len(manifest['images'])} 张图片: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
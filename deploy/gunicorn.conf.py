@@ -1,7 +1,18 @@
 # Gunicorn 配置文件
+import os
+import shutil
+
+# Prometheus多进程模式：各worker把指标写入该目录，/api/metrics 汇总
+# 必须在加载应用（preload_app）之前设置，启动时清空上次运行残留的数据
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/opt/hhg-tools/backend/prometheus_multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 bind = "127.0.0.1:5001"
 workers = 4
-worker_class = "sync"
+# 使用线程worker：/api/status 长轮询等待期间不会占满整个worker
+worker_class = "gthread"
+threads = 8
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -13,3 +24,21 @@ pidfile = "/opt/hhg-tools/backend/gunicorn.pid"
 accesslog = "/opt/hhg-tools/backend/logs/access.log"
 errorlog = "/opt/hhg-tools/backend/logs/error.log"
 loglevel = "info"
+
+
+def when_ready(server):
+    """应用已在主进程加载（preload_app），fork worker之前预热共享的只读数据"""
+    from warmup import preload
+    preload()
+
+
+def post_fork(server, worker):
+    """每个worker启动后初始化本进程的OCR引擎和后台线程"""
+    from warmup import post_fork as warm_worker
+    warm_worker()
+
+
+def child_exit(server, worker):
+    """worker退出时清理其存活类指标"""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,135 @@
+// 结果表格的数据源（配合 el-table-v2 虚拟滚动，浏览器中只渲染可见的几十行）
+//
+// - PagedList：已完成任务的分页接口。rows 的长度等于总行数，未加载的行是占位对象，
+//   表格渲染到哪一段就请求哪一页，滚动到的页才会下载
+// - LiveList：处理中的任务按偏移量增量读取已识别的图片，追加到列表末尾；
+//   任务重新处理（后端返回reset）时清空已读到的行重新累计
+
+export const PAGE_SIZE = 200
+
+const placeholders = (total, existing) =>
+  Array.from({ length: total }, (_, i) => existing[i] || { id: i, loading: true })
+
+export class PagedList {
+  // fetchPage(params, page, pageSize) => Promise<{ total, items, ...汇总字段 }>
+  // onChange(rows, meta)：rows 每次更新都是新数组，表格据此重新渲染
+  constructor(fetchPage, onChange) {
+    this.fetchPage = fetchPage
+    this.onChange = onChange
+    this.params = {}
+    this.clear()
+  }
+
+  clear() {
+    this.generation = (this.generation || 0) + 1
+    this.rows = []
+    this.meta = { total: 0 }
+    this.pages = new Set()
+    this.onChange(this.rows, this.meta)
+  }
+
+  // 更换筛选条件或排序后从第一页重新加载
+  reset(params = this.params) {
+    this.clear()
+    this.params = params
+    return this.loadPage(1)
+  }
+
+  // 表格渲染的行范围（el-table-v2 的 rows-rendered 事件），加载其中还没有请求过的页
+  ensureRange(start, end) {
+    const first = Math.floor(start / PAGE_SIZE) + 1
+    const last = Math.floor(Math.max(start, end) / PAGE_SIZE) + 1
+    for (let page = first; page <= last; page++) {
+      if (!this.pages.has(page)) {
+        this.loadPage(page).catch(error => console.error('加载结果失败:', error))
+      }
+    }
+  }
+
+  async loadPage(page) {
+    const generation = this.generation
+    this.pages.add(page)
+    let data
+    try {
+      data = await this.fetchPage(this.params, page, PAGE_SIZE)
+    } catch (error) {
+      if (generation === this.generation) this.pages.delete(page)
+      throw error
+    }
+    // 请求期间筛选条件已改变，丢弃旧结果
+    if (generation !== this.generation) return
+
+    const { items, total, page: _page, page_size: _pageSize, ...meta } = data
+    const rows = this.rows.length === total ? this.rows.slice() : placeholders(total, this.rows)
+    const start = (page - 1) * PAGE_SIZE
+    items.forEach((item, i) => {
+      rows[start + i] = { id: start + i, ...item }
+    })
+    this.rows = rows
+    this.meta = { total, ...meta }
+    this.onChange(this.rows, this.meta)
+  }
+}
+
+export class LiveList {
+  // fetchLive(offset, generation) => Promise<{ status, items, offset, generation, more, reset }>
+  // onChange(rows, stats)：stats 为已识别订单数、金额合计和失败数（增量累计，不重新遍历）
+  constructor(fetchLive, onChange) {
+    this.fetchLive = fetchLive
+    this.onChange = onChange
+    this.clear()
+  }
+
+  clear() {
+    this.generation = (this.generation || 0) + 1
+    this.offset = 0
+    this.logGeneration = null
+    this.polling = null
+    this.clearRows()
+  }
+
+  clearRows() {
+    this.rows = []
+    this.stats = { orders: 0, amount: 0, failed: 0 }
+    this.amountCents = 0
+    this.onChange(this.rows, this.stats)
+  }
+
+  // 读取上次之后新识别的图片（一次最多返回若干行，more 为 true 时继续读取）；并发调用时共用同一次读取
+  poll() {
+    if (!this.polling) {
+      this.polling = this._poll().finally(() => {
+        this.polling = null
+      })
+    }
+    return this.polling
+  }
+
+  async _poll() {
+    const generation = this.generation
+    let data
+    do {
+      data = await this.fetchLive(this.offset, this.logGeneration)
+      if (generation !== this.generation) return null
+      // 后端日志已重写（任务重新处理），之前的行作废
+      if (data.reset) this.clearRows()
+      this.logGeneration = data.generation
+      this.offset = data.offset
+      if (data.items.length === 0) break
+      const start = this.rows.length
+      const added = data.items.map((item, i) => ({ id: start + i, ...item }))
+      for (const item of added) {
+        if (item.type === 'order') {
+          this.stats.orders++
+          this.amountCents += Math.round(item.amount * 100)
+        } else {
+          this.stats.failed++
+        }
+      }
+      this.stats = { ...this.stats, amount: this.amountCents / 100 }
+      this.rows = this.rows.concat(added)
+      this.onChange(this.rows, this.stats)
+    } while (data.more)
+    return data.status
+  }
+}
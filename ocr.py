@@ -3,123 +3,119 @@
 """
 微信支付截图OCR识别工具 - 批量文件夹处理
 自动识别多个文件夹中的微信支付截图金额并求和
+
+识别流程、金额提取（金额上限与后端一致）和OCR缓存与ocr_deduplicate.py、后端共用，
+见 backend/recognizer.py、extract.py、ocr_cache.py。
+OCR用到的模块在首次使用时才导入，全部命中缓存时不会启动tesseract。
+
+对账清单（JSON，文件夹 -> 预期金额，文件夹路径相对清单所在目录）示例：
+  {"对应2980微信支付记录": 2980, "对应4700微信支付记录": 4700}
+所有文件夹的图片在同一个线程池中并发识别；总额不一致时列出金额合计正好等于差额的图片，
+见 backend/reconcile.py。
 """
 
-import re
-import subprocess
+import os
+import sys
+import json
+import argparse
 from pathlib import Path
 
-def ocr_image(image_path):
-    """使用tesseract识别图片文字"""
-    try:
-        result = subprocess.run(
-            ['tesseract', image_path, 'stdout', '-l', 'chi_sim+eng'],
-            capture_output=True,
-            text=True,
-            timeout=15
-        )
-        return result.stdout
-    except:
-        # 如果中文失败，尝试仅英文
-        try:
-            result = subprocess.run(
-                ['tesseract', image_path, 'stdout'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            return result.stdout
-        except Exception as e:
-            return ""
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
 
-def ocr_image_deep(image_path):
-    """深度OCR - 使用多种PSM模式"""
-    texts = []
-    
-    # 尝试不同的PSM模式
-    for psm in ['6', '11', '12']:
-        try:
-            result = subprocess.run(
-                ['tesseract', image_path, 'stdout', '--psm', psm],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            texts.append(result.stdout)
-        except:
-            pass
-    
-    return "\n".join(texts)
+# 未指定对账清单时使用的文件夹及其预期金额（脚本所在目录下）
+DEFAULT_FOLDERS = {
+    "对应2980微信支付记录": 2980.0,
+    "对应4700微信支付记录": 4700.0,
+    "对应6405微信支付记录": 6405.0,
+}
 
-def extract_amount(text):
-    """从OCR文本中提取金额"""
-    # 匹配微信支付金额格式
-    patterns = [
-        r'-(\d+\.\d{2})',  # 负数格式 -123.45
-        r'¥(\d+\.\d{2})',  # 带人民币符号
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        if matches:
-            return float(matches[0])
-    
-    # 如果前面的模式都没匹配到，尝试匹配所有带小数点的数字
-    all_numbers = re.findall(r'\b(\d+\.\d{2})\b', text)
-    if all_numbers:
-        valid_amounts = [float(num) for num in all_numbers if float(num) < 10000]
-        if valid_amounts:
-            return max(valid_amounts)
-    
-    return None
+def load_manifest(manifest_file):
+    """读取对账清单，返回 [(文件夹路径, 预期金额)]"""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError('对账清单应为 {"文件夹": 预期金额} 格式')
+    base_dir = Path(manifest_file).resolve().parent
+    folders = []
+    for folder, expected in manifest.items():
+        if isinstance(expected, bool) or not isinstance(expected, (int, float)):
+            raise ValueError(f'预期金额应为数字: {folder}')
+        folders.append((base_dir / folder, float(expected)))
+    return folders
 
-def process_folder(folder_path, expected_amount):
-    """处理单个文件夹中的所有图片"""
-    # 获取所有jpg图片
-    image_files = sorted(folder_path.glob("*.jpg"))
-    
-    if not image_files:
-        print(f"  未找到任何jpg图片文件")
-        return None, []
-    
-    print(f"  找到 {len(image_files)} 张图片，开始识别...\n")
-    
-    amounts = []
-    failed_files = []
-    
-    # 第一轮：常规识别
-    for image_file in image_files:
-        print(f"  处理: {image_file.name}")
-        
-        ocr_text = ocr_image(str(image_file))
-        amount = extract_amount(ocr_text)
-        
-        if amount is not None:
-            amounts.append((image_file.name, amount))
-            print(f"    ✓ 识别到金额: ¥{amount:.2f}")
-        else:
-            failed_files.append(image_file)
-            print(f"    ✗ 未能识别金额（将使用深度识别）")
-    
-    # 第二轮：深度识别失败的图片
-    if failed_files:
-        print(f"\n  {'='*76}")
-        print(f"  深度识别 {len(failed_files)} 张失败的图片...")
-        print(f"  {'='*76}\n")
-        
-        for image_file in failed_files:
-            print(f"  深度处理: {image_file.name}")
-            
-            deep_text = ocr_image_deep(str(image_file))
-            amount = extract_amount(deep_text)
-            
-            if amount is not None:
-                amounts.append((image_file.name, amount))
-                print(f"    ✓ 识别到金额: ¥{amount:.2f}")
-            else:
-                print(f"    ✗ 仍然无法识别")
-    
-    return amounts, image_files
+def process_folders(folder_paths, workers):
+    """识别所有文件夹中的图片，返回 {文件夹路径: ([(文件名, 金额)], 图片列表)}
+    
+    先按图片内容批量查询共用缓存（包括只识别出金额的结果），未缓存的图片提交到共用的线程池并发识别。
+    单张图片识别出错时记为无法识别，不影响其他图片。
+    """
+    import concurrent.futures
+    from ocr_cache import get_cache
+    cache = get_cache()
+    images = {folder_path: sorted(folder_path.glob("*.jpg")) for folder_path in folder_paths}
+    all_files = [image_file for image_files in images.values() for image_file in image_files]
+    
+    digests = {image_file: cache.digest_for(image_file) for image_file in all_files}
+    cached = cache.get_many(set(digests.values()), amount_only=True)
+    amounts = {image_file: cached[digest].amount for image_file, digest in digests.items() if digest in cached}
+    pending = [image_file for image_file in all_files if image_file not in amounts]
+    print(f"共 {len(all_files)} 张图片，缓存命中 {len(amounts)} 张，需要识别 {len(pending)} 张（{workers} 个线程）\n")
+    
+    if pending:
+        # 常规识别失败时识别器自动进行深度识别
+        from recognizer import get_recognizer
+        recognizer = get_recognizer()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(recognizer.recognize_file, image_file): image_file for image_file in pending}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                image_file = futures[future]
+                name = f"{image_file.parent.name}/{image_file.name}"
+                try:
+                    order_number, amount = future.result()
+                except Exception as e:
+                    print(f"  [{done}/{len(pending)}] ✗ {name}: 识别出错 - {e}")
+                    continue
+                if amount is not None:
+                    amounts[image_file] = amount
+                    cache.put(digests[image_file], order_number, amount)
+                    print(f"  [{done}/{len(pending)}] ✓ {name}: ¥{amount:.2f}")
+                else:
+                    print(f"  [{done}/{len(pending)}] ✗ {name}: 无法识别")
+    
+    return {
+        folder_path: ([(image_file.name, amounts[image_file]) for image_file in image_files if image_file in amounts], image_files)
+        for folder_path, image_files in images.items()
+    }
+
+def print_suggestions(folder_path, total, expected_amount, recognized):
+    """总额不一致时，列出金额合计正好等于差额的图片
+    
+    多出的金额在本文件夹中查找（重复或放错的截图）；
+    缺少的金额在其他文件夹中查找（可能放错了文件夹），找不到时可能是有图片未识别或缺失。
+    """
+    from reconcile import find_subsets, to_cents
+    difference = to_cents(total) - to_cents(expected_amount)
+    if difference == 0:
+        return
+    if difference > 0:
+        candidates = [(f"{name} (¥{amount:.2f})", to_cents(amount)) for name, amount in recognized[folder_path][0]]
+        subsets = find_subsets(candidates, difference)
+        title = f"多出 ¥{difference / 100:.2f}，以下图片金额合计正好等于差额（可能重复或放错文件夹）"
+    else:
+        candidates = [
+            (f"{other.name}/{name} (¥{amount:.2f})", to_cents(amount))
+            for other, (amounts, _) in recognized.items() if other != folder_path
+            for name, amount in amounts
+        ]
+        subsets = find_subsets(candidates, -difference)
+        title = f"缺少 ¥{-difference / 100:.2f}，其他文件夹中以下图片金额合计正好等于差额（可能放错文件夹）"
+    
+    if not subsets:
+        print(f"\n  未找到金额合计等于差额 ¥{abs(difference) / 100:.2f} 的图片组合")
+        return
+    print(f"\n  {title}:")
+    for i, subset in enumerate(subsets, 1):
+        print(f"    方案{i}: " + "、".join(subset))
 
 def print_folder_summary(folder_name, amounts, image_files, expected_amount):
     """打印单个文件夹的识别结果摘要"""
@@ -175,39 +171,63 @@ def print_folder_summary(folder_name, amounts, image_files, expected_amount):
     return 0
 
 def main():
-    # 获取当前目录
-    current_dir = Path(__file__).parent
-    
-    # 定义要处理的文件夹及其预期金额
-    folders = [
-        ("对应2980微信支付记录", 2980.0),
-        ("对应4700微信支付记录", 4700.0),
-        ("对应6405微信支付记录", 6405.0),
-    ]
+    parser = argparse.ArgumentParser(description='微信支付截图OCR识别工具 - 批量文件夹对账')
+    parser.add_argument(
+        '--manifest',
+        type=Path,
+        help='对账清单（JSON，文件夹 -> 预期金额）；默认处理脚本所在目录下的固定文件夹'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 4,
+        help='OCR线程数（所有文件夹共用，默认CPU核数）'
+    )
+    args = parser.parse_args()
+    
+    if args.manifest:
+        try:
+            folders = load_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            print(f"✗ 读取对账清单失败: {e}")
+            return
+    else:
+        current_dir = Path(__file__).parent
+        folders = [(current_dir / folder_name, expected) for folder_name, expected in DEFAULT_FOLDERS.items()]
     
     print("="*80)
     print(f"微信支付截图OCR识别工具 - 批量文件夹处理")
     print("="*80)
+    print()
+    
+    existing = []
+    for folder_path, expected_amount in folders:
+        if folder_path.exists():
+            existing.append((folder_path, expected_amount))
+        else:
+            print(f"  ✗ 文件夹不存在: {folder_path}")
+    
+    # 所有文件夹一起识别，再按清单顺序输出
+    recognized = process_folders([folder_path for folder_path, _ in existing], max(1, args.workers))
     
     all_results = []
     
-    for folder_name, expected_amount in folders:
-        folder_path = current_dir / folder_name
+    for folder_path, expected_amount in existing:
+        folder_name = folder_path.name
+        amounts, image_files = recognized[folder_path]
         
         print(f"\n{'='*80}")
         print(f"处理文件夹: {folder_name}")
         print(f"预期金额: ¥{expected_amount:.2f}")
-        print(f"{'='*80}\n")
+        print(f"{'='*80}")
         
-        if not folder_path.exists():
-            print(f"  ✗ 文件夹不存在: {folder_path}")
+        if not image_files:
+            print(f"  未找到任何jpg图片文件")
             continue
         
-        amounts, image_files = process_folder(folder_path, expected_amount)
-        
-        if amounts is not None:
-            total = print_folder_summary(folder_name, amounts, image_files, expected_amount)
-            all_results.append((folder_name, total, expected_amount))
+        total = print_folder_summary(folder_name, amounts, image_files, expected_amount)
+        print_suggestions(folder_path, total, expected_amount, recognized)
+        all_results.append((folder_name, total, expected_amount))
     
     # 打印总体汇总
     if all_results:
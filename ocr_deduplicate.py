@@ -4,170 +4,32 @@
 微信支付截图OCR识别和去重工具
 使用tesseract识别订单编号并根据订单编号去重
 支持增量OCR，避免重复识别
+
+识别流程、订单号和金额提取、OCR缓存与后端共用（backend/recognizer.py、extract.py、ocr_cache.py）：
+缓存按图片内容索引，命令行识别过的图片上传到后端时直接使用结果，反之亦然。
+
+启动时只导入解析参数和读取缓存需要的模块，OCR、正则提取、复制文件等用到的模块在首次使用时才导入，
+全部命中缓存的运行（或 --report 仅报告模式）不会启动tesseract。
+可用 python -X importtime ocr_deduplicate.py --report 查看导入耗时。
+
+--watch 监视模式：首次处理完成后持续监视文件夹（inotify，不可用时轮询，见backend/watcher.py），
+只识别新增或修改的图片，增量更新去重结果和每个文件夹的合计，不再重新扫描整个目录。
 """
 
-import re
-import subprocess
-import shutil
+import sys
 import argparse
 from pathlib import Path
 from collections import defaultdict
-from datetime import datetime
 
-def ocr_image(image_path):
-    """使用tesseract识别图片文字"""
-    try:
-        result = subprocess.run(
-            ['tesseract', str(image_path), 'stdout', '-l', 'chi_sim+eng'],
-            capture_output=True,
-            text=True,
-            timeout=15
-        )
-        return result.stdout
-    except:
-        # 如果中文失败，尝试仅英文
-        try:
-            result = subprocess.run(
-                ['tesseract', str(image_path), 'stdout'],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            return result.stdout
-        except Exception as e:
-            return ""
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
 
-def ocr_image_deep(image_path):
-    """深度OCR - 使用多种PSM模式"""
-    texts = []
-    
-    # 尝试不同的PSM模式
-    for psm in ['6', '11', '12']:
-        try:
-            result = subprocess.run(
-                ['tesseract', str(image_path), 'stdout', '--psm', psm],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            texts.append(result.stdout)
-        except:
-            pass
-    
-    return "\n".join(texts)
-
-def extract_order_number(text):
-    """从OCR文本中提取订单编号 - 支持跨行识别"""
-    # 先尝试常规匹配（单行完整订单号）
-    patterns = [
-        r'订单号[:：\s]*([0-9A-Za-z]{18,32})',  # 订单号：xxxxxxxx
-        r'单号[:：\s]*([0-9A-Za-z]{18,32})',     # 单号：xxxxxxxx
-        r'订单编号[:：\s]*([0-9A-Za-z]{18,32})', # 订单编号：xxxxxxxx
-        r'商户订单号[:：\s]*([0-9A-Za-z]{18,32})', # 商户订单号
-        r'交易单号[:：\s]*([0-9A-Za-z]{18,32})', # 交易单号
-        r'\b([0-9]{20,32})\b',                   # 20-32位纯数字
-        r'\b([0-9A-Za-z]{24,32})\b',             # 24-32位字母数字
-    ]
-    
-    # 首先尝试常规单行匹配
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            order_num = matches[0].strip()
-            # 过滤掉一些常见的误识别（如日期、时间等）
-            if len(order_num) >= 18 and not order_num.startswith('2025') and not order_num.startswith('2024'):
-                return order_num
-    
-    # 如果单行匹配失败，尝试跨行拼接
-    # 处理换行情况：订单号可能被分成两行
-    lines = text.split('\n')
-    
-    for i, line in enumerate(lines):
-        # 查找包含"订单号"等关键词的行
-        if re.search(r'订单号|单号|订单编号|商户订单号|交易单号', line, re.IGNORECASE):
-            # 提取当前行的数字字母部分
-            current_line_numbers = re.findall(r'[:：\s]*([0-9A-Za-z]+)', line)
-            
-            # 如果当前行有数字，且长度不够（可能被截断）
-            for num in current_line_numbers:
-                if len(num) >= 10 and len(num) < 32:
-                    # 检查下一行是否有继续的数字
-                    if i + 1 < len(lines):
-                        next_line = lines[i + 1].strip()
-                        # 提取下一行开头的数字字母
-                        next_numbers = re.findall(r'^([0-9A-Za-z]+)', next_line)
-                        
-                        if next_numbers:
-                            # 拼接两行的订单号
-                            combined = num + next_numbers[0]
-                            # 验证拼接后的长度是否合理
-                            if 18 <= len(combined) <= 32:
-                                # 过滤日期
-                                if not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
-                                    return combined
-    
-    # 还有一种情况：订单号没有关键词，直接从行首开始
-    # 查找可能跨行的长数字串
-    for i in range(len(lines) - 1):
-        line = lines[i].strip()
-        next_line = lines[i + 1].strip()
-        
-        # 先尝试去除行内空格，合并数字段（处理OCR把订单号识别成多个数字的情况）
-        # 例如: "4200002791 2025092179555" -> "42000027912025092179555"
-        line_no_space = ''.join(re.findall(r'[0-9A-Za-z]+', line))
-        
-        # 当前行末尾的数字字母（使用去空格后的行）
-        end_match = re.search(r'([0-9A-Za-z]{10,})$', line_no_space)
-        if end_match:
-            end_part = end_match.group(1)
-            
-            # 下一行开头的数字字母
-            start_match = re.search(r'^([0-9A-Za-z]{4,})', next_line)
-            if start_match:
-                start_part = start_match.group(1)
-                
-                # 拼接
-                combined = end_part + start_part
-                
-                # 验证拼接后是否是有效订单号
-                if 18 <= len(combined) <= 32:
-                    # 验证数字占比（订单号通常数字占比高）
-                    digit_ratio = sum(c.isdigit() for c in combined) / len(combined)
-                    if digit_ratio >= 0.7:  # 至少70%是数字（更严格，避免误识别）
-                        # 检查是否以常见的微信订单号开头（4200, 1000等）
-                        if combined.startswith('4200') or combined.startswith('1000') or combined.startswith('372'):
-                            return combined
-                        # 或者不是日期格式
-                        elif not (combined.startswith('2025') or combined.startswith('2024') or combined.startswith('2023')):
-                            return combined
-    
-    return None
-
-def extract_amount(text):
-    """从OCR文本中提取金额"""
-    # 匹配微信支付金额格式
-    patterns = [
-        r'-(\d+\.\d{2})',  # 负数格式 -123.45
-        r'¥(\d+\.\d{2})',  # 带人民币符号
-        r'￥(\d+\.\d{2})',  # 全角人民币符号
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        if matches:
-            return float(matches[0])
-    
-    # 如果前面的模式都没匹配到，尝试匹配所有带小数点的数字
-    all_numbers = re.findall(r'\b(\d+\.\d{2})\b', text)
-    if all_numbers:
-        valid_amounts = [float(num) for num in all_numbers if 0.01 <= float(num) < 100000]
-        if valid_amounts:
-            return max(valid_amounts)
-    
-    return None
+def open_cache():
+    """打开与后端共用的OCR缓存"""
+    from ocr_cache import get_cache
+    return get_cache()
 
 def load_cache(cache_file, base_dir):
-    """加载已识别的缓存结果（txt格式）"""
+    """加载旧版的缓存结果（txt格式）"""
     if not cache_file.exists():
         return {}
     
@@ -208,54 +70,18 @@ def load_cache(cache_file, base_dir):
         print(f"✗ 加载缓存失败: {e}")
         return {}
 
-def save_cache(cache_file, cache_data, base_dir):
-    """保存识别结果到缓存（txt格式，使用相对路径，带序号）"""
-    try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            # 写入文件头
-            f.write("# OCR识别结果缓存\n")
-            f.write("# 格式：序号|相对路径|订单号|金额|文件夹|识别时间\n")
-            f.write("# 相对路径格式：/哈哈/子文件夹/图片.jpg\n")
-            f.write("#" + "="*80 + "\n")
-            
-            # 写入数据（按路径排序，添加序号）
-            for idx, (file_path, data) in enumerate(sorted(cache_data.items()), 1):
-                order_number = data['order_number']
-                amount = data['amount']
-                folder = data.get('folder', '')
-                ocr_time = data.get('ocr_time', '')
-                
-                # 转换为相对路径
-                try:
-                    path_obj = Path(file_path)
-                    relative_path = path_obj.relative_to(base_dir)
-                    # 添加 /哈哈/ 前缀
-                    relative_path_str = f"/哈哈/{relative_path}"
-                except:
-                    # 如果无法转换为相对路径，使用原路径
-                    relative_path_str = file_path
-                
-                f.write(f"{idx}|{relative_path_str}|{order_number}|{amount}|{folder}|{ocr_time}\n")
-        
-        print(f"✓ 缓存已保存: {len(cache_data)} 条记录")
-    except Exception as e:
-        print(f"✗ 保存缓存失败: {e}")
-
-def backup_cache(cache_file):
-    """备份缓存文件"""
+def import_legacy_cache(cache_file, base_dir, cache):
+    """把旧版txt缓存导入共用缓存（只执行一次，导入后文件改名为 .imported）"""
     if not cache_file.exists():
-        return None
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = cache_file.parent / f"ocr_cache_backup_{timestamp}.txt"
-    
-    try:
-        shutil.copy2(cache_file, backup_file)
-        print(f"✓ 已备份缓存到: {backup_file.name}")
-        return backup_file
-    except Exception as e:
-        print(f"✗ 备份缓存失败: {e}")
-        return None
+        return
+    legacy = load_cache(cache_file, base_dir)
+    imported = 0
+    for file_path, data in legacy.items():
+        if Path(file_path).exists():
+            cache.put(cache.digest_for(file_path), data['order_number'], data['amount'])
+            imported += 1
+    cache_file.rename(cache_file.with_name(cache_file.name + '.imported'))
+    print(f"✓ 已导入旧版缓存: {imported} 条记录（原文件改名为 {cache_file.name}.imported）")
 
 def find_all_images(base_dir):
     """递归查找所有jpg图片"""
@@ -268,68 +94,71 @@ def find_all_images(base_dir):
     
     return sorted(image_files)
 
-def process_images(image_files, cache=None, incremental=True, debug=False):
+def process_images(image_files, cache=None, incremental=True, debug=False, report_only=False):
     """
     处理所有图片，提取订单号和金额
     
     Args:
         image_files: 图片文件列表
-        cache: 缓存字典 {文件路径: {order_number, amount, folder, ocr_time}}
-        incremental: 是否增量模式（跳过已识别的）
+        cache: OCR缓存（backend/ocr_cache.py的OCRCache），默认使用与后端共用的缓存
+        incremental: 是否增量模式（跳过已识别的）；否则重新识别所有图片并覆盖缓存
         debug: 调试模式
+        report_only: 仅报告模式，只使用缓存，未缓存的图片记为未识别（不调用tesseract）
+    
+    处理前被删除、移走或无法读取的图片（监视模式下事件与处理之间的变化）跳过，不计入结果和失败列表。
     """
     results = []
     failed_files = []
     skipped_count = 0
     
     if cache is None:
-        cache = {}
+        cache = open_cache()
+    
+    # 增量模式：按图片内容批量查询缓存（未变化的文件直接使用上次计算的摘要）
+    digests = {}
+    cached = {}
+    if incremental:
+        for image_file in image_files:
+            try:
+                digests[image_file] = cache.digest_for(image_file)
+            except OSError as e:
+                print(f"  ✗ 无法读取，跳过: {image_file} - {e}")
+        image_files = [image_file for image_file in image_files if image_file in digests]
+        cached = cache.get_many(set(digests.values()))
     
     total = len(image_files)
     
     for idx, image_file in enumerate(image_files, 1):
-        file_key = str(image_file)
+        hit = cached.get(digests.get(image_file))
+        if hit:
+            results.append({
+                'file': image_file,
+                'order_number': hit.order_number,
+                'amount': hit.amount,
+                'folder': image_file.parent.name,
+                'from_cache': True
+            })
+            skipped_count += 1
+            if idx % 50 == 0:  # 每50个显示一次进度
+                print(f"[{idx}/{total}] 已跳过 {skipped_count} 个已识别文件...")
+            continue
         
-        # 增量模式：检查缓存
-        if incremental and file_key in cache:
-            cached = cache[file_key]
-            # 验证缓存的有效性
-            if cached.get('order_number') and cached.get('amount'):
-                results.append({
-                    'file': image_file,
-                    'order_number': cached['order_number'],
-                    'amount': cached['amount'],
-                    'folder': cached.get('folder', image_file.parent.name),
-                    'from_cache': True
-                })
-                skipped_count += 1
-                if idx % 50 == 0:  # 每50个显示一次进度
-                    print(f"[{idx}/{total}] 已跳过 {skipped_count} 个已识别文件...")
-                continue
+        if report_only:
+            failed_files.append(image_file)
+            continue
         
         print(f"[{idx}/{total}] 处理: {image_file.relative_to(image_file.parents[2])}")
         
-        # 第一轮：常规OCR
-        ocr_text = ocr_image(image_file)
-        
-        if debug:
-            print(f"  → OCR文本预览: {ocr_text[:100].replace(chr(10), ' | ')}")
-        
-        order_number = extract_order_number(ocr_text)
-        amount = extract_amount(ocr_text)
+        from recognizer import get_recognizer
+        texts = []
+        try:
+            order_number, amount = get_recognizer().recognize_file(image_file, texts)
+        except OSError as e:
+            print(f"  ✗ 无法读取，跳过: {e}")
+            continue
         
-        # 如果常规OCR失败，尝试深度OCR
-        if order_number is None or amount is None:
-            print(f"  → 常规识别失败，尝试深度识别...")
-            deep_text = ocr_image_deep(image_file)
-            
-            # 合并文本以提高识别率
-            combined_text = ocr_text + "\n" + deep_text
-            
-            if order_number is None:
-                order_number = extract_order_number(combined_text)
-            if amount is None:
-                amount = extract_amount(combined_text)
+        if debug and texts:
+            print(f"  → OCR文本预览: {texts[0][:100].replace(chr(10), ' | ')}")
         
         if order_number and amount:
             result = {
@@ -341,21 +170,20 @@ def process_images(image_files, cache=None, incremental=True, debug=False):
             }
             results.append(result)
             
-            # 更新缓存
-            cache[file_key] = {
-                'order_number': order_number,
-                'amount': amount,
-                'folder': image_file.parent.name,
-                'ocr_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
+            # 更新缓存（识别后文件已被删除时不缓存，结果仍计入本次处理）
+            try:
+                digest = digests.get(image_file) or cache.digest_for(image_file)
+                cache.put(digest, order_number, amount)
+            except OSError as e:
+                print(f"  ⚠ 无法写入缓存: {e}")
             
             print(f"  ✓ 订单号: {order_number} (长度:{len(order_number)}), 金额: ¥{amount:.2f}")
         else:
             failed_files.append(image_file)
             print(f"  ✗ 识别失败 - 订单号: {order_number or '无'}, 金额: {amount or '无'}")
             
-            if debug and not order_number:
-                lines = ocr_text.split('\n')[:5]
+            if debug and not order_number and texts:
+                lines = texts[0].split('\n')[:5]
                 print(f"  → OCR文本前5行:")
                 for line in lines:
                     if line.strip():
@@ -381,6 +209,129 @@ def deduplicate_by_order(results):
     
     return unique_orders, duplicates
 
+class OrderLedger:
+    """监视模式的增量状态：每张图片的识别结果、按订单号去重的索引、每个文件夹的合计
+    
+    同一订单号最先出现的图片计入合计；该图片被删除后由下一张同订单号的图片接替。
+    金额按分累计，反复增减不产生浮点误差。
+    """
+    
+    def __init__(self, results=(), failed_files=()):
+        self.files = {}                     # 图片路径 -> 识别结果
+        self.orders = defaultdict(list)     # 订单号 -> 图片路径（按出现顺序）
+        self.folder_cents = defaultdict(int)
+        self.folder_counts = defaultdict(int)
+        self.failed = set(failed_files)
+        for result in results:
+            self.add(result)
+    
+    def _count(self, result, sign):
+        self.folder_cents[result['folder']] += sign * round(result['amount'] * 100)
+        self.folder_counts[result['folder']] += sign
+    
+    def add(self, result):
+        """加入（或替换）一张图片的识别结果，返回是否与已有订单重复"""
+        path = result['file']
+        self.remove(path)
+        self.files[path] = result
+        paths = self.orders[result['order_number']]
+        paths.append(path)
+        if len(paths) == 1:
+            self._count(result, 1)
+        return len(paths) > 1
+    
+    def fail(self, path):
+        """记录识别失败的图片（替换之前的结果）"""
+        self.remove(path)
+        self.failed.add(path)
+    
+    def remove(self, path):
+        """移除一张图片（或目录下的所有图片）"""
+        if path not in self.files and path not in self.failed:
+            # 目录：移除其中的所有图片
+            for child in [p for p in (*self.files, *self.failed) if path in p.parents]:
+                self.remove(child)
+            return
+        self.failed.discard(path)
+        result = self.files.pop(path, None)
+        if result is None:
+            return
+        paths = self.orders[result['order_number']]
+        if paths[0] == path:
+            self._count(result, -1)
+            paths.pop(0)
+            if paths:
+                self._count(self.files[paths[0]], 1)
+        else:
+            paths.remove(path)
+        if not paths:
+            del self.orders[result['order_number']]
+    
+    def print_totals(self):
+        """输出每个文件夹的当前合计"""
+        print("-"*100)
+        for folder in sorted(self.folder_counts):
+            if self.folder_counts[folder]:
+                print(f"{folder:50s} 订单数: {self.folder_counts[folder]:3d}  金额: ¥{self.folder_cents[folder] / 100:10.2f}")
+        duplicate_count = len(self.files) - len(self.orders)
+        print(f"{'去重后总计':50s} 订单数: {len(self.orders):3d}  金额: ¥{sum(self.folder_cents.values()) / 100:10.2f}"
+              f"  （重复图片 {duplicate_count} 张，识别失败 {len(self.failed)} 张）")
+        print("-"*100)
+
+def export_orders(export_file, unique_orders, duplicates, base_dir):
+    """导出去重后的订单（格式由扩展名决定：.csv/.xlsx/.parquet），按文件夹分组并带小计"""
+    from exporter import export, check_format, ExportError
+    fmt = export_file.suffix.lower().lstrip('.')
+    try:
+        check_format(fmt)
+    except ExportError as e:
+        print(f"✗ 导出失败: {e}")
+        return
+    ranked = sorted(unique_orders.values(), key=lambda result: result['amount'], reverse=True)
+    index = {id(result): i for i, result in enumerate(ranked, 1)}
+    rows = (
+        (index[id(result)], result['order_number'], round(result['amount'] * 100), result['file'].name,
+         result['folder'], str(result['file'].relative_to(base_dir)), len(duplicates.get(result['order_number'], ())),
+         None, None)
+        for result in sorted(ranked, key=lambda result: result['folder'])
+    )
+    with open(export_file, 'wb') as f:
+        for chunk in export(rows, fmt):
+            f.write(chunk)
+    print(f"✓ 已导出 {len(unique_orders)} 个订单: {export_file}")
+
+def watch_folder(watcher, base_dir, ledger, cache, debug=False):
+    """监视模式：持续处理新增、修改和删除的图片，直到按Ctrl+C退出"""
+    import time
+    print(f"\n监视文件夹（{watcher.mode}）: {base_dir}，按 Ctrl+C 退出\n")
+    try:
+        while True:
+            changes = watcher.changes()
+            start = time.perf_counter()
+            if changes.rescan:
+                # 事件丢失（inotify队列溢出）：重新扫描，未变化的文件由缓存直接得到结果
+                print("⚠ 文件变化过多，事件丢失，重新扫描整个文件夹")
+                results, failed_files, _ = process_images(find_all_images(base_dir), cache=cache, debug=debug)
+                ledger = OrderLedger(results, failed_files)
+            else:
+                for path in sorted(changes.deleted):
+                    ledger.remove(path)
+                    print(f"  - 已移除: {path.relative_to(base_dir)}")
+                image_files = sorted(path for path in changes.changed if path.exists())
+                results, failed_files, _ = process_images(image_files, cache=cache, debug=debug)
+                for result in results:
+                    if ledger.add(result):
+                        print(f"  ⚠ 重复订单: {result['order_number']} ({result['file'].relative_to(base_dir)})")
+                for path in failed_files:
+                    ledger.fail(path)
+            print(f"\n{time.strftime('%H:%M:%S')} 新增/修改 {len(changes.changed)} 张，删除 {len(changes.deleted)} 项，"
+                  f"耗时 {time.perf_counter() - start:.2f} 秒")
+            ledger.print_totals()
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+    finally:
+        watcher.close()
+
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(
@@ -388,17 +339,23 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用示例:
-  # 默认模式（自动判断：有缓存=增量，无缓存=全量）
+  # 默认模式（增量：跳过已识别的图片，缓存与后端共用）
   python ocr_deduplicate.py
   
-  # 清空缓存后重新识别
+  # 忽略缓存重新识别所有图片
   python ocr_deduplicate.py --clear-cache
+  
+  # 处理完成后持续监视文件夹，新放入的截图立即识别并更新合计
+  python ocr_deduplicate.py --watch
+  
+  # 导出去重后的订单（Excel）
+  python ocr_deduplicate.py --report --export 订单.xlsx
         """
     )
     parser.add_argument(
         '--clear-cache',
         action='store_true',
-        help='备份并清空缓存，重新识别所有图片'
+        help='忽略缓存，重新识别所有图片（覆盖缓存中这些图片的结果）'
     )
     parser.add_argument(
         '--copy-dedup',
@@ -410,12 +367,41 @@ def main():
         action='store_true',
         help='调试模式，显示详细OCR信息'
     )
+    parser.add_argument(
+        '--report',
+        action='store_true',
+        help='仅报告模式：只使用缓存生成汇总，未缓存的图片记为未识别，不调用tesseract'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='监视模式：处理完成后持续监视文件夹，增量识别新增或修改的图片'
+    )
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help='监视模式使用轮询（网络文件系统等inotify收不到通知时使用）'
+    )
+    parser.add_argument(
+        '--export',
+        type=Path,
+        metavar='FILE',
+        help='导出去重后的订单到文件（.csv/.xlsx/.parquet，含每个文件夹的小计）'
+    )
+    parser.add_argument(
+        '--dir',
+        type=Path,
+        default=Path(__file__).parent / "哈哈",
+        help='截图文件夹（默认为脚本所在目录下的“哈哈”）'
+    )
     
     args = parser.parse_args()
+    if args.watch and args.report:
+        parser.error('--watch 不能与 --report 同时使用')
     
-    # 获取哈哈文件夹路径
-    base_dir = Path(__file__).parent / "哈哈"
-    cache_file = base_dir / "ocr_cache.txt"  # 缓存文件放在哈哈文件夹内
+    # 截图文件夹路径
+    base_dir = args.dir
+    legacy_cache_file = base_dir / "ocr_cache.txt"  # 旧版缓存文件（哈哈文件夹内）
     
     if not base_dir.exists():
         print(f"✗ 文件夹不存在: {base_dir}")
@@ -425,27 +411,27 @@ def main():
     print("微信支付截图OCR识别和去重工具")
     print("="*100)
     
-    # 处理缓存
-    cache = {}
-    incremental = False
-    
-    if args.clear_cache:
-        # 手动清空缓存：先备份，再清空
-        if cache_file.exists():
-            backup_cache(cache_file)
-            cache_file.unlink()
-            print("✓ 已备份并清空缓存\n")
+    # 监视模式先开始监视再扫描，扫描期间放入的图片不会遗漏
+    watcher = None
+    if args.watch:
+        from watcher import open_watcher
+        watcher = open_watcher(base_dir, poll=args.poll)
+    
+    # 打开与后端共用的缓存，首次运行时导入旧版txt缓存
+    cache = open_cache()
+    if not args.clear_cache:
+        import_legacy_cache(legacy_cache_file, base_dir, cache)
+    
+    if args.report:
+        # 仅报告模式：只读缓存
+        print(f"运行模式: 仅报告模式（只使用缓存）\n")
+        incremental = True
+    elif args.clear_cache:
         print(f"运行模式: 全量模式（重新识别所有）\n")
         incremental = False
-    elif cache_file.exists():
-        # 缓存存在：增量模式
-        print(f"运行模式: 增量模式（跳过已识别）\n")
-        cache = load_cache(cache_file, base_dir)
-        incremental = True
     else:
-        # 缓存不存在：全量模式
-        print(f"运行模式: 全量模式（首次运行）\n")
-        incremental = False
+        print(f"运行模式: 增量模式（跳过已识别，缓存共 {cache.count()} 条记录）\n")
+        incremental = True
     
     # 查找所有图片
     print(f"\n正在扫描文件夹: {base_dir}")
@@ -458,16 +444,14 @@ def main():
     print()
     
     # 处理所有图片
-    results, failed_files, updated_cache = process_images(
+    results, failed_files, _ = process_images(
         image_files, 
         cache=cache, 
         incremental=incremental,
-        debug=args.debug
+        debug=args.debug,
+        report_only=args.report
     )
     
-    # 保存更新后的缓存（增量和全量模式都保存）
-    save_cache(cache_file, updated_cache, base_dir)
-    
     print("\n" + "="*100)
     print("OCR识别完成")
     print("="*100)
@@ -549,8 +533,13 @@ def main():
         
         print("\n" + "="*100)
         
+        if args.export:
+            export_orders(args.export, unique_orders, duplicates, base_dir)
+        
         # 根据参数决定是否创建去重后的文件夹并复制文件
         if args.copy_dedup:
+            import shutil
+            from datetime import datetime
             print("\n开始复制去重后的文件...")
             print("="*100)
             
@@ -584,6 +573,9 @@ def main():
             print("\n提示: 使用 --copy-dedup 参数可以复制去重后的文件到新文件夹")
             print("="*100)
 
+    
+    if watcher:
+        watch_folder(watcher, base_dir, OrderLedger(results, failed_files), open_cache(), debug=args.debug)
+
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+backend/reconcile.py 的单元测试：1～3张的哈希查找、动态规划兜底和无解的情况
+
+运行: python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import reconcile
+from reconcile import find_subsets
+
+
+def test_single_pair_and_triple():
+    items = [('a', 100), ('b', 250), ('c', 300), ('d', 700)]
+    assert find_subsets(items, 250) == [['b']]
+    assert find_subsets(items, 400) == [['a', 'c']]
+    assert find_subsets(items, 1100) == [['a', 'c', 'd']]
+
+
+def test_fewest_images_first():
+    items = [('a', 100), ('b', 200), ('c', 300)]
+    assert find_subsets(items, 300) == [['c'], ['a', 'b']]
+    assert find_subsets(items, 300, max_results=1) == [['c']]
+
+
+def test_dp_fallback_for_more_than_three_images():
+    # 任意3张以内都凑不出15分，需要4张
+    items = [('a', 1), ('b', 2), ('c', 4), ('d', 8), ('e', 16)]
+    assert find_subsets(items, 15) == [['a', 'b', 'c', 'd']]
+
+
+def test_dp_fallback_sum_matches():
+    items = [(str(i), cents) for i, cents in enumerate([1700, 2300, 4100, 5300, 6700, 9900])]
+    target = 1700 + 2300 + 4100 + 5300 + 6700
+    [subset] = find_subsets(items, target)
+    assert len(subset) > 3
+    assert sum(dict(items)[label] for label in subset) == target
+
+
+def test_no_solution():
+    items = [('a', 200), ('b', 300), ('c', 700)]
+    assert find_subsets(items, 100) == []
+    assert find_subsets(items, 600) == []
+    assert find_subsets(items, 0) == []
+    assert find_subsets(items, -200) == []
+    assert find_subsets([], 100) == []
+
+
+def test_dp_gives_up_above_limit():
+    target = reconcile.DP_MAX_CENTS + 15
+    items = [('a', 1), ('b', 2), ('c', 4), ('d', 8), ('e', reconcile.DP_MAX_CENTS)]
+    assert find_subsets(items, target) == []
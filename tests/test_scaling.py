@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+backend/scaling.py 的单元测试：缩放档位的升档、退档，以及默认档失败时退到更大字高和暂停缩放
+
+运行: python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from scaling import ScaleLearner, TEXT_HEIGHT_RATIO, MIN_SAMPLES, EXPLORE_EVERY
+
+# 1200万像素照片的宽度，任何一档都需要缩放
+PHOTO_WIDTH = 4000
+
+
+def width_for(height):
+    return round(height / TEXT_HEIGHT_RATIO)
+
+
+def record_many(learner, height, success, count=MIN_SAMPLES):
+    for _ in range(count):
+        learner.record(width_for(height), success)
+
+
+def chosen_widths(learner, count=EXPLORE_EVERY):
+    return [learner.choose(PHOTO_WIDTH) for _ in range(count)]
+
+
+def test_starts_at_default_height():
+    learner = ScaleLearner()
+    widths = chosen_widths(learner)
+    assert widths.count(width_for(40)) == EXPLORE_EVERY - 1
+    assert widths.count(width_for(34)) == 1
+    assert learner.choose(1000) is None
+
+
+def test_promotes_when_smaller_height_succeeds():
+    learner = ScaleLearner()
+    record_many(learner, 34, True)
+    assert learner.summary()['text_height'] == 34
+
+
+def test_default_height_failing_raises_target_width():
+    learner = ScaleLearner()
+    record_many(learner, 40, False)
+    assert learner.summary()['text_height'] == 52
+    assert width_for(52) in chosen_widths(learner)
+    record_many(learner, 52, False)
+    assert learner.summary()['text_height'] == 64
+
+
+def test_largest_height_failing_turns_downscaling_off():
+    learner = ScaleLearner()
+    for height in (40, 52, 64):
+        record_many(learner, height, False)
+    assert learner.summary()['text_height'] is None
+    # 暂停期间只有试探的图片缩放
+    widths = chosen_widths(learner)
+    assert widths.count(None) == EXPLORE_EVERY - 1
+    assert widths.count(width_for(64)) == 1
+
+
+def test_downscaling_resumes_after_recovery():
+    learner = ScaleLearner()
+    for height in (40, 52, 64):
+        record_many(learner, height, False)
+    record_many(learner, 64, True)
+    assert learner.summary()['text_height'] == 64
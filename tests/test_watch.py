@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ocr_deduplicate.py 监视模式的单元测试：事件与处理之间被删除的图片跳过，监视不中断
+
+使用模拟引擎（backend/engines.py的FakeEngine），不需要tesseract。
+运行: python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'backend'))
+sys.path.insert(0, str(ROOT))
+
+import recognizer
+from engines import FakeEngine
+from ocr_cache import OCRCache
+from recognizer import Recognizer
+from watcher import Changes
+from ocr_deduplicate import OrderLedger, watch_folder
+
+
+class StubWatcher:
+    """依次返回给定的变化，用完后模拟按Ctrl+C退出"""
+    mode = 'stub'
+
+    def __init__(self, *changes):
+        self.pending = list(changes)
+
+    def changes(self):
+        if not self.pending:
+            raise KeyboardInterrupt
+        return self.pending.pop(0)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(recognizer, '_recognizer', Recognizer(FakeEngine(latency=0, jitter=0, fail_rate=0)))
+    base = tmp_path / 'photos'
+    (base / '部门1').mkdir(parents=True)
+    return base
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OCRCache(tmp_path / 'ocr_cache.sqlite3', 'fake')
+
+
+def image(base, name, content):
+    path = base / '部门1' / name
+    path.write_bytes(content)
+    return path
+
+
+def test_deleted_before_digest(folder, cache, monkeypatch):
+    keep = image(folder, 'keep.jpg', b'keep' * 100)
+    gone = image(folder, 'gone.jpg', b'gone' * 100)
+    digest_for = cache.digest_for
+
+    def deleted_after_event(path):
+        if path == gone:
+            gone.unlink()
+        return digest_for(path)
+
+    monkeypatch.setattr(cache, 'digest_for', deleted_after_event)
+    ledger = OrderLedger()
+    watch_folder(StubWatcher(Changes({keep, gone}, set(), False)), folder, ledger, cache)
+    assert list(ledger.files) == [keep]
+    assert not ledger.failed
+
+
+def test_deleted_before_recognition(folder, cache, monkeypatch):
+    keep = image(folder, 'keep.jpg', b'keep' * 100)
+    gone = image(folder, 'gone.jpg', b'gone' * 100)
+    recognize_file = recognizer._recognizer.recognize_file
+
+    def deleted_after_digest(path, texts=None):
+        if path == gone:
+            gone.unlink()
+        return recognize_file(path, texts)
+
+    monkeypatch.setattr(recognizer._recognizer, 'recognize_file', deleted_after_digest)
+    ledger = OrderLedger()
+    later = image(folder, 'later.jpg', b'later' * 100)
+    # 第二批事件仍然被处理：监视没有因为第一批中的错误退出
+    watch_folder(StubWatcher(Changes({keep, gone}, set(), False), Changes({later}, set(), False)),
+                 folder, ledger, cache)
+    assert sorted(ledger.files) == sorted([keep, later])
+    assert not ledger.failed